@@ -1,38 +1,43 @@
 # app/api/devices.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from typing import Dict, List, Any
 from app.devices.registry import DeviceRegistry
+from app.devices.executor import device_executor
 
 router = APIRouter()
 registry = DeviceRegistry()
 
 
 @router.get("/")
-async def get_all_devices():
+async def get_all_devices(
+    refresh: bool = Query(
+        False, description="Read from the device instead of the cached state"
+    )
+):
     """Get all devices"""
-    devices = registry.get_all_devices()
+    return await registry.get_cached_statuses(refresh=refresh)
 
-    # Get the status for each device
-    result = {}
-    for device_id, controller in devices.items():
-        try:
-            status = await controller.get_status()
-            result[device_id] = status
-        except Exception as e:
-            result[device_id] = {"status": "error", "error": str(e)}
 
-    return result
+@router.get("/executor/stats")
+async def get_executor_stats():
+    """Get queue depth and wait times of the blocking device I/O pool"""
+    return device_executor.get_stats()
 
 
 @router.get("/{device_id}")
-async def get_device(device_id: str):
+async def get_device(
+    device_id: str,
+    refresh: bool = Query(
+        False, description="Read from the device instead of the cached state"
+    ),
+):
     """Get a specific device"""
     device = registry.get_device(device_id)
 
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
 
-    return await device.get_status()
+    return await registry.get_cached_status(device_id, refresh=refresh)
 
 
 @router.post("/{device_id}/state")
@@ -47,17 +52,13 @@ async def update_device_state(device_id: str, state: Dict[str, Any]):
 
 
 @router.get("/room/{room}")
-async def get_devices_by_room(room: str):
+async def get_devices_by_room(
+    room: str,
+    refresh: bool = Query(
+        False, description="Read from the device instead of the cached state"
+    ),
+):
     """Get all devices in a room"""
     devices = registry.get_devices_by_room(room)
 
-    # Get the status for each device
-    result = {}
-    for device_id, controller in devices.items():
-        try:
-            status = await controller.get_status()
-            result[device_id] = status
-        except Exception as e:
-            result[device_id] = {"status": "error", "error": str(e)}
-
-    return result
+    return await registry.get_cached_statuses(devices, refresh=refresh)
@@ -1,38 +1,55 @@
 # app/api/lights.py
-from fastapi import APIRouter, HTTPException
-from typing import Dict, List, Any, Optional
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from typing import Annotated, Dict, List, Any, Optional, Tuple
+import asyncio
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+from app.config import settings
+from app.devices.lights import FrameStream
 from app.devices.registry import DeviceRegistry
 
 router = APIRouter()
 registry = DeviceRegistry()
 
+ColorChannel = Annotated[int, Field(ge=0, le=255)]
+
 
 @router.get("/")
-async def get_all_lights():
+async def get_all_lights(
+    refresh: bool = Query(
+        False, description="Read from the device instead of the cached state"
+    )
+):
     """Get all lights"""
     light_devices = registry.get_devices_by_type("light")
 
-    # Get the status for each light
-    result = {}
-    for device_id, controller in light_devices.items():
-        try:
-            status = await controller.get_status()
-            result[device_id] = status
-        except Exception as e:
-            result[device_id] = {"status": "error", "error": str(e)}
-
-    return result
+    return await registry.get_cached_statuses(light_devices, refresh=refresh)
 
 
 @router.get("/{light_id}")
-async def get_light(light_id: str):
+async def get_light(
+    light_id: str,
+    refresh: bool = Query(
+        False, description="Read from the device instead of the cached state"
+    ),
+):
     """Get a specific light"""
     light = registry.get_device(light_id)
 
     if not light or not hasattr(light, "type") or light.type != "light":
         raise HTTPException(status_code=404, detail="Light not found")
 
-    return await light.get_status()
+    return await registry.get_cached_status(light_id, refresh=refresh)
+
+
+@router.get("/{light_id}/budget")
+async def get_light_budget(light_id: str):
+    """Get a light's command budget usage"""
+    light = registry.get_device(light_id)
+
+    if not light or not hasattr(light, "type") or light.type != "light":
+        raise HTTPException(status_code=404, detail="Light not found")
+
+    return light.get_budget()
 
 
 @router.post("/{light_id}/turn_on")
@@ -79,6 +96,84 @@ async def set_light_color(light_id: str, r: int, g: int, b: int):
     return await light.set_state(rgb=[r, g, b])
 
 
+class LightFrame(BaseModel):
+    """One frame of a light stream, every field optional"""
+
+    model_config = ConfigDict(extra="forbid")
+
+    power: Optional[bool] = None
+    brightness: Optional[int] = Field(None, ge=1, le=100)
+    color_temp: Optional[int] = Field(None, ge=1700, le=6500)
+    rgb: Optional[Tuple[ColorChannel, ColorChannel, ColorChannel]] = None
+
+
+@router.websocket("/{light_id}/stream")
+async def stream_light(websocket: WebSocket, light_id: str):
+    """Stream high-frequency updates to a light over music mode
+
+    Each message is a JSON frame such as {"rgb": [255, 0, 0], "brightness": 80}.
+    Frames are not acknowledged; stale frames are dropped when the bulb can't
+    keep up. Invalid frames are answered with an error and skipped.
+    """
+    light = registry.get_device(light_id)
+
+    if not light or not hasattr(light, "type") or light.type != "light":
+        await websocket.close(code=1008, reason="Light not found")
+        return
+
+    await websocket.accept()
+
+    if not await light.acquire_music_mode():
+        await websocket.send_json(
+            {"status": "error", "error": "Could not start music mode"}
+        )
+        await websocket.close(code=1011)
+        return
+
+    stream = FrameStream(light, max_fps=settings.LIGHT_STREAM_MAX_FPS)
+    sender = asyncio.create_task(stream.run())
+    closed = asyncio.create_task(light.music.wait_closed())
+    receive: Optional[asyncio.Task] = None
+    await websocket.send_json({"status": "streaming"})
+
+    try:
+        while True:
+            # Notice a lost bulb connection without waiting for the next frame
+            receive = asyncio.create_task(websocket.receive_text())
+            done, _ = await asyncio.wait(
+                {receive, sender, closed}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if receive not in done:
+                break
+
+            try:
+                frame = LightFrame.model_validate_json(receive.result())
+            except ValidationError as e:
+                await websocket.send_json(
+                    {
+                        "status": "error",
+                        "error": f"Invalid frame: {e.errors()[0]['msg']}",
+                    }
+                )
+                continue
+            stream.push(frame.model_dump(exclude_none=True))
+
+        await websocket.send_json(
+            {"status": "error", "error": "Music mode connection closed"}
+        )
+        await websocket.close(code=1011)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        await websocket.close(code=1011, reason=str(e)[:120])
+    finally:
+        pending = [task for task in (receive, sender, closed) if task is not None]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        await light.release_music_mode()
+
+
 @router.post("/room/{room}/turn_on")
 async def turn_on_room_lights(room: str):
     """Turn on all lights in a room"""
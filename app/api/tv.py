@@ -1,7 +1,12 @@
 # app/api/tv.py
-from fastapi import APIRouter, HTTPException, Query
-from typing import Dict, List, Any, Optional
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from typing import Dict, List, Any, Optional, Tuple
+import asyncio
+import json
 from app.devices.registry import DeviceRegistry
+from app.devices.tv import SEARCH_PROFILES
+from app.devices.content_links import content_links
+from pydantic import BaseModel
 import os
 
 router = APIRouter()
@@ -9,31 +14,31 @@ registry = DeviceRegistry()
 
 
 @router.get("/")
-async def get_all_tvs():
+async def get_all_tvs(
+    refresh: bool = Query(
+        False, description="Read from the device instead of the cached state"
+    )
+):
     """Get all TVs"""
     tv_devices = registry.get_devices_by_type("tv")
 
-    # Get the status for each TV
-    result = {}
-    for device_id, controller in tv_devices.items():
-        try:
-            status = await controller.get_status()
-            result[device_id] = status
-        except Exception as e:
-            result[device_id] = {"status": "error", "error": str(e)}
-
-    return result
+    return await registry.get_cached_statuses(tv_devices, refresh=refresh)
 
 
 @router.get("/{tv_id}")
-async def get_tv(tv_id: str):
+async def get_tv(
+    tv_id: str,
+    refresh: bool = Query(
+        False, description="Read from the device instead of the cached state"
+    ),
+):
     """Get a specific TV"""
     tv = registry.get_device(tv_id)
 
     if not tv or not hasattr(tv, "type") or tv.type != "tv":
         raise HTTPException(status_code=404, detail="TV not found")
 
-    return await tv.get_status()
+    return await registry.get_cached_status(tv_id, refresh=refresh)
 
 
 @router.post("/{tv_id}/keypress/{key}")
@@ -47,14 +52,81 @@ async def send_keypress(tv_id: str, key: str):
     return await tv.send_keypress(key)
 
 
+class KeySequenceModel(BaseModel):
+    keys: List[str]
+    spacing: Optional[float] = None
+
+
+@router.post("/{tv_id}/keys")
+async def send_keys(tv_id: str, sequence: KeySequenceModel):
+    """Send a sequence of keypresses to a TV in one request"""
+    tv = registry.get_device(tv_id)
+
+    if not tv or not hasattr(tv, "type") or tv.type != "tv":
+        raise HTTPException(status_code=404, detail="TV not found")
+
+    return await tv.send_keys(sequence.keys, spacing=sequence.spacing)
+
+
+@router.post("/{tv_id}/hold/{key}")
+async def hold_key(
+    tv_id: str,
+    key: str,
+    duration: float = Query(1.0, gt=0, le=10, description="Seconds to hold"),
+):
+    """Hold a key down (keydown, wait, keyup)"""
+    tv = registry.get_device(tv_id)
+
+    if not tv or not hasattr(tv, "type") or tv.type != "tv":
+        raise HTTPException(status_code=404, detail="TV not found")
+
+    return await tv.hold_key(key, duration)
+
+
+@router.post("/{tv_id}/repeat/start/{key}")
+async def start_repeat(
+    tv_id: str,
+    key: str,
+    interval: Optional[float] = Query(None, gt=0, description="Seconds per press"),
+    timeout: Optional[float] = Query(
+        None, gt=0, le=60, description="Stop after this many seconds"
+    ),
+):
+    """Start repeating a key while a button is held, until repeat/stop"""
+    tv = registry.get_device(tv_id)
+
+    if not tv or not hasattr(tv, "type") or tv.type != "tv":
+        raise HTTPException(status_code=404, detail="TV not found")
+
+    return await tv.start_repeat(key, interval=interval, timeout=timeout)
+
+
+@router.post("/{tv_id}/repeat/stop")
+async def stop_repeat(tv_id: str):
+    """Stop the key repeat started by repeat/start"""
+    tv = registry.get_device(tv_id)
+
+    if not tv or not hasattr(tv, "type") or tv.type != "tv":
+        raise HTTPException(status_code=404, detail="TV not found")
+
+    return await tv.stop_repeat()
+
+
 @router.post("/{tv_id}/launch_app/{app_id}")
-async def launch_app(tv_id: str, app_id: str):
-    """Launch an app on a TV by ID"""
+async def launch_app(
+    tv_id: str,
+    app_id: str,
+    content_id: Optional[str] = Query(None, description="Deep-link content id"),
+    media_type: str = Query("movie", description="movie, series, episode, ..."),
+):
+    """Launch an app on a TV by ID, optionally straight into a title"""
     tv = registry.get_device(tv_id)
 
     if not tv or not hasattr(tv, "type") or tv.type != "tv":
         raise HTTPException(status_code=404, detail="TV not found")
 
+    if content_id:
+        return await tv.launch_content(app_id, content_id, media_type)
     return await tv.launch_app(app_id)
 
 
@@ -69,15 +141,77 @@ async def launch_app_by_name(tv_id: str, app_name: str = Query(...)):
     return await tv.launch_app_by_name(app_name)
 
 
+class ContentLinkModel(BaseModel):
+    app: str  # Roku app id or name
+    title: str
+    content_id: str
+    media_type: str = "movie"  # ECP mediaType: movie, series, season, episode
+
+
+@router.get("/{tv_id}/content_links")
+async def get_content_links(tv_id: str):
+    """Get the known provider content ids, per Roku app id"""
+    tv = registry.get_device(tv_id)
+
+    if not tv or not hasattr(tv, "type") or tv.type != "tv":
+        raise HTTPException(status_code=404, detail="TV not found")
+
+    return await content_links.get_all()
+
+
+@router.put("/{tv_id}/content_links")
+async def add_content_link(tv_id: str, link: ContentLinkModel):
+    """Store the content id of a title so play_content can deep-link to it"""
+    tv = registry.get_device(tv_id)
+
+    if not tv or not hasattr(tv, "type") or tv.type != "tv":
+        raise HTTPException(status_code=404, detail="TV not found")
+
+    await tv.get_apps()
+    app = tv.app_catalog.get(link.app) or await tv.find_app(link.app)
+    if app is None:
+        raise HTTPException(status_code=404, detail=f"App not found: {link.app}")
+
+    await content_links.add(app["id"], link.title, link.content_id, link.media_type)
+    return {"status": "success", "app_id": app["id"], "title": link.title}
+
+
+@router.delete("/{tv_id}/content_links/{app_id}")
+async def remove_content_link(tv_id: str, app_id: str, title: str = Query(...)):
+    """Forget the content id of a title"""
+    tv = registry.get_device(tv_id)
+
+    if not tv or not hasattr(tv, "type") or tv.type != "tv":
+        raise HTTPException(status_code=404, detail="TV not found")
+
+    if not await content_links.remove(app_id, title):
+        raise HTTPException(status_code=404, detail="Content link not found")
+    return {"status": "success", "app_id": app_id, "title": title}
+
+
 @router.get("/{tv_id}/apps")
-async def get_apps(tv_id: str):
+async def get_apps(tv_id: str, refresh: bool = Query(False)):
     """Get a list of installed apps on a TV"""
     tv = registry.get_device(tv_id)
 
     if not tv or not hasattr(tv, "type") or tv.type != "tv":
         raise HTTPException(status_code=404, detail="TV not found")
 
-    return await tv.get_apps()
+    return await tv.get_apps(refresh=refresh)
+
+
+@router.get("/{tv_id}/profile")
+async def get_profile(tv_id: str, refresh: bool = Query(False)):
+    """Get the static device information of a TV (model, serial, software)"""
+    tv = registry.get_device(tv_id)
+
+    if not tv or not hasattr(tv, "type") or tv.type != "tv":
+        raise HTTPException(status_code=404, detail="TV not found")
+
+    profile = await tv.get_profile(refresh=refresh)
+    if profile is None:
+        raise HTTPException(status_code=503, detail="TV not reachable")
+    return profile._asdict()
 
 
 @router.post("/{tv_id}/turn_on")
@@ -108,19 +242,11 @@ async def volume_up(
 ):
     """Increase TV volume"""
     tv = registry.get_device(tv_id)
-    print(tv, "TV")
-    print(tv.type, "TV TYPE")
-    print(os.getenv("ROKU_IP_ADDRESS"), "ROKU_IP_ADDRESS")
 
     if not tv or not hasattr(tv, "type") or tv.type != "tv":
         raise HTTPException(status_code=404, detail="TV not found")
 
-    results = []
-    for _ in range(amount):
-        result = await tv.volume_up()
-        results.append(result)
-
-    return {"status": "success", "actions": amount, "results": results}
+    return await tv.set_volume_multi("up", amount)
 
 
 @router.post("/{tv_id}/volume_down")
@@ -133,12 +259,7 @@ async def volume_down(
     if not tv or not hasattr(tv, "type") or tv.type != "tv":
         raise HTTPException(status_code=404, detail="TV not found")
 
-    results = []
-    for _ in range(amount):
-        result = await tv.volume_down()
-        results.append(result)
-
-    return {"status": "success", "actions": amount, "results": results}
+    return await tv.set_volume_multi("down", amount)
 
 
 @router.post("/{tv_id}/navigate/{direction}")
@@ -220,22 +341,27 @@ async def playback_control(
     return await tv.send_keypress(key)
 
 
+@router.get("/{tv_id}/channels")
+async def get_channels(tv_id: str, refresh: bool = Query(False)):
+    """Get the channel lineup of a TV's tuner"""
+    tv = registry.get_device(tv_id)
+
+    if not tv or not hasattr(tv, "type") or tv.type != "tv":
+        raise HTTPException(status_code=404, detail="TV not found")
+
+    channels = await tv.get_channels(refresh=refresh)
+    return [channel.as_dict() for channel in channels]
+
+
 @router.post("/{tv_id}/channel/{channel_number}")
 async def change_channel(tv_id: str, channel_number: str):
-    """Change to a specific channel"""
+    """Change to a specific channel, by number or name"""
     tv = registry.get_device(tv_id)
 
     if not tv or not hasattr(tv, "type") or tv.type != "tv":
         raise HTTPException(status_code=404, detail="TV not found")
 
-    # Send digits one by one
-    results = []
-    for digit in channel_number:
-        if digit.isdigit():
-            result = await tv.send_keypress(f"Lit_{digit}")
-            results.append(result)
-
-    return {"status": "success", "channel": channel_number, "results": results}
+    return await tv.change_channel(channel_number)
 
 
 @router.post("/{tv_id}/search_content")
@@ -256,6 +382,10 @@ async def search_content(
     await tv.send_keypress("Home")
 
     if provider:
+        app = await tv.find_app(provider)
+        if app is not None and app["name"] in SEARCH_PROFILES:
+            return await tv.search_in_app(app["name"], query)
+
         # Launch the specific provider
         launch_result = await tv.launch_app_by_name(provider)
         if launch_result.get("status") == "error":
@@ -265,8 +395,7 @@ async def search_content(
                 "details": launch_result,
             }
 
-        # Search implementation would depend on the specific provider
-        # For now, return a status indicating we've launched the app
+        # No search profile for this provider, leave the search to the user
         return {
             "status": "launched",
             "provider": provider,
@@ -274,10 +403,130 @@ async def search_content(
         }
     else:
         # If no provider specified, use the Roku global search
-        await tv.send_keypress("Search")
+        return await tv.search_in_app("Roku", query)
 
-        # Return instructions - actual keyboard input would need a more complex implementation
-        return {
-            "status": "search_ready",
-            "message": "Search screen launched, use remote controls to input search term",
-        }
+
+@router.post("/{tv_id}/text")
+async def enter_text(tv_id: str, text: str = Query(..., description="Text to type")):
+    """Type text into the text field that has focus on a TV"""
+    tv = registry.get_device(tv_id)
+
+    if not tv or not hasattr(tv, "type") or tv.type != "tv":
+        raise HTTPException(status_code=404, detail="TV not found")
+
+    return await tv.enter_text(text)
+
+
+# Commands accepted on the remote-control WebSocket: name -> controller method
+REMOTE_COMMANDS = {
+    "keypress": "send_keypress",
+    "keys": "send_keys",
+    "hold": "hold_key",
+    "repeat_start": "start_repeat",
+    "repeat_stop": "stop_repeat",
+    "turn_on": "turn_on",
+    "turn_off": "turn_off",
+    "toggle_power": "toggle_power",
+    "volume_up": "volume_up",
+    "volume_down": "volume_down",
+    "navigate": "navigate",
+    "launch_app": "launch_app",
+    "launch_app_by_name": "launch_app_by_name",
+    "playback_control": "control_playback",
+    "channel": "change_channel",
+    "text": "enter_text",
+    "search": "search_in_app",
+}
+
+# Run as soon as they arrive instead of after the commands queued before them,
+# so releasing a button is never held up by a slow launch or search
+IMMEDIATE_COMMANDS = {"repeat_start", "repeat_stop"}
+
+
+@router.websocket("/{tv_id}/ws")
+async def remote_control(websocket: WebSocket, tv_id: str):
+    """Persistent remote-control channel for a TV
+
+    A message is either a bare key name ("Up", "Select"), sent as a keypress,
+    or a JSON command such as {"id": 3, "c": "launch_app", "app_id": "12"}.
+    Commands run one after another and each is answered with
+    {"id": ..., "result": {...}} when it is done; repeat_start and repeat_stop
+    skip the queue. {"state": {...}} is pushed whenever the TV state changes.
+    """
+    tv = registry.get_device(tv_id)
+
+    if not tv or not hasattr(tv, "type") or tv.type != "tv":
+        await websocket.close(code=1008, reason="TV not found")
+        return
+
+    await websocket.accept()
+
+    shadow = registry.poller.get_shadow(tv_id)
+    updates = shadow.subscribe()
+    send_lock = asyncio.Lock()
+
+    async def send(message: Dict[str, Any]):
+        async with send_lock:
+            await websocket.send_text(json.dumps(message, separators=(",", ":")))
+
+    async def push_states():
+        while True:
+            await updates.get()
+            await send({"state": shadow.snapshot()})
+
+    async def run(message_id: Any, method: str, args: Dict[str, Any]):
+        try:
+            result = await getattr(tv, method)(**args)
+        except TypeError as e:
+            result = {"status": "error", "error": f"Bad arguments: {e}"}
+        except Exception as e:
+            result = {"status": "error", "error": str(e)}
+        await send({"id": message_id, "result": result})
+
+    queue: "asyncio.Queue[Tuple[Any, str, Dict[str, Any]]]" = asyncio.Queue()
+
+    async def run_queued():
+        while True:
+            await run(*await queue.get())
+
+    pusher = asyncio.create_task(push_states())
+    worker = asyncio.create_task(run_queued())
+    try:
+        if shadow.state is not None:
+            await send({"state": shadow.snapshot()})
+
+        while True:
+            text = await websocket.receive_text()
+            if not text.startswith("{"):
+                queue.put_nowait((None, "send_keypress", {"key": text}))
+                continue
+
+            try:
+                message = json.loads(text)
+                command = message.pop("c")
+                message_id = message.pop("id", None)
+                if not isinstance(command, str):
+                    raise ValueError(f"Bad command: {command!r}")
+            except (ValueError, KeyError):
+                await send(
+                    {"id": None, "result": {"status": "error", "error": "Bad message"}}
+                )
+                continue
+
+            method = REMOTE_COMMANDS.get(command)
+            if method is None:
+                error = {"status": "error", "error": f"Unknown command: {command}"}
+                await send({"id": message_id, "result": error})
+            elif command in IMMEDIATE_COMMANDS:
+                await run(message_id, method, message)
+            else:
+                queue.put_nowait((message_id, method, message))
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        await websocket.close(code=1011, reason=str(e)[:120])
+    finally:
+        pusher.cancel()
+        worker.cancel()
+        await asyncio.gather(pusher, worker, return_exceptions=True)
+        shadow.unsubscribe(updates)
@@ -11,16 +11,8 @@ registry = DeviceRegistry()
 @router.get("/", response_class=HTMLResponse)
 async def dashboard(request: Request):
     """Enhanced web UI for device control"""
-    devices = registry.get_all_devices()
-
     # Get the status for each device
-    device_statuses = {}
-    for device_id, controller in devices.items():
-        try:
-            status = await controller.get_status()
-            device_statuses[device_id] = status
-        except Exception as e:
-            device_statuses[device_id] = {"status": "error", "error": str(e)}
+    device_statuses = await registry.get_cached_statuses()
 
     # Group devices by room
     rooms = {}
@@ -339,7 +331,7 @@ async def dashboard(request: Request):
                 icon_class = "bi-gear"
 
             html_content += f"""
-            <div class="device-item">
+            <div class="device-item" data-device-id="{device_id}" data-device-type="{device_type}">
                 <div class="device-name">
                     <i class="bi {icon_class}"></i> {device_name}
                     <span id="{device_id}-status" class="device-status {('status-on' if power else 'status-off')}">{power_text}</span>
@@ -500,28 +492,106 @@ async def dashboard(request: Request):
         </div>
         
         <script>
-            // Variable to store volume control interval
-            let volumeInterval = null;
+            // TV whose volume button is being held (the server repeats the key)
+            let volumeRepeatDevice = null;
+            // Pending HTTP start of that repeat, the stop must not overtake it
+            let volumeRepeatStart = null;
             
             // Function to start continuous volume control
             function startVolumeControl(deviceId, direction) {
-                // First immediate press
-                controlDevice(deviceId, 'tv', direction === 'up' ? 'volume_up' : 'volume_down');
-                
-                // Then continuous presses while button is held
-                volumeInterval = setInterval(() => {
-                    controlDevice(deviceId, 'tv', direction === 'up' ? 'volume_up' : 'volume_down');
-                }, 300); // Adjust timing as needed
+                if (volumeRepeatDevice) {
+                    return;
+                }
+                volumeRepeatDevice = deviceId;
+                const key = direction === 'up' ? 'VolumeUp' : 'VolumeDown';
+                const reply = sendTvCommand(deviceId, 'repeat_start', { key });
+                if (reply) {
+                    // The socket keeps start and stop in order
+                    reply.catch(error => console.error('Error:', error));
+                    return;
+                }
+                volumeRepeatStart = fetch(`/tv/${deviceId}/repeat/start/${key}`, { method: 'POST' })
+                    .catch(error => console.error('Error:', error));
             }
             
             // Function to stop continuous volume control
             function stopVolumeControl() {
-                if (volumeInterval) {
-                    clearInterval(volumeInterval);
-                    volumeInterval = null;
+                if (volumeRepeatDevice) {
+                    const deviceId = volumeRepeatDevice;
+                    const started = volumeRepeatStart;
+                    volumeRepeatDevice = null;
+                    volumeRepeatStart = null;
+                    const reply = started ? null : sendTvCommand(deviceId, 'repeat_stop');
+                    // keepalive lets the release go out even if the page is closing
+                    const stop = () => fetch(`/tv/${deviceId}/repeat/stop`, { method: 'POST', keepalive: true });
+                    (reply || (started ? started.then(stop) : stop()))
+                        .catch(error => console.error('Error:', error));
+                }
+            }
+            
+            function setPowerBadge(deviceId, power) {
+                const statusBadge = document.querySelector(`#${deviceId}-status`);
+                if (statusBadge) {
+                    statusBadge.textContent = power ? 'On' : 'Off';
+                    statusBadge.classList.remove(power ? 'status-off' : 'status-on');
+                    statusBadge.classList.add(power ? 'status-on' : 'status-off');
+                }
+            }
+            
+            // Remote-control WebSockets, one per TV
+            const tvSockets = {};
+            const pendingReplies = {};
+            let nextMessageId = 1;
+            
+            function connectTv(deviceId) {
+                const protocol = location.protocol === 'https:' ? 'wss' : 'ws';
+                const socket = new WebSocket(`${protocol}://${location.host}/tv/${deviceId}/ws`);
+                socket.onopen = () => {
+                    tvSockets[deviceId] = socket;
+                };
+                socket.onmessage = event => {
+                    const message = JSON.parse(event.data);
+                    if (message.state) {
+                        if ('power' in message.state) {
+                            setPowerBadge(deviceId, message.state.power);
+                        }
+                    } else if (message.id && pendingReplies[message.id]) {
+                        pendingReplies[message.id](message.result);
+                        delete pendingReplies[message.id];
+                    }
+                };
+                socket.onclose = () => {
+                    delete tvSockets[deviceId];
+                    // Fall back to HTTP until the socket is back
+                    setTimeout(() => connectTv(deviceId), 5000);
+                };
+            }
+            
+            // Send a command over the TV's socket, returns null if it isn't open
+            function sendTvCommand(deviceId, command, params = {}) {
+                const socket = tvSockets[deviceId];
+                if (!socket || socket.readyState !== WebSocket.OPEN) {
+                    return null;
                 }
+                const id = nextMessageId++;
+                return new Promise((resolve, reject) => {
+                    pendingReplies[id] = resolve;
+                    socket.send(JSON.stringify({ id, c: command, ...params }));
+                    setTimeout(() => {
+                        if (pendingReplies[id]) {
+                            delete pendingReplies[id];
+                            reject(new Error('No reply from TV'));
+                        }
+                    }, 10000);
+                });
             }
             
+            document.addEventListener('DOMContentLoaded', () => {
+                document.querySelectorAll('.device-item[data-device-type="tv"]').forEach(item => {
+                    connectTv(item.dataset.deviceId);
+                });
+            });
+            
             // Show status message
             function showStatusMessage(message, success = true) {
                 const statusEl = document.getElementById('status-message');
@@ -571,8 +641,15 @@ async def dashboard(request: Request):
                 }
                 
                 try {
-                    const response = await fetch(url, { method });
-                    const result = await response.json();
+                    // TV commands go over the remote-control socket when it's open
+                    const reply = deviceType === 'tv' ? sendTvCommand(deviceId, action, params) : null;
+                    let result;
+                    if (reply) {
+                        result = await reply;
+                    } else {
+                        const response = await fetch(url, { method });
+                        result = await response.json();
+                    }
                     console.log(result);
                     
                     // Don't reload the page, just update UI elements as needed
@@ -585,18 +662,7 @@ async def dashboard(request: Request):
                         
                         // Only update status for power-related actions without reloading
                         if (action === 'turn_on' || action === 'turn_off') {
-                            const statusBadge = document.querySelector(`#${deviceId}-status`);
-                            if (statusBadge) {
-                                if (action === 'turn_on') {
-                                    statusBadge.textContent = 'On';
-                                    statusBadge.classList.remove('status-off');
-                                    statusBadge.classList.add('status-on');
-                                } else {
-                                    statusBadge.textContent = 'Off';
-                                    statusBadge.classList.remove('status-on');
-                                    statusBadge.classList.add('status-off');
-                                }
-                            }
+                            setPowerBadge(deviceId, action === 'turn_on');
                         }
                     } else if (result.error) {
                         showStatusMessage(`Error: ${result.error}`, false);
@@ -1,7 +1,7 @@
 # app/config.py
 import os
 from dotenv import load_dotenv
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings  # Change this import
 
 # Load environment variables
@@ -15,11 +15,84 @@ class Settings(BaseSettings):
 
     # Data file
     DEVICES_FILE: str = "data/devices.json"
+    CONTENT_LINKS_FILE: str = "data/content_links.json"  # Provider content ids
 
     # Roku
     ROKU_IP_ADDRESS: Optional[str] = os.getenv("ROKU_IP_ADDRESS")
     print(ROKU_IP_ADDRESS, "ROKU_IP_ADDRESS")
 
+    # Roku ECP connection pool (keep-alive connections to port 8060)
+    ROKU_MAX_CONNECTIONS: int = 4
+    ROKU_KEEPALIVE_TIMEOUT: float = 60.0
+    ROKU_REQUEST_TIMEOUT: float = 5.0
+    ROKU_CONNECT_TIMEOUT: float = 1.5  # Fail fast when the TV has moved
+    ROKU_APPS_TTL: float = 3600.0  # Seconds to cache the installed app list
+    ROKU_PROFILE_TTL: float = 86400.0  # Seconds to cache static device-info fields
+    ROKU_CHANNELS_TTL: float = 86400.0  # Tuner lineup, changes only on a rescan
+    ROKU_ACTIVE_APP_INTERVAL: float = 60.0  # Seconds between active-app reads in status
+    ROKU_KEY_SPACING: float = 0.1  # Minimum seconds between keys in a sequence
+    ROKU_TEXT_SPACING: float = 0.05  # Between literal keypresses when typing text
+    ROKU_REPEAT_INTERVAL: float = 0.3  # Seconds between presses of a held button
+    ROKU_REPEAT_TIMEOUT: float = 10.0  # Stop a repeat if the release never comes
+    ROKU_WAIT_TIMEOUT: float = 15.0  # Seconds to wait for an app or screen to appear
+    ROKU_LINK_TIMEOUT: float = 8.0  # Seconds for a deep link to bring up its app
+    ROKU_WAIT_POLL_MIN: float = 0.1  # First interval when polling the TV's state
+    ROKU_WAIT_POLL_MAX: float = 1.0  # Longest interval when polling the TV's state
+
+    # TMDb API connection pool
+    TMDB_MAX_CONNECTIONS: int = 4
+    TMDB_REQUEST_TIMEOUT: float = 10.0
+
+    # TMDb provider lookups, cached on disk. Streaming catalogs change every few
+    # weeks; titles without providers are rechecked sooner as they get added.
+    TMDB_CACHE_FILE: str = "data/tmdb_cache.json"
+    TMDB_CACHE_TTL: float = 3 * 86400.0
+    TMDB_CACHE_NEGATIVE_TTL: float = 6 * 3600.0
+    TMDB_CACHE_SIZE: int = 1000  # Titles kept, least recently used are dropped
+    TMDB_CACHE_SAVE_DELAY: float = 5.0  # Seconds to batch writes of the file
+
+    # Streaming providers to prefer when a title is on several, by name in
+    # TMDB_PROVIDER_MAPPING, e.g. PROVIDER_PREFERENCE='["Netflix", "Max"]'.
+    # Unlisted providers follow in TMDb's order.
+    PROVIDER_PREFERENCE: List[str] = []
+
+    # Concurrent status reads across devices
+    STATUS_CONCURRENCY: int = 8
+    STATUS_TIMEOUT: float = 5.0
+
+    # Background state polling (seconds between reads, per device type)
+    POLL_INTERVALS: Dict[str, float] = {"light": 30.0, "tv": 10.0}
+    POLL_INTERVAL_DEFAULT: float = 30.0
+    POLL_MAX_BACKOFF: int = 8  # Interval multiplier cap for unreachable devices
+    POLL_INTERVAL_PUSH: float = 300.0  # For devices that push state changes
+
+    # Dedicated thread pool for blocking device and storage I/O
+    DEVICE_IO_WORKERS: int = 4
+    DEVICE_IO_PER_DEVICE: int = 1  # Concurrent blocking jobs per device or file
+
+    # Yeelight LAN protocol
+    YEELIGHT_COMMAND_TIMEOUT: float = 5.0
+    YEELIGHT_CONNECT_TIMEOUT: float = 2.0
+
+    # Yeelight command quota (per bulb connection) and music mode
+    YEELIGHT_QUOTA_PER_MINUTE: int = 60
+    YEELIGHT_BACKGROUND_RESERVE: int = 20  # Tokens background reads can't use
+    YEELIGHT_AUTO_MUSIC_MODE: bool = True
+    YEELIGHT_MUSIC_MODE_WINDOW: float = 10.0  # Seconds of traffic to look at
+    YEELIGHT_MUSIC_MODE_THRESHOLD: float = 0.8  # Fraction of the quota rate
+    YEELIGHT_MUSIC_MODE_IDLE: float = 30.0  # Seconds before leaving music mode
+    LIGHT_STREAM_MAX_FPS: float = 30.0  # Frame rate cap for /lights/{id}/stream
+
+    # SSDP/multicast discovery of Roku and Yeelight devices at startup
+    DISCOVERY_ENABLED: bool = True
+    DISCOVERY_TIMEOUT: float = 2.0  # Seconds to collect search responses
+    RESOLVE_TIMEOUT: float = 1.0  # Lookup of one device that stopped answering
+    RESOLVE_COOLDOWN: float = 30.0  # Minimum seconds between lookups per device
+
+    # Reconnect delays for the Yeelight notification listener (seconds)
+    LISTENER_RETRY_MIN: float = 1.0
+    LISTENER_RETRY_MAX: float = 60.0
+
     # Yeelight light bulbs
     YEELIGHT_IP_ADDRESSES: List[str] = []
 
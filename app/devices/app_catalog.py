@@ -0,0 +1,105 @@
+# app/devices/app_catalog.py
+from typing import Dict, Any, List, Optional
+import difflib
+import re
+import time
+
+# Close-match cutoff for fuzzy app name lookups (difflib ratio)
+FUZZY_CUTOFF = 0.75
+
+# Shortest name that may match an app by prefix, "tv" alone matches nothing
+MIN_PREFIX_LENGTH = 3
+
+
+def normalize_app_name(name: str) -> str:
+    """Lower-case an app name and drop punctuation, "Disney+" -> "disneyplus" """
+    name = name.lower().replace("+", " plus")
+    return re.sub(r"[^a-z0-9]", "", name)
+
+
+class AppCatalog:
+    """Cached list of the apps installed on a Roku, indexed by name
+
+    The list is kept until it is older than `ttl` seconds or invalidated
+    because an app was installed or removed. The name index is rebuilt
+    whenever the list changes, so lookups never touch the TV.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.apps: List[Dict[str, Any]] = []
+        self.etag: Optional[str] = None
+        self.version = 0  # Bumped whenever the set of apps changes
+
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._by_name: Dict[str, Dict[str, Any]] = {}
+        self._fetched_at: Optional[float] = None
+
+    @property
+    def fresh(self) -> bool:
+        """Whether the cached list can be used without asking the TV"""
+        return (
+            self._fetched_at is not None
+            and time.monotonic() - self._fetched_at < self.ttl
+        )
+
+    @property
+    def age(self) -> Optional[float]:
+        """Seconds since the list was fetched, None if it never was"""
+        if self._fetched_at is None:
+            return None
+        return time.monotonic() - self._fetched_at
+
+    def update(self, apps: List[Dict[str, Any]], etag: Optional[str] = None):
+        """Store a freshly fetched app list and rebuild the indexes"""
+        self._fetched_at = time.monotonic()
+        self.etag = etag
+        if apps == self.apps:
+            return
+
+        self.apps = apps
+        self._by_id = {app["id"]: app for app in apps}
+        self._by_name = {}
+        for app in apps:
+            # First app wins if two normalize to the same name
+            self._by_name.setdefault(normalize_app_name(app["name"]), app)
+        self.version += 1
+
+    def touch(self):
+        """Mark the cached list as fresh, e.g. after a 304 Not Modified"""
+        self._fetched_at = time.monotonic()
+
+    def invalidate(self):
+        """Force the next lookup to fetch the list again"""
+        self._fetched_at = None
+        self.etag = None
+
+    def get(self, app_id: str) -> Optional[Dict[str, Any]]:
+        """Get an installed app by its id"""
+        return self._by_id.get(app_id)
+
+    def find(self, name: str, exact: bool = False) -> Optional[Dict[str, Any]]:
+        """Find an app by name: exact, then prefix, then closest match
+
+        With `exact` only names that normalize to the same key match.
+        """
+        key = normalize_app_name(name)
+        if not key:
+            return None
+
+        app = self._by_name.get(key)
+        if app is not None or exact:
+            return app
+
+        # Partial names like "Prime" -> "Prime Video", if unambiguous
+        if len(key) >= MIN_PREFIX_LENGTH:
+            partial = [
+                app for indexed, app in self._by_name.items() if indexed.startswith(key)
+            ]
+            if len(partial) == 1:
+                return partial[0]
+
+        matches = difflib.get_close_matches(
+            key, list(self._by_name), n=1, cutoff=FUZZY_CUTOFF
+        )
+        return self._by_name[matches[0]] if matches else None
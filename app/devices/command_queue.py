@@ -0,0 +1,87 @@
+# app/devices/command_queue.py
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def merge_latest(pending: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Default merge: the newest value of each key wins"""
+    merged = dict(pending)
+    merged.update(new)
+    return merged
+
+
+class CommandQueue:
+    """Per-device command queue where the newest pending target wins
+
+    Commands submitted while an earlier batch is being sent, or before the
+    minimum interval since the last batch has passed, are merged into a single
+    pending batch. Only the merged batch is sent, and every caller whose
+    command went into it is resolved with its result.
+    """
+
+    def __init__(
+        self,
+        execute: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        min_interval: float = 0.0,
+        merge: Callable[
+            [Dict[str, Any], Dict[str, Any]], Dict[str, Any]
+        ] = merge_latest,
+    ):
+        self.execute = execute
+        self.min_interval = min_interval
+        self.merge = merge
+
+        self._pending: Optional[Dict[str, Any]] = None
+        self._waiters: List[asyncio.Future] = []
+        self._worker: Optional[asyncio.Task] = None
+        self._last_sent = 0.0
+        self.submitted = 0
+        self.sent = 0
+
+    @property
+    def depth(self) -> int:
+        """Number of callers waiting on the pending batch"""
+        return len(self._waiters)
+
+    async def submit(self, command: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue a command and wait for the result of the batch it went into"""
+        if self._pending is None:
+            self._pending = dict(command)
+        else:
+            self._pending = self.merge(self._pending, command)
+        self.submitted += 1
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+        # A caller that goes away doesn't cancel the batch others wait on
+        return await asyncio.shield(future)
+
+    async def _run(self):
+        """Send pending batches until the queue is empty"""
+        while self._pending is not None:
+            wait = self.min_interval - (time.monotonic() - self._last_sent)
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            command, waiters = self._pending, self._waiters
+            self._pending, self._waiters = None, []
+            self._last_sent = time.monotonic()
+            self.sent += 1
+
+            try:
+                result = await self.execute(command)
+            except Exception as e:
+                logger.error(f"Error executing queued command {command}: {e}")
+                result = {"error": str(e), "status": "error"}
+
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(result)
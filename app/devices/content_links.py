@@ -0,0 +1,121 @@
+# app/devices/content_links.py
+from typing import Dict, Any, List, NamedTuple, Optional
+import asyncio
+import json
+import logging
+from app.config import settings
+from app.devices.executor import device_executor, read_file, write_file
+
+logger = logging.getLogger(__name__)
+
+
+class ContentLink(NamedTuple):
+    """A provider's id for a title, used to deep-link into it"""
+
+    content_id: str
+    media_type: str  # ECP mediaType: movie, series, season, episode, ...
+    title: str = ""  # As it was entered, the lookup key is normalized
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"content_id": self.content_id, "media_type": self.media_type}
+
+
+def title_key(title: str) -> str:
+    """Match titles case- and spacing-insensitively, in any script"""
+    return " ".join(title.casefold().split())
+
+
+class ContentLinks:
+    """Known provider content ids per Roku app, stored in a JSON file
+
+    The file maps a Roku app id to titles and their content ids, see
+    data/content_links.example.json:
+    {"12": {"Stranger Things": {"content_id": "80057281", "media_type": "series"}}}
+    Titles are matched case-insensitively. Links are added and removed
+    through the /tv/{tv_id}/content_links endpoints or by editing the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.links: Dict[str, Dict[str, ContentLink]] = {}
+        self.loaded = False
+        self._lock = asyncio.Lock()  # One load, and one write at a time
+
+    async def load(self):
+        """Read the links file once, if there is one"""
+        async with self._lock:
+            if self.loaded:
+                return
+            try:
+                content = await device_executor.run(self.path, read_file, self.path)
+                data = json.loads(content) if content is not None else {}
+            except Exception as e:
+                logger.error(f"Error loading content links: {e}")
+                data = {}
+
+            self.links = {
+                app_id: {
+                    title_key(title): ContentLink(
+                        str(link["content_id"]), link.get("media_type", "movie"), title
+                    )
+                    for title, link in titles.items()
+                }
+                for app_id, titles in data.items()
+            }
+            self.loaded = True
+            if data:
+                logger.info(f"Loaded content links for {len(self.links)} apps")
+
+    async def save(self):
+        """Write the links to their file"""
+        data = {
+            app_id: {link.title: link.as_dict() for link in titles.values()}
+            for app_id, titles in self.links.items()
+            if titles
+        }
+        async with self._lock:
+            await device_executor.run(
+                self.path, write_file, self.path, json.dumps(data, indent=2)
+            )
+
+    async def lookup(self, app_id: str, title: str) -> Optional[ContentLink]:
+        """Get the content id of a title in an app"""
+        if not self.loaded:
+            await self.load()
+        return self.links.get(app_id, {}).get(title_key(title))
+
+    async def get_all(self) -> Dict[str, List[Dict[str, Any]]]:
+        """All links, per app id"""
+        if not self.loaded:
+            await self.load()
+        return {
+            app_id: [
+                {"title": link.title, **link.as_dict()} for link in titles.values()
+            ]
+            for app_id, titles in self.links.items()
+            if titles
+        }
+
+    async def add(
+        self, app_id: str, title: str, content_id: str, media_type: str = "movie"
+    ) -> ContentLink:
+        """Store the content id of a title in an app, replacing an older one"""
+        if not self.loaded:
+            await self.load()
+        link = ContentLink(content_id, media_type, title)
+        self.links.setdefault(app_id, {})[title_key(title)] = link
+        await self.save()
+        return link
+
+    async def remove(self, app_id: str, title: str) -> bool:
+        """Forget the content id of a title, False if there was none"""
+        if not self.loaded:
+            await self.load()
+        if self.links.get(app_id, {}).pop(title_key(title), None) is None:
+            return False
+        await self.save()
+        return True
+
+
+# Shared by all TVs
+content_links = ContentLinks(settings.CONTENT_LINKS_FILE)
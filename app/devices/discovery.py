@@ -0,0 +1,186 @@
+# app/devices/discovery.py
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from urllib.parse import urlparse
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+SSDP_ADDRESS = "239.255.255.250"
+ROKU_SSDP_PORT = 1900
+YEELIGHT_SSDP_PORT = 1982
+
+ROKU_SEARCH = (
+    "M-SEARCH * HTTP/1.1\r\n"
+    f"HOST: {SSDP_ADDRESS}:{ROKU_SSDP_PORT}\r\n"
+    'MAN: "ssdp:discover"\r\n'
+    "ST: roku:ecp\r\n"
+    "MX: 1\r\n"
+    "\r\n"
+).encode()
+
+YEELIGHT_SEARCH = (
+    "M-SEARCH * HTTP/1.1\r\n"
+    f"HOST: {SSDP_ADDRESS}:{YEELIGHT_SSDP_PORT}\r\n"
+    'MAN: "ssdp:discover"\r\n'
+    "ST: wifi_bulb\r\n"
+    "\r\n"
+).encode()
+
+
+def parse_ssdp_headers(data: bytes) -> Dict[str, str]:
+    """Parse the headers of an SSDP response, keys are lower-cased"""
+    headers = {}
+    for line in data.decode(errors="replace").split("\r\n")[1:]:
+        if ":" in line:
+            key, value = line.split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+    return headers
+
+
+def parse_roku_response(data: bytes) -> Optional[Dict[str, Any]]:
+    """Turn a Roku ECP search response into a device description"""
+    headers = parse_ssdp_headers(data)
+    if "roku:ecp" not in headers.get("st", "") + headers.get("usn", ""):
+        return None
+
+    # USN looks like uuid:roku:ecp:P0A070000007
+    serial = headers.get("usn", "").rsplit(":", 1)[-1]
+    location = urlparse(headers.get("location", ""))
+    if not serial or not location.hostname:
+        return None
+
+    return {
+        "type": "tv",
+        "hardware_id": f"roku:{serial}",
+        "ip_address": location.hostname,
+        "name": "Roku TV",
+    }
+
+
+def parse_yeelight_response(data: bytes) -> Optional[Dict[str, Any]]:
+    """Turn a Yeelight search response (or advertisement) into a device description"""
+    headers = parse_ssdp_headers(data)
+    bulb_id = headers.get("id")
+    location = urlparse(headers.get("location", ""))
+    if not bulb_id or location.scheme != "yeelight" or not location.hostname:
+        return None
+
+    return {
+        "type": "light",
+        "hardware_id": f"yeelight:{bulb_id}",
+        "ip_address": location.hostname,
+        "name": headers.get("name") or f"Yeelight {bulb_id[-4:]}",
+        "model": headers.get("model", ""),
+    }
+
+
+class _SearchProtocol(asyncio.DatagramProtocol):
+    """Collects parsed responses to a multicast search"""
+
+    def __init__(
+        self,
+        parse: Callable[[bytes], Optional[Dict[str, Any]]],
+        wanted: Optional[str] = None,
+    ):
+        self.parse = parse
+        self.wanted = wanted
+        self.found: Dict[str, Dict[str, Any]] = {}
+        self.done = asyncio.Event()
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]):
+        try:
+            device = self.parse(data)
+        except Exception as e:
+            logger.debug(f"Ignoring bad discovery response from {addr}: {e}")
+            return
+        if device is not None:
+            self.found[device["hardware_id"]] = device
+            if device["hardware_id"] == self.wanted:
+                self.done.set()
+
+
+async def search(
+    message: bytes,
+    target: Tuple[str, int],
+    parse: Callable[[bytes], Optional[Dict[str, Any]]],
+    timeout: float,
+    wanted: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Send a search to target and collect responses for `timeout` seconds
+
+    With `wanted` set, the search ends as soon as that hardware id answers.
+    """
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: _SearchProtocol(parse, wanted), local_addr=("0.0.0.0", 0)
+    )
+    try:
+        # UDP can drop packets, so send the search twice
+        transport.sendto(message, target)
+        try:
+            await asyncio.wait_for(protocol.done.wait(), min(0.1, timeout))
+        except asyncio.TimeoutError:
+            transport.sendto(message, target)
+            try:
+                await asyncio.wait_for(protocol.done.wait(), max(timeout - 0.1, 0))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        transport.close()
+
+    return list(protocol.found.values())
+
+
+async def discover_roku(
+    timeout: float,
+    target: Tuple[str, int] = (SSDP_ADDRESS, ROKU_SSDP_PORT),
+    wanted: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Find Roku devices with an SSDP search for roku:ecp"""
+    return await search(ROKU_SEARCH, target, parse_roku_response, timeout, wanted)
+
+
+async def discover_yeelight(
+    timeout: float,
+    target: Tuple[str, int] = (SSDP_ADDRESS, YEELIGHT_SSDP_PORT),
+    wanted: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Find Yeelight bulbs with the Yeelight multicast search"""
+    return await search(
+        YEELIGHT_SEARCH, target, parse_yeelight_response, timeout, wanted
+    )
+
+
+async def resolve(hardware_id: str, timeout: float) -> Optional[str]:
+    """Look up the current IP address of one device by its hardware id
+
+    Only the search for that kind of device is sent, and it stops at the
+    first answer from the device.
+    """
+    if hardware_id.startswith("roku:"):
+        found = await discover_roku(timeout, wanted=hardware_id)
+    elif hardware_id.startswith("yeelight:"):
+        found = await discover_yeelight(timeout, wanted=hardware_id)
+    else:
+        return None
+
+    for device in found:
+        if device["hardware_id"] == hardware_id:
+            return device["ip_address"]
+    return None
+
+
+async def discover_all(timeout: float) -> List[Dict[str, Any]]:
+    """Search for Roku and Yeelight devices at the same time"""
+    results = await asyncio.gather(
+        discover_roku(timeout), discover_yeelight(timeout), return_exceptions=True
+    )
+
+    devices = []
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"Error during device discovery: {result}")
+        else:
+            devices.extend(result)
+    return devices
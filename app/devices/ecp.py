@@ -0,0 +1,342 @@
+# app/devices/ecp.py
+"""Parsing of Roku External Control Protocol (ECP) responses
+
+Responses are fed to an incremental XML parser as they arrive, so each
+document is read once and parsing can stop as soon as the wanted fields have
+been seen. Results are small immutable records.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List, NamedTuple, Optional
+from xml.etree.ElementTree import Element, XMLPullParser
+import aiohttp
+
+
+class DeviceInfo(NamedTuple):
+    """Fields of /query/device-info that the controllers use"""
+
+    serial_number: str = ""
+    device_id: str = ""
+    udn: str = ""
+    vendor_name: str = ""
+    model_name: str = ""
+    model_number: str = ""
+    friendly_name: str = ""
+    software_version: str = ""
+    power_mode: str = ""
+    is_tv: bool = False
+    supports_find_remote: bool = False
+
+    @property
+    def power_on(self) -> bool:
+        return self.power_mode == "PowerOn"
+
+
+class App(NamedTuple):
+    """An installed app (or TV input) from /query/apps or /query/active-app"""
+
+    id: str
+    name: str
+    type: str = "appl"
+    version: str = ""
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "name": self.name}
+
+
+class ActiveApp(NamedTuple):
+    """The app in the foreground, None on the home screen"""
+
+    app: Optional[App] = None
+    screensaver: Optional[App] = None
+
+
+class MediaPlayer(NamedTuple):
+    """Playback state from /query/media-player"""
+
+    state: str = "close"
+    error: bool = False
+    app_id: str = ""
+    app_name: str = ""
+    position_ms: Optional[int] = None
+    duration_ms: Optional[int] = None
+    is_live: bool = False
+
+
+class Channel(NamedTuple):
+    """A channel of the TV tuner's lineup from /query/tv-channels"""
+
+    number: str  # Major.minor for digital channels, e.g. "7.1"
+    name: str = ""
+    type: str = ""  # air-digital, air-analog, ...
+    hidden: bool = False  # Hidden by the user in the channel guide
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"number": self.number, "name": self.name, "type": self.type}
+
+
+def _flag(text: Optional[str]) -> bool:
+    return (text or "").strip().lower() == "true"
+
+
+def _milliseconds(text: Optional[str]) -> Optional[int]:
+    """Parse values like "1000 ms" """
+    try:
+        return int((text or "").split()[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def _app(element: Element) -> Optional[App]:
+    """Build an App from an <app> or <screensaver> element"""
+    app_id = element.get("id")
+    if not app_id:
+        return None
+    return App(
+        id=app_id,
+        name=(element.text or "").strip(),
+        type=element.get("type", "appl"),
+        version=element.get("version", ""),
+    )
+
+
+class EcpParser(ABC):
+    """Base class for incremental ECP parsers
+
+    Subclasses handle one completed element at a time in `handle` and set
+    `done` once they have everything they need.
+    """
+
+    def __init__(self):
+        self._parser = XMLPullParser(events=("end",))
+        self.done = False
+
+    def feed(self, data: bytes) -> bool:
+        """Parse a chunk of the response, returns True once parsing can stop"""
+        self._parser.feed(data)
+        for _, element in self._parser.read_events():
+            self.handle(element)
+            if self.done:
+                break
+        return self.done
+
+    def close(self):
+        """Finish a document that was fed completely"""
+        if not self.done:
+            self._parser.close()
+            for _, element in self._parser.read_events():
+                self.handle(element)
+
+    @abstractmethod
+    def handle(self, element: Element):
+        """Take in one completed element"""
+
+    @abstractmethod
+    def result(self):
+        """What was parsed, once the document is done"""
+
+
+# <device-info> child tag -> DeviceInfo field
+_DEVICE_INFO_FIELDS = {
+    "serial-number": "serial_number",
+    "device-id": "device_id",
+    "udn": "udn",
+    "vendor-name": "vendor_name",
+    "model-name": "model_name",
+    "model-number": "model_number",
+    "friendly-device-name": "friendly_name",
+    "software-version": "software_version",
+    "power-mode": "power_mode",
+    "is-tv": "is_tv",
+    "supports-find-remote": "supports_find_remote",
+}
+_DEVICE_INFO_FLAGS = {"is_tv", "supports_find_remote"}
+
+
+class DeviceInfoParser(EcpParser):
+    """Parser for /query/device-info
+
+    With `stop_after` set to a tag, parsing ends once that element was read.
+    """
+
+    def __init__(self, stop_after: Optional[str] = None):
+        super().__init__()
+        self.stop_after = stop_after
+        self.fields: Dict[str, Any] = {}
+
+    def handle(self, element: Element):
+        field = _DEVICE_INFO_FIELDS.get(element.tag)
+        if field is not None:
+            text = (element.text or "").strip()
+            self.fields[field] = _flag(text) if field in _DEVICE_INFO_FLAGS else text
+        if element.tag == self.stop_after:
+            self.done = True
+        element.clear()
+
+    def result(self) -> DeviceInfo:
+        return DeviceInfo(**self.fields)
+
+
+class AppsParser(EcpParser):
+    """Parser for /query/apps"""
+
+    def __init__(self):
+        super().__init__()
+        self.apps: List[App] = []
+
+    def handle(self, element: Element):
+        if element.tag == "app":
+            app = _app(element)
+            if app is not None:
+                self.apps.append(app)
+            element.clear()
+
+    def result(self) -> List[App]:
+        return self.apps
+
+
+class ActiveAppParser(EcpParser):
+    """Parser for /query/active-app"""
+
+    def __init__(self):
+        super().__init__()
+        self.app: Optional[App] = None
+        self.screensaver: Optional[App] = None
+
+    def handle(self, element: Element):
+        # On the home screen the <app> element has no id
+        if element.tag == "app":
+            self.app = _app(element)
+        elif element.tag == "screensaver":
+            self.screensaver = _app(element)
+
+    def result(self) -> ActiveApp:
+        return ActiveApp(app=self.app, screensaver=self.screensaver)
+
+
+class MediaPlayerParser(EcpParser):
+    """Parser for /query/media-player"""
+
+    def __init__(self):
+        super().__init__()
+        self.fields: Dict[str, Any] = {}
+
+    def handle(self, element: Element):
+        if element.tag == "plugin":
+            self.fields["app_id"] = element.get("id", "")
+            self.fields["app_name"] = element.get("name", "")
+        elif element.tag == "position":
+            self.fields["position_ms"] = _milliseconds(element.text)
+        elif element.tag == "duration":
+            self.fields["duration_ms"] = _milliseconds(element.text)
+        elif element.tag == "is_live":
+            self.fields["is_live"] = _flag(element.text)
+        elif element.tag == "player":
+            self.fields["state"] = element.get("state", "close")
+            self.fields["error"] = _flag(element.get("error"))
+
+    def result(self) -> MediaPlayer:
+        return MediaPlayer(**self.fields)
+
+
+class ChannelsParser(EcpParser):
+    """Parser for /query/tv-channels"""
+
+    def __init__(self):
+        super().__init__()
+        self.channels: List[Channel] = []
+        self.fields: Dict[str, str] = {}
+
+    def handle(self, element: Element):
+        if element.tag == "channel":
+            number = self.fields.get("number")
+            if number:
+                self.channels.append(
+                    Channel(
+                        number=number,
+                        name=self.fields.get("name", ""),
+                        type=self.fields.get("type", ""),
+                        hidden=_flag(self.fields.get("user-hidden")),
+                    )
+                )
+            self.fields = {}
+            element.clear()
+        elif element.tag in ("number", "name", "type", "user-hidden"):
+            self.fields[element.tag] = (element.text or "").strip()
+
+    def result(self) -> List[Channel]:
+        return self.channels
+
+
+def parse(parser: EcpParser, data: bytes):
+    """Parse a complete response body"""
+    if not parser.feed(data):
+        parser.close()
+    return parser.result()
+
+
+async def read_response(response: aiohttp.ClientResponse, parser: EcpParser):
+    """Parse a response body as it is received, stopping early if possible
+
+    After an early stop the rest of the body is still read, without parsing,
+    so the keep-alive connection can be reused. Reconnecting to the TV costs
+    more than the few kilobytes of a response, so an early stop saves CPU
+    time, not network traffic.
+    """
+    async for chunk in response.content.iter_any():
+        if parser.feed(chunk):
+            async for _ in response.content.iter_any():
+                pass
+            return parser.result()
+    parser.close()
+    return parser.result()
+
+
+def find_power_mode(data: bytes) -> Optional[str]:
+    """The power mode in (the start of) a device-info document
+
+    A plain byte search: status polls need only this field, and searching
+    for it is far cheaper than parsing the XML up to it.
+    """
+    start = data.find(b"<power-mode>")
+    if start < 0:
+        return None
+    start += len(b"<power-mode>")
+    end = data.find(b"</power-mode>", start)
+    if end < 0:
+        return None
+    return data[start:end].decode().strip()
+
+
+async def read_power_mode(response: aiohttp.ClientResponse) -> Optional[str]:
+    """Find the power mode in a device-info response as it is received
+
+    The rest of the body is still read so the connection can be reused.
+    """
+    received = b""
+    power_mode = None
+    async for chunk in response.content.iter_any():
+        if power_mode is None:
+            received += chunk
+            power_mode = find_power_mode(received)
+    return power_mode
+
+
+def parse_device_info(data: bytes) -> DeviceInfo:
+    return parse(DeviceInfoParser(), data)
+
+
+def parse_apps(data: bytes) -> List[App]:
+    return parse(AppsParser(), data)
+
+
+def parse_active_app(data: bytes) -> ActiveApp:
+    return parse(ActiveAppParser(), data)
+
+
+def parse_media_player(data: bytes) -> MediaPlayer:
+    return parse(MediaPlayerParser(), data)
+
+
+def parse_channels(data: bytes) -> List[Channel]:
+    return parse(ChannelsParser(), data)
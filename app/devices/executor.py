@@ -0,0 +1,139 @@
+# app/devices/executor.py
+from typing import Dict, Any, Callable, Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import os
+import time
+import logging
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _KeyStats:
+    """Queue and timing figures for one device (or other resource key)"""
+
+    def __init__(self):
+        self.queued = 0
+        self.started = 0
+        self.running = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "queued": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "avg_wait": (
+                round(self.total_wait / self.started, 4) if self.started else 0.0
+            ),
+            "max_wait": round(self.max_wait, 4),
+        }
+
+
+class DeviceExecutor:
+    """Dedicated thread pool for blocking device I/O
+
+    Blocking work is kept off the event loop's default executor so a hung
+    device can't starve the rest of the app. Each key (a device id or a file)
+    may only run a limited number of jobs at once; the rest wait in a queue.
+    Jobs whose caller is cancelled while they are still queued never run.
+    """
+
+    def __init__(self, max_workers: int, per_key_limit: int):
+        self.max_workers = max_workers
+        self.per_key_limit = per_key_limit
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, _KeyStats] = {}
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        """The underlying thread pool, created on first use"""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="device-io"
+            )
+        return self._pool
+
+    async def run(self, key: str, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking call for a device in the pool and wait for its result"""
+        if key not in self._limits:
+            self._limits[key] = asyncio.Semaphore(self.per_key_limit)
+            self._stats[key] = _KeyStats()
+        stats = self._stats[key]
+
+        queued_at = time.monotonic()
+        stats.queued += 1
+        started = False
+        try:
+            async with self._limits[key]:
+                wait = time.monotonic() - queued_at
+                stats.queued -= 1
+                stats.started += 1
+                stats.running += 1
+                stats.total_wait += wait
+                stats.max_wait = max(stats.max_wait, wait)
+                started = True
+
+                # Cancelling this await also cancels the job if no thread has
+                # picked it up yet
+                loop = asyncio.get_running_loop()
+                try:
+                    result = await loop.run_in_executor(
+                        self.pool, partial(func, *args, **kwargs)
+                    )
+                finally:
+                    stats.running -= 1
+                stats.completed += 1
+                return result
+        except asyncio.CancelledError:
+            if not started:
+                stats.queued -= 1
+            stats.cancelled += 1
+            raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth and wait-time figures per key"""
+        return {
+            "max_workers": self.max_workers,
+            "per_key_limit": self.per_key_limit,
+            "queued": sum(stats.queued for stats in self._stats.values()),
+            "keys": {key: stats.as_dict() for key, stats in self._stats.items()},
+        }
+
+    def shutdown(self):
+        """Stop the pool, dropping jobs that haven't started"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def read_file(path: str) -> Optional[str]:
+    """Read a text file, None if it doesn't exist. Blocking, run it in the pool"""
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def write_file(path: str, text: str):
+    """Replace a text file in one step, so a crash never leaves half a file.
+    Blocking, run it in the pool"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+# Shared executor for all blocking device and storage I/O
+device_executor = DeviceExecutor(
+    max_workers=settings.DEVICE_IO_WORKERS,
+    per_key_limit=settings.DEVICE_IO_PER_DEVICE,
+)
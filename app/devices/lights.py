@@ -1,14 +1,128 @@
 # app/devices/lights.py
-from typing import Dict, Any, Optional, Union
-from yeelight import Bulb
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple, Union
 import asyncio
 import time
+import logging
+from app.config import settings
+from app.devices.yeelight_client import MusicConnection, YeelightClient, YeelightError
+from app.devices.command_queue import CommandQueue
+from app.devices.rate_limit import PRIORITY_BACKGROUND, PRIORITY_USER, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Transition used for every state change
+TRANSITION_EFFECT = "smooth"
+TRANSITION_DURATION = 300  # milliseconds
+
+STATUS_PROPERTIES = ["power", "bright", "ct", "rgb", "color_mode"]
+
+# Values of the color_mode property
+COLOR_MODE_RGB = "1"
+COLOR_MODE_CT = "2"
+
+
+def merge_state_change(pending: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge a newer light state request into a pending one
+
+    The newest value of each kind wins. rgb and color_temp are the same kind
+    (the light color), and turning the light off drops any pending targets.
+    """
+    if "power" in new and not new["power"]:
+        return {"power": False}
+
+    merged = dict(pending)
+    if "rgb" in new:
+        merged.pop("color_temp", None)
+    if "color_temp" in new:
+        merged.pop("rgb", None)
+    merged.update(new)
+    return merged
+
+
+def compile_state_change(
+    state: Dict[str, Any],
+    properties: Dict[str, str],
+    transition: Optional[List[Any]] = None,
+) -> Tuple[List[Tuple[str, List[Any]]], Dict[str, str]]:
+    """Compile a requested state into the fewest Yeelight commands
+
+    A single attribute change uses the matching smooth-transition command.
+    Several attributes on a light that is on, or any change that turns the
+    light on, are folded into one set_scene call, which sets power, color
+    and brightness together. A light that is off and not asked to turn on
+    gets one command per attribute and stays off.
+
+    Returns the commands to send and the property values they result in.
+    """
+    if transition is None:
+        transition = [TRANSITION_EFFECT, TRANSITION_DURATION]
+
+    if "power" in state and not state["power"]:
+        return [("set_power", ["off"] + transition)], {"power": "off"}
+
+    brightness = rgb = color_temp = None
+    if "brightness" in state:
+        brightness = min(max(int(state["brightness"]), 1), 100)
+    if "color_temp" in state:
+        color_temp = min(max(int(state["color_temp"]), 1700), 6500)
+    if "rgb" in state:
+        r, g, b = state["rgb"]
+        rgb = (int(r) << 16) + (int(g) << 8) + int(b)
+        color_temp = None  # The color wins, as it was applied last before
+
+    is_on = properties.get("power") == "on"
+    needs_power_on = bool(state.get("power")) and not is_on
+    requested = [value for value in (brightness, color_temp, rgb) if value is not None]
+
+    if not requested:
+        if state.get("power"):
+            return [("set_power", ["on"] + transition)], {"power": "on"}
+        return [], {}
+
+    # set_scene also switches the light on, so an off light that wasn't asked
+    # to turn on gets the individual commands instead (sent pipelined)
+    if not needs_power_on and (len(requested) == 1 or not is_on):
+        commands = []
+        changes: Dict[str, str] = {}
+        if brightness is not None:
+            commands.append(("set_bright", [brightness] + transition))
+            changes["bright"] = str(brightness)
+        if color_temp is not None:
+            commands.append(("set_ct_abx", [color_temp] + transition))
+            changes.update({"ct": str(color_temp), "color_mode": COLOR_MODE_CT})
+        if rgb is not None:
+            commands.append(("set_rgb", [rgb] + transition))
+            changes.update({"rgb": str(rgb), "color_mode": COLOR_MODE_RGB})
+        return commands, changes
+
+    # Keep the current color when only the brightness is given
+    if brightness is None:
+        brightness = int(properties.get("bright") or 100)
+    if rgb is None and color_temp is None:
+        if properties.get("color_mode") == COLOR_MODE_RGB and properties.get("rgb"):
+            rgb = int(properties["rgb"])
+        else:
+            color_temp = int(properties.get("ct") or 4000)
+
+    changes = {"power": "on", "bright": str(brightness)}
+    if rgb is not None:
+        changes.update({"rgb": str(rgb), "color_mode": COLOR_MODE_RGB})
+        return [("set_scene", ["color", rgb, brightness])], changes
+
+    changes.update({"ct": str(color_temp), "color_mode": COLOR_MODE_CT})
+    return [("set_scene", ["ct", color_temp, brightness])], changes
 
 
 class YeelightController:
     """Controller for Yeelight bulbs"""
 
-    def __init__(self, ip_address: Union[str, Dict], name: str = "", room: str = ""):
+    def __init__(
+        self,
+        ip_address: Union[str, Dict],
+        name: str = "",
+        room: str = "",
+        hardware_id: Optional[str] = None,
+    ):
         # Handle both string and dictionary IP address formats
         if isinstance(ip_address, dict) and "ip" in ip_address:
             self.ip_address = ip_address["ip"]
@@ -21,39 +135,114 @@ class YeelightController:
         self.name = name
         self.room = room
         self.type = "light"
-        self.bulb = Bulb(
-            self.ip_address, effect="smooth", duration=300
-        )  # Smoother transitions
-        self.last_command_time = 0
+        self.hardware_id = hardware_id  # Stable id from discovery, e.g. yeelight:0x...
+        self.client = YeelightClient(
+            self.ip_address,
+            timeout=settings.YEELIGHT_COMMAND_TIMEOUT,
+            connect_timeout=settings.YEELIGHT_CONNECT_TIMEOUT,
+        )
+        self.client.notification_callbacks.append(self._on_notification)
+        self.client.resolve_address = self._resolve_address
+
+        # Last known bulb properties, kept current by props notifications
+        self.properties: Dict[str, str] = {}
         self.min_command_interval = 0.5  # Minimum time between commands in seconds
+        self.command_queue = CommandQueue(
+            self._apply_state,
+            min_interval=self.min_command_interval,
+            merge=merge_state_change,
+        )
+
+        # Bulbs only accept about 60 commands per minute per connection
+        self.budget = TokenBucket(
+            settings.YEELIGHT_QUOTA_PER_MINUTE,
+            period=60.0,
+            reserve=settings.YEELIGHT_BACKGROUND_RESERVE,
+        )
+
+        # Music mode has no quota, used for sustained high-rate traffic
+        self.music = MusicConnection(timeout=settings.YEELIGHT_COMMAND_TIMEOUT)
+        self._music_idle_task: Optional[asyncio.Task] = None
+        self._music_retry_at = 0.0
+        self._music_streams = 0  # Open frame streams, each holds music mode
+        self._music_lock = asyncio.Lock()
+        self._last_command_at = 0.0
+
+        # Called with the new state after a command, set by the device registry
+        self.on_state_change: Optional[Callable[..., None]] = None
+
+        # Called when the bulb can't be reached, returns its new IP address if
+        # it moved. Set by the device registry.
+        self.on_unreachable: Optional[Callable[[], Awaitable[Optional[str]]]] = None
+
+    def _state_changed(self, state: Optional[Dict[str, Any]] = None):
+        """Report that a command changed (or may have changed) the light state"""
+        if self.on_state_change is not None:
+            self.on_state_change(state)
 
-    async def _rate_limit(self):
-        """Ensure we don't flood the device with commands"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_command_time
-        if time_since_last < self.min_command_interval:
-            await asyncio.sleep(self.min_command_interval - time_since_last)
-        self.last_command_time = time.time()
+    def set_ip_address(self, ip_address: str):
+        """Point the controller at the bulb's new IP address"""
+        self.ip_address = ip_address
+        self.client.ip_address = ip_address
+
+    async def _resolve_address(self) -> Optional[str]:
+        """Ask the registry where the bulb went after a failed connection"""
+        if self.on_unreachable is None:
+            return None
+        return await self.on_unreachable()
+
+    def get_budget(self) -> Dict[str, Any]:
+        """Get the command budget usage of this light"""
+        usage = self.budget.usage()
+        usage["music_mode"] = self.music.active
+        return usage
+
+    @property
+    def push_updates(self) -> bool:
+        """Whether state changes are currently pushed to us by the bulb"""
+        return self.client.connected and bool(self.properties)
+
+    def _on_notification(self, message: Dict[str, Any]):
+        """Apply a props notification sent by the bulb"""
+        if message.get("method") != "props" or not self.properties:
+            return
+
+        self.properties.update(
+            {key: str(value) for key, value in message.get("params", {}).items()}
+        )
+        self._state_changed(self._build_status())
+
+    def _build_status(self) -> Dict[str, Any]:
+        """Build a status response from the last known properties"""
+        return {
+            "power": self.properties.get("power") == "on",
+            "brightness": int(self.properties.get("bright") or 100),
+            "color_temp": int(self.properties.get("ct") or 4000),
+            "rgb": self.properties.get("rgb", "0"),
+            "name": self.name,
+            "room": self.room,
+            "type": self.type,
+            "ip_address": self.ip_address,
+        }
 
     async def get_status(self) -> Dict[str, Any]:
-        """Get the current status of the light"""
-        await self._rate_limit()
+        """Get the current status of the light
 
+        Status reads are background work: when the command budget is down to
+        the part reserved for user commands, the last known state is returned
+        instead of reading the bulb.
+        """
         try:
-            # Run in a separate thread since Yeelight lib is blocking
-            loop = asyncio.get_running_loop()
-            properties = await loop.run_in_executor(None, self.bulb.get_properties)
+            if self.properties and (
+                self.music.active or not self.budget.try_acquire(PRIORITY_BACKGROUND)
+            ):
+                return self._build_status()
+            if not self.properties:
+                await self.budget.acquire(PRIORITY_BACKGROUND)
 
-            return {
-                "power": properties.get("power") == "on",
-                "brightness": int(properties.get("bright", 100)),
-                "color_temp": int(properties.get("ct", 4000)),
-                "rgb": properties.get("rgb", "0"),
-                "name": self.name,
-                "room": self.room,
-                "type": self.type,
-                "ip_address": self.ip_address,
-            }
+            self.properties.update(await self.client.get_properties(STATUS_PROPERTIES))
+
+            return self._build_status()
         except Exception as e:
             return {
                 "error": str(e),
@@ -65,40 +254,158 @@ class YeelightController:
             }
 
     async def set_state(self, **kwargs) -> Dict[str, Any]:
-        """Update the state of the light"""
-        await self._rate_limit()
-        loop = asyncio.get_running_loop()
+        """Update the state of the light
+
+        Requests made while an earlier change is still being sent are merged,
+        so a burst of slider updates only sends the newest target and every
+        caller gets the resulting state.
+        """
+        return await self.command_queue.submit(kwargs)
 
+    async def _apply_state(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a (merged) state change to the bulb"""
         try:
-            # Process each parameter
-            if "power" in kwargs:
-                if kwargs["power"]:
-                    await loop.run_in_executor(None, self.bulb.turn_on)
-                else:
-                    await loop.run_in_executor(None, self.bulb.turn_off)
-
-            if "brightness" in kwargs and kwargs.get("power") != False:
-                brightness = min(max(int(kwargs["brightness"]), 1), 100)
-                await loop.run_in_executor(
-                    None, lambda: self.bulb.set_brightness(brightness)
+            # Scenes need the current brightness and color mode to fill the gaps
+            if not self.properties:
+                await self.budget.acquire(PRIORITY_USER)
+                self.properties.update(
+                    await self.client.get_properties(STATUS_PROPERTIES)
                 )
 
-            if "color_temp" in kwargs and kwargs.get("power") != False:
-                color_temp = int(kwargs["color_temp"])
-                await loop.run_in_executor(
-                    None, lambda: self.bulb.set_color_temp(color_temp)
+            commands, changes = compile_state_change(state, self.properties)
+            await self._send_commands(commands)
+
+            # Every command was acknowledged, so the new state is known
+            self.properties.update(changes)
+            status = self._build_status()
+            self._state_changed(status)
+            return status
+        except Exception as e:
+            self._state_changed()
+            return {"error": str(e), "status": "error"}
+
+    async def _send_commands(self, commands: List[Tuple[str, List[Any]]]):
+        """Send user commands in music mode if active, otherwise within budget"""
+        if not commands:
+            return
+        self._last_command_at = time.monotonic()
+
+        if not self.music.active and self._wants_music_mode():
+            await self.start_music_mode()
+
+        if self.music.active:
+            for method, params in commands:
+                self.music.send(method, params)
+            await self.music.drain()
+            self.budget.record(len(commands))
+            return
+
+        await self.budget.acquire(PRIORITY_USER, len(commands))
+
+        # Pipeline the commands over the bulb connection
+        await self.client.connect()
+        await asyncio.gather(
+            *(self.client.send_command(method, params) for method, params in commands)
+        )
+
+    def send_frame(self, state: Dict[str, Any]):
+        """Write a streaming frame in music mode without waiting for the bulb"""
+        commands, changes = compile_state_change(
+            state, self.properties, transition=["sudden", 0]
+        )
+        for method, params in commands:
+            self.music.send(method, params)
+
+        self.properties.update(changes)
+        self.budget.record(len(commands))
+        self._last_command_at = time.monotonic()
+
+    def _wants_music_mode(self) -> bool:
+        """Whether recent traffic is high enough to exhaust the command quota"""
+        if not settings.YEELIGHT_AUTO_MUSIC_MODE:
+            return False
+        if time.monotonic() < self._music_retry_at:
+            return False
+        rate = self.budget.recent_rate(settings.YEELIGHT_MUSIC_MODE_WINDOW)
+        return rate >= self.budget.rate * settings.YEELIGHT_MUSIC_MODE_THRESHOLD
+
+    async def start_music_mode(self) -> bool:
+        """Switch the bulb to music mode, returns whether it is active"""
+        # Concurrent callers share one music connection
+        async with self._music_lock:
+            if self.music.active:
+                return True
+
+            try:
+                await self.budget.acquire(PRIORITY_USER)
+                await self.music.open(self.client)
+            except (YeelightError, OSError) as e:
+                logger.warning(f"Could not start music mode on {self.name}: {e}")
+                self._music_retry_at = (
+                    time.monotonic() + settings.YEELIGHT_MUSIC_MODE_IDLE
                 )
+                return False
 
-            if "rgb" in kwargs and kwargs.get("power") != False:
-                r, g, b = kwargs["rgb"]
-                await loop.run_in_executor(None, lambda: self.bulb.set_rgb(r, g, b))
+        logger.info(f"Started music mode on {self.name}")
+        self._last_command_at = time.monotonic()
+        if self._music_idle_task is None or self._music_idle_task.done():
+            self._music_idle_task = asyncio.create_task(self._stop_music_when_idle())
+        return True
 
-            # Add a small delay after commands to avoid flooding the network
-            await asyncio.sleep(0.2)
+    async def acquire_music_mode(self) -> bool:
+        """Start or join music mode for a frame stream
 
-            return await self.get_status()
-        except Exception as e:
-            return {"error": str(e), "status": "error"}
+        Music mode stays on until every stream that acquired it has
+        released it. Returns whether it is active.
+        """
+        if not await self.start_music_mode():
+            return False
+        self._music_streams += 1
+        return True
+
+    async def release_music_mode(self):
+        """Leave music mode once the last frame stream is done with it"""
+        self._music_streams = max(self._music_streams - 1, 0)
+        if not self._music_streams:
+            await self.stop_music_mode()
+
+    async def stop_music_mode(self):
+        """Leave music mode and go back to quota-limited commands"""
+        if self._music_idle_task is not None:
+            if self._music_idle_task is not asyncio.current_task():
+                self._music_idle_task.cancel()
+            self._music_idle_task = None
+        if self.music.active:
+            await self.music.close(self.client)
+            logger.info(f"Stopped music mode on {self.name}")
+
+            # Music mode sends no notifications, publish where we ended up
+            self._state_changed(self._build_status())
+
+    async def _stop_music_when_idle(self):
+        """Leave music mode once commands have stopped for a while"""
+        idle = settings.YEELIGHT_MUSIC_MODE_IDLE
+        while self.music.active:
+            remaining = self._last_command_at + idle - time.monotonic()
+            if self._music_streams:
+                # A paused stream still holds music mode
+                remaining = idle
+            elif remaining <= 0:
+                await self.stop_music_mode()
+                return
+            await asyncio.sleep(remaining)
+
+    async def open(self):
+        """Connect to the bulb so the first command doesn't pay for setup"""
+        try:
+            await self.client.connect()
+        except YeelightError as e:
+            logger.warning(f"Yeelight {self.name} not reachable yet: {e}")
+
+    async def close(self):
+        """Close the connection to the bulb"""
+        await self.stop_music_mode()
+        await self.client.close()
 
     async def turn_on(self) -> Dict[str, Any]:
         """Turn the light on"""
@@ -110,4 +417,49 @@ class YeelightController:
 
     def get_config(self) -> Dict[str, Any]:
         """Get configuration data for this device"""
-        return {"ip_address": self.ip_address, "name": self.name, "room": self.room}
+        config = {"ip_address": self.ip_address, "name": self.name, "room": self.room}
+        if self.hardware_id:
+            config["hardware_id"] = self.hardware_id
+        return config
+
+
+class FrameStream:
+    """Pushes a stream of frames to a light in music mode
+
+    Only the newest frame is kept: frames that arrive while the previous one
+    is still being written (or before the pacing interval is over) replace
+    each other, so a slow link drops stale frames instead of queueing them.
+    """
+
+    def __init__(self, controller: YeelightController, max_fps: float = 30.0):
+        self.controller = controller
+        self.interval = 1.0 / max_fps
+        self.latest: Optional[Dict[str, Any]] = None
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+
+    def push(self, frame: Dict[str, Any]):
+        """Offer a frame, replacing any frame that hasn't been sent yet"""
+        if self.latest is None:
+            self.latest = dict(frame)
+        else:
+            self.dropped += 1
+            self.latest = merge_state_change(self.latest, frame)
+        self.ready.set()
+
+    async def run(self):
+        """Send frames until cancelled or the music connection closes"""
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            frame, self.latest = self.latest, None
+
+            # Wait for the socket buffer to drain before writing more
+            await self.controller.music.drain()
+            if not self.controller.music.active:
+                raise YeelightError("Music mode connection closed")
+
+            self.controller.send_frame(frame)
+            self.sent += 1
+            await asyncio.sleep(self.interval)
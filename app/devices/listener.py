@@ -0,0 +1,73 @@
+# app/devices/listener.py
+from typing import Dict
+import asyncio
+import logging
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationListener:
+    """Keeps a notification connection open to every Yeelight bulb
+
+    Bulbs push a props notification on their open connections whenever their
+    state changes, including changes made from the wall switch or the vendor
+    app. The controllers apply those to their cached state; this listener only
+    makes sure each bulb stays connected and reconnects with backoff when a
+    connection drops.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.running = False
+
+    def start(self):
+        """Start listening to every light in the registry"""
+        self.running = True
+        for device_id in self.registry.devices:
+            self.track(device_id)
+
+    def track(self, device_id: str):
+        """Start listening to a device if it supports push notifications"""
+        controller = self.registry.get_device(device_id)
+        if not hasattr(controller, "push_updates"):
+            return
+        if self.running and device_id not in self.tasks:
+            self.tasks[device_id] = asyncio.create_task(self._listen(device_id))
+
+    async def stop(self):
+        """Stop all listening tasks"""
+        self.running = False
+        for task in self.tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        self.tasks.clear()
+
+    async def _listen(self, device_id: str):
+        """Hold the connection to a bulb open until cancelled"""
+        delay = settings.LISTENER_RETRY_MIN
+        while True:
+            controller = self.registry.get_device(device_id)
+            if controller is None:
+                return
+
+            # Connect explicitly, get_status may answer from the cache (in
+            # music mode or on a low budget) without reconnecting. Reading the
+            # state picks up anything that changed while we were disconnected.
+            try:
+                await controller.client.connect()
+            except Exception as e:
+                status = {"status": "error", "error": str(e)}
+            else:
+                status = await controller.get_status()
+            if status.get("status") == "error":
+                logger.debug(f"Listener for {device_id} retrying in {delay}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, settings.LISTENER_RETRY_MAX)
+                continue
+
+            self.registry.poller.record_state(device_id, status)
+            delay = settings.LISTENER_RETRY_MIN
+            await controller.client.wait_disconnected()
+            logger.info(f"Lost notification connection to {device_id}")
@@ -0,0 +1,136 @@
+# app/devices/poller.py
+from typing import Dict, Any, List, Optional
+import asyncio
+import time
+import logging
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceShadow:
+    """In-memory copy of the last state reported by a device"""
+
+    def __init__(self, device_id: str):
+        self.device_id = device_id
+        self.state: Optional[Dict[str, Any]] = None
+        self.updated_at: Optional[float] = None
+        self.wakeup = asyncio.Event()
+        self.subscribers: List[asyncio.Queue] = []
+
+    def update(self, state: Dict[str, Any]):
+        """Replace the shadow state with a fresh reading"""
+        changed = state != self.state
+        self.state = state
+        self.updated_at = time.monotonic()
+
+        if changed:
+            for queue in self.subscribers:
+                # Subscribers only care about the latest state
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(state)
+
+    def subscribe(self) -> asyncio.Queue:
+        """Get a queue that receives the state whenever it changes"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        """Stop delivering state changes to a queue from subscribe"""
+        if queue in self.subscribers:
+            self.subscribers.remove(queue)
+
+    def age(self) -> Optional[float]:
+        """Seconds since the shadow state was last updated"""
+        if self.updated_at is None:
+            return None
+        return time.monotonic() - self.updated_at
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get a copy of the state annotated with how old it is"""
+        snapshot = dict(self.state or {})
+        age = self.age()
+        snapshot["state_age"] = round(age, 3) if age is not None else None
+        return snapshot
+
+
+class StatePoller:
+    """Background poller that keeps a shadow state for every registered device"""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.shadows: Dict[str, DeviceShadow] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.running = False
+
+    def get_shadow(self, device_id: str) -> DeviceShadow:
+        """Get the shadow for a device, creating it if needed"""
+        if device_id not in self.shadows:
+            self.shadows[device_id] = DeviceShadow(device_id)
+        return self.shadows[device_id]
+
+    def start(self):
+        """Start polling every device in the registry"""
+        self.running = True
+        for device_id in self.registry.devices:
+            self.track(device_id)
+
+    def track(self, device_id: str):
+        """Start polling a device if the poller is running"""
+        self.get_shadow(device_id)
+        if self.running and device_id not in self.tasks:
+            self.tasks[device_id] = asyncio.create_task(self._poll_device(device_id))
+
+    async def stop(self):
+        """Stop all polling tasks"""
+        self.running = False
+        for task in self.tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        self.tasks.clear()
+
+    def record_state(self, device_id: str, state: Dict[str, Any]):
+        """Store a state reading obtained outside the polling loop"""
+        self.get_shadow(device_id).update(state)
+
+    def request_refresh(self, device_id: str):
+        """Wake the polling loop of a device so it re-reads the state now"""
+        self.get_shadow(device_id).wakeup.set()
+
+    def get_interval(self, device_type: str) -> float:
+        """Get the base polling interval for a device type"""
+        return settings.POLL_INTERVALS.get(device_type, settings.POLL_INTERVAL_DEFAULT)
+
+    async def _poll_device(self, device_id: str):
+        """Poll a device until cancelled, backing off while it's unreachable"""
+        shadow = self.get_shadow(device_id)
+        failures = 0
+
+        while True:
+            controller = self.registry.get_device(device_id)
+            if controller is None:
+                return
+
+            # Clear before reading so commands sent mid-read trigger another pass
+            shadow.wakeup.clear()
+            statuses = await self.registry.get_statuses({device_id: controller})
+            shadow.update(statuses[device_id])
+
+            if shadow.state.get("status") == "error":
+                failures += 1
+            else:
+                failures = 0
+
+            interval = self.get_interval(getattr(controller, "type", "unknown"))
+            interval *= min(2**failures, settings.POLL_MAX_BACKOFF)
+
+            # Devices that push their own changes only need an occasional check
+            if getattr(controller, "push_updates", False):
+                interval = max(interval, settings.POLL_INTERVAL_PUSH)
+
+            try:
+                await asyncio.wait_for(shadow.wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
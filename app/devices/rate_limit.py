@@ -0,0 +1,82 @@
+# app/devices/rate_limit.py
+from typing import Dict, Any, Deque
+from collections import deque
+import asyncio
+import time
+
+# Command priorities, user commands may use the whole budget
+PRIORITY_USER = "user"
+PRIORITY_BACKGROUND = "background"
+
+
+class TokenBucket:
+    """Command budget modelled on a device's per-connection quota
+
+    The bucket holds up to `capacity` tokens and refills at capacity/period
+    tokens per second. Background work can't take the last `reserve` tokens,
+    which are kept for user-initiated commands.
+    """
+
+    def __init__(self, capacity: int, period: float = 60.0, reserve: int = 0):
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period
+        self.reserve = min(reserve, capacity - 1)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.history: Deque[float] = deque()
+        self.throttled = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        # Keep one period of history for the usage figures
+        while self.history and self.history[0] < now - self.period:
+            self.history.popleft()
+
+    def _floor(self, priority: str) -> int:
+        return self.reserve if priority == PRIORITY_BACKGROUND else 0
+
+    def record(self, count: int = 1):
+        """Record commands that were sent without using the budget"""
+        now = time.monotonic()
+        self.history.extend([now] * count)
+
+    def try_acquire(self, priority: str = PRIORITY_USER, count: int = 1) -> bool:
+        """Take tokens if enough are available for this priority"""
+        self._refill()
+        if self.tokens - count < self._floor(priority):
+            return False
+        self.tokens -= count
+        self.record(count)
+        return True
+
+    async def acquire(self, priority: str = PRIORITY_USER, count: int = 1):
+        """Wait until enough tokens are available and take them"""
+        count = min(count, self.capacity)
+        if self.try_acquire(priority, count):
+            return
+
+        self.throttled += 1
+        while not self.try_acquire(priority, count):
+            missing = count + self._floor(priority) - self.tokens
+            await asyncio.sleep(max(missing / self.rate, 0.01))
+
+    def recent_rate(self, window: float) -> float:
+        """Commands per second over the last `window` seconds"""
+        since = time.monotonic() - window
+        return sum(1 for sent_at in self.history if sent_at >= since) / window
+
+    def usage(self) -> Dict[str, Any]:
+        """Current budget figures"""
+        self._refill()
+        return {
+            "capacity": self.capacity,
+            "period": self.period,
+            "available": round(self.tokens, 1),
+            "used_last_period": len(self.history),
+            "background_reserve": self.reserve,
+            "throttled": self.throttled,
+        }
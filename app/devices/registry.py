@@ -1,11 +1,15 @@
 # app/devices/registry.py
-import os
 import json
 import asyncio
+import time
 from typing import Dict, List, Optional, Any
-import aiofiles
+from functools import partial
 from app.config import settings
 from app.devices.lights import YeelightController
+from app.devices.poller import StatePoller
+from app.devices.listener import NotificationListener
+from app.devices.executor import device_executor, read_file, write_file
+from app.devices.discovery import discover_all, resolve
 from app.devices.tv import RokuController
 import logging
 
@@ -21,31 +25,43 @@ class DeviceRegistry:
         if cls._instance is None:
             cls._instance = super(DeviceRegistry, cls).__new__(cls)
             cls._instance.devices = {}
+            cls._instance.hardware_index = {}  # hardware id -> device id
+            cls._instance._relocating = {}
+            cls._instance._relocated_at = {}
             cls._instance.initialized = False
+            cls._instance.poller = StatePoller(cls._instance)
+            cls._instance.listener = NotificationListener(cls._instance)
         return cls._instance
 
     async def load_devices(self):
         """Load devices from file"""
-        if os.path.exists(settings.DEVICES_FILE):
-            try:
-                async with aiofiles.open(settings.DEVICES_FILE, mode="r") as f:
-                    content = await f.read()
-                    device_data = json.loads(content)
-
-                    # Initialize controllers
-                    for device_id, device in device_data.items():
-                        await self.create_device_controller(
+        try:
+            content = await device_executor.run(
+                settings.DEVICES_FILE, read_file, settings.DEVICES_FILE
+            )
+            if content is not None:
+                device_data = json.loads(content)
+
+                # Initialize controllers
+                await asyncio.gather(
+                    *(
+                        self.create_device_controller(
                             device_id, device["type"], device.get("config", {})
                         )
+                        for device_id, device in device_data.items()
+                    )
+                )
 
-                    logger.info(f"Loaded {len(device_data)} devices from file")
-            except Exception as e:
-                logger.error(f"Error loading devices: {e}")
+                logger.info(f"Loaded {len(device_data)} devices from file")
+        except Exception as e:
+            logger.error(f"Error loading devices: {e}")
 
         # Initialize devices from environment variables if none were loaded
         if not self.devices:
             print("Discovering devices")
             await self.discover_devices()
+        elif settings.DISCOVERY_ENABLED:
+            await self.merge_discovered(await discover_all(settings.DISCOVERY_TIMEOUT))
 
         self.initialized = True
 
@@ -69,24 +85,36 @@ class DeviceRegistry:
 
                 device_data[device_id] = device_info
 
-            async with aiofiles.open(settings.DEVICES_FILE, mode="w") as f:
-                await f.write(json.dumps(device_data, indent=2))
+            await device_executor.run(
+                settings.DEVICES_FILE,
+                write_file,
+                settings.DEVICES_FILE,
+                json.dumps(device_data, indent=2),
+            )
 
             logger.info(f"Saved {len(device_data)} devices to file")
         except Exception as e:
             logger.error(f"Error saving devices: {e}")
 
     async def discover_devices(self):
-        """Discover devices from configuration"""
+        """Discover devices from configuration and the local network
+
+        Configured devices are set up while the SSDP searches run, then any
+        device that answered and isn't configured is added as well.
+        """
+        search = None
+        if settings.DISCOVERY_ENABLED:
+            search = asyncio.create_task(discover_all(settings.DISCOVERY_TIMEOUT))
+
+        configured = []
+
         # Add Yeelight devices
         for idx, light_info in enumerate(settings.YEELIGHT_IP_ADDRESSES):
-            try:
-                # Create a unique ID for each light based on room and position
-                room_name = light_info["room"]
-                device_id = f"light_{idx+1}"  # Keep consistent IDs for now
-
-                await self.create_device_controller(
-                    device_id,
+            # Create a unique ID for each light based on room and position
+            room_name = light_info["room"]
+            configured.append(
+                (
+                    f"light_{idx+1}",  # Keep consistent IDs for now
                     "light",
                     {
                         "ip_address": light_info["ip"],
@@ -94,18 +122,12 @@ class DeviceRegistry:
                         "room": room_name,  # Set the correct room
                     },
                 )
-                logger.info(f"Added light controller for {device_id} in {room_name}")
-
-                # Add a small delay between device initializations
-                await asyncio.sleep(0.5)
-
-            except Exception as e:
-                logger.error(f"Error adding Yeelight at {light_info['ip']}: {e}")
+            )
 
         # Add Roku TV
         if settings.ROKU_IP_ADDRESS:
-            try:
-                await self.create_device_controller(
+            configured.append(
+                (
                     "tv_1",
                     "tv",
                     {
@@ -114,9 +136,168 @@ class DeviceRegistry:
                         "room": "Living Room",
                     },
                 )
-                logger.info(f"Added TV controller using IP {settings.ROKU_IP_ADDRESS}")
-            except Exception as e:
-                logger.error(f"Error adding Roku TV: {e}")
+            )
+
+        results = await asyncio.gather(
+            *(
+                self.create_device_controller(device_id, device_type, config)
+                for device_id, device_type, config in configured
+            )
+        )
+        for (device_id, _, config), added in zip(configured, results):
+            if not added:
+                logger.error(f"Error adding {device_id} at {config['ip_address']}")
+
+        if search is not None:
+            await self.merge_discovered(await search)
+
+    async def merge_discovered(self, found: List[Dict[str, Any]]):
+        """Match discovered devices to known ones and add the rest
+
+        Known devices found at a new IP address are moved there. The device
+        file is saved if anything changed.
+        """
+        found_ips = {(device["type"], device["ip_address"]) for device in found}
+        changed = False
+        new_devices = []
+        for device in found:
+            known = self.find_device(
+                device["type"], device["hardware_id"], device["ip_address"]
+            )
+            if known is None:
+                known = self._find_moved_device(device["type"], found_ips)
+            if known is not None:
+                # Remember the hardware id of devices configured by IP
+                if not getattr(known, "hardware_id", None):
+                    known.hardware_id = device["hardware_id"]
+                    changed = True
+                if known.ip_address != device["ip_address"]:
+                    logger.info(
+                        f"{known.name} moved from {known.ip_address} "
+                        f"to {device['ip_address']}"
+                    )
+                    known.set_ip_address(device["ip_address"])
+                    changed = True
+                self._index_devices()
+                continue
+
+            device_id = self._next_device_id(
+                device["type"], [device_id for device_id, _, _ in new_devices]
+            )
+            config = {
+                "ip_address": device["ip_address"],
+                "name": device["name"],
+                "room": "Unknown" if device["type"] == "light" else "Living Room",
+                "hardware_id": device["hardware_id"],
+            }
+            new_devices.append((device_id, device["type"], config))
+
+        await asyncio.gather(
+            *(
+                self.create_device_controller(device_id, device_type, config)
+                for device_id, device_type, config in new_devices
+            )
+        )
+        if new_devices:
+            logger.info(f"Discovered {len(new_devices)} new devices on the network")
+
+        if changed or new_devices:
+            await self.save_devices()
+
+    def _find_moved_device(self, device_type: str, found_ips: set):
+        """The known device an unmatched discovered device most likely is
+
+        A device configured by IP without a hardware id can't be matched once
+        its address changed. If exactly one such device of the type didn't
+        answer at its configured address, it is taken to be the one that
+        moved. With more than one candidate the match would be a guess.
+        """
+        candidates = [
+            controller
+            for controller in self.devices.values()
+            if getattr(controller, "type", None) == device_type
+            and not getattr(controller, "hardware_id", None)
+            and (device_type, controller.ip_address) not in found_ips
+        ]
+        return candidates[0] if len(candidates) == 1 else None
+
+    def find_device(self, device_type: str, hardware_id: str, ip_address: str):
+        """Find a known device by hardware id, falling back to its IP address"""
+        controller = self.get_device_by_hardware_id(hardware_id)
+        if controller is not None:
+            return controller
+
+        for controller in self.devices.values():
+            if (
+                getattr(controller, "type", None) == device_type
+                and getattr(controller, "ip_address", None) == ip_address
+            ):
+                return controller
+        return None
+
+    def _index_devices(self):
+        """Rebuild the hardware id index from the controllers"""
+        self.hardware_index = {
+            controller.hardware_id: device_id
+            for device_id, controller in self.devices.items()
+            if getattr(controller, "hardware_id", None)
+        }
+
+    def get_device_by_hardware_id(self, hardware_id: str):
+        """Get a device controller by its Yeelight id or Roku serial"""
+        device_id = self.hardware_index.get(hardware_id)
+        if device_id is None:
+            # Controllers learn their hardware id from the device after setup
+            self._index_devices()
+            device_id = self.hardware_index.get(hardware_id)
+        return self.devices.get(device_id) if device_id else None
+
+    async def relocate_device(self, device_id: str) -> Optional[str]:
+        """Find the new IP address of a device that stopped answering
+
+        Concurrent failures share one lookup, and a device is looked up at most
+        once per RESOLVE_COOLDOWN so one that is simply off stays cheap.
+        Returns the new address, or None if the device didn't move.
+        """
+        controller = self.devices.get(device_id)
+        hardware_id = getattr(controller, "hardware_id", None)
+        if not hardware_id or not settings.DISCOVERY_ENABLED:
+            return None
+
+        task = self._relocating.get(device_id)
+        if task is None:
+            last = self._relocated_at.get(device_id)
+            if last is not None and time.monotonic() - last < settings.RESOLVE_COOLDOWN:
+                return None
+            self._relocated_at[device_id] = time.monotonic()
+            task = asyncio.create_task(self._relocate(device_id, hardware_id))
+            self._relocating[device_id] = task
+            task.add_done_callback(lambda _: self._relocating.pop(device_id, None))
+
+        return await asyncio.shield(task)
+
+    async def _relocate(self, device_id: str, hardware_id: str) -> Optional[str]:
+        controller = self.devices[device_id]
+        try:
+            ip_address = await resolve(hardware_id, settings.RESOLVE_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Error looking up {device_id} ({hardware_id}): {e}")
+            return None
+
+        if not ip_address or ip_address == controller.ip_address:
+            return None
+
+        logger.info(f"{device_id} moved from {controller.ip_address} to {ip_address}")
+        controller.set_ip_address(ip_address)
+        await self.save_devices()
+        return ip_address
+
+    def _next_device_id(self, device_type: str, reserved: List[str]) -> str:
+        """First free id of the form light_<n> or tv_<n>"""
+        n = 1
+        while f"{device_type}_{n}" in self.devices or f"{device_type}_{n}" in reserved:
+            n += 1
+        return f"{device_type}_{n}"
 
     async def create_device_controller(
         self, device_id: str, device_type: str, config: Dict[str, Any]
@@ -128,13 +309,17 @@ class DeviceRegistry:
                     ip_address=config["ip_address"],
                     name=config.get("name", device_id),
                     room=config.get("room", "Unknown"),
+                    hardware_id=config.get("hardware_id"),
                 )
                 self.devices[device_id] = controller
                 logger.info(f"Added light controller for {device_id}")
 
             elif device_type == "tv":
                 controller = RokuController(
-                    ip_address=config["ip_address"], name=config.get("name", device_id)
+                    ip_address=config["ip_address"],
+                    name=config.get("name", device_id),
+                    room=config.get("room", "Living Room"),
+                    hardware_id=config.get("hardware_id"),
                 )
                 self.devices[device_id] = controller
                 logger.info(f"Added TV controller for {device_id}")
@@ -143,11 +328,54 @@ class DeviceRegistry:
                 logger.error(f"Unknown device type: {device_type}")
                 return False
 
+            controller.on_state_change = partial(self._on_state_change, device_id)
+            controller.on_unreachable = partial(self.relocate_device, device_id)
+            if getattr(controller, "hardware_id", None):
+                self.hardware_index[controller.hardware_id] = device_id
+
+            if hasattr(controller, "open"):
+                await controller.open()
+
+            self.poller.track(device_id)
+            self.listener.track(device_id)
+
             return True
         except Exception as e:
             logger.error(f"Error creating controller for {device_id}: {e}")
             return False
 
+    def start_polling(self):
+        """Start keeping the shadow state of every device up to date"""
+        self.poller.start()
+
+    async def stop_polling(self):
+        """Stop the background state poller"""
+        await self.poller.stop()
+
+    def start_listening(self):
+        """Start receiving pushed state changes from devices that support it"""
+        self.listener.start()
+
+    async def stop_listening(self):
+        """Stop the device notification listener"""
+        await self.listener.stop()
+
+    def _on_state_change(self, device_id: str, state: Optional[Dict[str, Any]] = None):
+        """Update the shadow state after a command was sent to a device"""
+        if state is not None and state.get("status") != "error":
+            self.poller.record_state(device_id, state)
+        else:
+            self.poller.request_refresh(device_id)
+
+    async def close_devices(self):
+        """Release network resources held by the device controllers"""
+        for device_id, controller in self.devices.items():
+            if hasattr(controller, "close"):
+                try:
+                    await controller.close()
+                except Exception as e:
+                    logger.error(f"Error closing controller for {device_id}: {e}")
+
     def get_device(self, device_id: str):
         """Get a device controller by ID"""
         return self.devices.get(device_id)
@@ -172,16 +400,82 @@ class DeviceRegistry:
             if hasattr(controller, "room") and controller.room.lower() == room.lower()
         }
 
+    async def get_statuses(
+        self, devices: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Get the status of several devices concurrently
+
+        Devices are queried in parallel, bounded by STATUS_CONCURRENCY, and each
+        one gets STATUS_TIMEOUT seconds to answer so a slow or offline device
+        can't hold up the others.
+        """
+        if devices is None:
+            devices = self.devices
+
+        semaphore = asyncio.Semaphore(settings.STATUS_CONCURRENCY)
+
+        async def fetch_status(device_id: str, controller) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(
+                        controller.get_status(), timeout=settings.STATUS_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+                    logger.warning(f"Timed out getting status for {device_id}")
+                    error = "Timed out getting status"
+                except Exception as e:
+                    logger.error(f"Error getting status for {device_id}: {e}")
+                    error = str(e)
+
+            return {
+                "error": error,
+                "status": "error",
+                "name": getattr(controller, "name", device_id),
+                "room": getattr(controller, "room", "Unknown"),
+                "type": getattr(controller, "type", "unknown"),
+            }
+
+        device_ids = list(devices.keys())
+        statuses = await asyncio.gather(
+            *(fetch_status(device_id, devices[device_id]) for device_id in device_ids)
+        )
+
+        return dict(zip(device_ids, statuses))
+
+    async def get_cached_statuses(
+        self, devices: Optional[Dict[str, Any]] = None, refresh: bool = False
+    ) -> Dict[str, Dict[str, Any]]:
+        """Get the shadow state of several devices
+
+        Devices without a shadow state yet, or all of them when refresh is set,
+        are read from the device first.
+        """
+        if devices is None:
+            devices = self.devices
+
+        stale = {
+            device_id: controller
+            for device_id, controller in devices.items()
+            if refresh or self.poller.get_shadow(device_id).state is None
+        }
+        if stale:
+            for device_id, status in (await self.get_statuses(stale)).items():
+                self.poller.record_state(device_id, status)
+
+        return {
+            device_id: self.poller.get_shadow(device_id).snapshot()
+            for device_id in devices
+        }
+
+    async def get_cached_status(
+        self, device_id: str, refresh: bool = False
+    ) -> Dict[str, Any]:
+        """Get the shadow state of a single device"""
+        statuses = await self.get_cached_statuses(
+            {device_id: self.devices[device_id]}, refresh=refresh
+        )
+        return statuses[device_id]
+
     async def get_status_for_all_devices(self):
         """Get status for all devices"""
-        statuses = {}
-
-        for device_id, controller in self.devices.items():
-            try:
-                status = await controller.get_status()
-                statuses[device_id] = status
-            except Exception as e:
-                logger.error(f"Error getting status for {device_id}: {e}")
-                statuses[device_id] = {"error": str(e), "status": "error"}
-
-        return statuses
+        return await self.get_statuses()
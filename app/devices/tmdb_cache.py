@@ -0,0 +1,207 @@
+# app/devices/tmdb_cache.py
+from typing import Dict, Any, Awaitable, Callable, List, NamedTuple, Optional
+from collections import OrderedDict
+from functools import partial
+import asyncio
+import json
+import time
+import logging
+from app.config import settings
+from app.devices.executor import device_executor, read_file, write_file
+
+logger = logging.getLogger(__name__)
+
+
+class CachedProviders(NamedTuple):
+    """Streaming providers of a title as TMDb reported them"""
+
+    providers: List[str]
+    fetched_at: float  # Unix time, so entries age across restarts
+    fresh: bool
+
+
+class TmdbCache:
+    """Provider lookups by title, kept in memory and in a JSON file
+
+    Entries are fresh for `ttl` seconds, or `negative_ttl` when TMDb knew no
+    provider for the title. Expired entries stay around so they can still be
+    served when TMDb can't be reached. Above `max_entries` the least recently
+    used title is dropped.
+
+    Lookups that miss the cache go through `fetch`, which runs one request
+    per title at a time: callers asking for a title that is already being
+    looked up wait for that lookup instead of starting another.
+    """
+
+    def __init__(self, path: str, ttl: float, negative_ttl: float, max_entries: int):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.loaded = False
+        self._load_lock = asyncio.Lock()  # Callers wait for one read of the file
+
+        # Changes are counted, the file is current while both counts match
+        self._changes = 0
+        self._saved_changes = 0
+        self._save_task: Optional[asyncio.Task] = None
+        self._write_task: Optional[asyncio.Task] = None
+
+        # Lookups in progress and how many callers wait for each
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+
+    @staticmethod
+    def key(kind: str, title: str, region: str) -> str:
+        # Case and spacing only, titles in any script must stay distinct
+        return f"{kind}:{region}:{' '.join(title.casefold().split())}"
+
+    async def load(self):
+        """Read the cache file once, if there is one"""
+        async with self._load_lock:
+            if self.loaded:
+                return
+            try:
+                content = await device_executor.run(self.path, read_file, self.path)
+                data = json.loads(content) if content is not None else {}
+            except Exception as e:
+                logger.error(f"Error loading TMDb cache: {e}")
+                data = {}
+
+            # Stored least recently used first
+            for key, entry in data.items():
+                self.entries[key] = entry
+            self._evict()
+            self.loaded = True
+            if data:
+                logger.info(f"Loaded {len(self.entries)} cached TMDb lookups")
+
+    async def get(
+        self, kind: str, title: str, region: str
+    ) -> Optional[CachedProviders]:
+        """Get the cached providers of a title, fresh or not"""
+        if not self.loaded:
+            await self.load()
+
+        key = self.key(kind, title, region)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        self.entries.move_to_end(key)
+        ttl = self.ttl if entry["providers"] else self.negative_ttl
+        return CachedProviders(
+            providers=list(entry["providers"]),
+            fetched_at=entry["fetched_at"],
+            fresh=time.time() - entry["fetched_at"] < ttl,
+        )
+
+    async def put(self, kind: str, title: str, region: str, providers: List[str]):
+        """Store a title's providers and schedule a write of the file"""
+        if not self.loaded:
+            await self.load()
+
+        key = self.key(kind, title, region)
+        self.entries[key] = {"providers": list(providers), "fetched_at": time.time()}
+        self.entries.move_to_end(key)
+        self._evict()
+
+        self._changes += 1
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.create_task(self._save_later())
+
+    async def fetch(
+        self,
+        kind: str,
+        title: str,
+        region: str,
+        lookup: Callable[[], Awaitable[List[str]]],
+    ) -> List[str]:
+        """Run a lookup and cache its result, shared by concurrent callers
+
+        The lookup is cancelled once every caller waiting for it is.
+        """
+        key = self.key(kind, title, region)
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(kind, title, region, lookup))
+            self._pending[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(partial(self._lookup_done, key))
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+                if not task.done():
+                    task.cancel()
+                    self._pending.pop(key, None)
+
+    def _lookup_done(self, key: str, task: asyncio.Task):
+        # A cancelled lookup may already have been replaced by a new one
+        if self._pending.get(key) is task:
+            del self._pending[key]
+
+    async def _fetch(
+        self,
+        kind: str,
+        title: str,
+        region: str,
+        lookup: Callable[[], Awaitable[List[str]]],
+    ) -> List[str]:
+        providers = await lookup()
+        await self.put(kind, title, region, providers)
+        return providers
+
+    def _evict(self):
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def _save_later(self):
+        """Write the file shortly after a change, batching bursts of lookups"""
+        await asyncio.sleep(settings.TMDB_CACHE_SAVE_DELAY)
+        await self.save()
+
+    async def save(self):
+        """Write the cache to its file until it has every change
+
+        Writes run in their own task, so a caller being cancelled never
+        interrupts one. Changes stay pending if a write fails.
+        """
+        while self._saved_changes != self._changes:
+            if self._write_task is None or self._write_task.done():
+                self._write_task = asyncio.create_task(self._write())
+            if not await asyncio.shield(self._write_task):
+                return
+
+    async def _write(self) -> bool:
+        changes = self._changes
+        try:
+            await device_executor.run(
+                self.path, write_file, self.path, json.dumps(self.entries)
+            )
+        except Exception as e:
+            logger.error(f"Error saving TMDb cache: {e}")
+            return False
+        self._saved_changes = changes
+        return True
+
+    async def close(self):
+        """Write pending changes, e.g. on shutdown"""
+        # Only skips the batching delay, a write in progress carries on
+        if self._save_task is not None and not self._save_task.done():
+            self._save_task.cancel()
+        await self.save()
+
+
+# Shared by all TVs
+tmdb_cache = TmdbCache(
+    settings.TMDB_CACHE_FILE,
+    ttl=settings.TMDB_CACHE_TTL,
+    negative_ttl=settings.TMDB_CACHE_NEGATIVE_TTL,
+    max_entries=settings.TMDB_CACHE_SIZE,
+)
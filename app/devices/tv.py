@@ -1,10 +1,29 @@
 # app/devices/tv.py
-from typing import Dict, Any, Optional, List
+from typing import (
+    Dict,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    NamedTuple,
+    Optional,
+    List,
+    Sequence,
+    Tuple,
+    Union,
+)
+from contextlib import asynccontextmanager
 import aiohttp
 import asyncio
-import re
+import time
 import logging
 import os
+from urllib.parse import quote, urlencode
+from app.config import settings
+from app.devices.app_catalog import AppCatalog, normalize_app_name
+from app.devices import ecp
+from app.devices.content_links import content_links
+from app.devices.tmdb_cache import tmdb_cache
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +33,8 @@ TMDB_PROVIDER_MAPPING = {
     "Hulu": {"provider_id": 15, "roku_app_name": "Hulu"},
     "Amazon Prime Video": {"provider_id": 9, "roku_app_name": "Prime Video"},
     "Disney Plus": {"provider_id": 337, "roku_app_name": "Disney Plus"},
-    "HBO Max": {"provider_id": 384, "roku_app_name": "HBO Max"},
+    "HBO Max": {"provider_id": 384, "roku_app_name": "Max", "aliases": ["HBO Max"]},
+    "Max": {"provider_id": 1899, "roku_app_name": "Max", "aliases": ["HBO Max"]},
     "Apple TV Plus": {"provider_id": 350, "roku_app_name": "Apple TV"},
     "Peacock": {"provider_id": 386, "roku_app_name": "Peacock TV"},
     "Paramount Plus": {"provider_id": 531, "roku_app_name": "Paramount Plus"},
@@ -22,6 +42,120 @@ TMDB_PROVIDER_MAPPING = {
     "YouTube TV": {"provider_id": 363, "roku_app_name": "YouTube TV"},
 }
 
+# TMDb provider id -> provider name in TMDB_PROVIDER_MAPPING
+PROVIDERS_BY_ID = {
+    info["provider_id"]: name for name, info in TMDB_PROVIDER_MAPPING.items()
+}
+
+# Don't refetch the app list for an unknown name more often than this (seconds)
+APPS_MISS_REFRESH = 10.0
+
+# play_content content types -> ECP search type
+SEARCH_TYPES = {"movie": "movie", "tv_show": "tv-show"}
+
+# ECP key actions
+KEY_PRESS = "keypress"
+KEY_DOWN = "keydown"
+KEY_UP = "keyup"
+
+
+# Keys the TV repeats by itself while held down (seek, scroll), everything
+# else is repeated with keypresses
+HOLD_KEYS = {"Fwd", "Rev", "Left", "Right", "Up", "Down"}
+
+
+# Growth of the poll interval while waiting for the TV to reach a state
+WAIT_BACKOFF = 1.5
+
+# The antenna TV input, which is "launched" like an app
+TUNER_APP_ID = "tvinput.dtv"
+
+
+class KeyStep(NamedTuple):
+    """One step of a key sequence
+
+    `delay` overrides the sequence spacing before the next step, e.g. to wait
+    for a screen to load or to hold a key between keydown and keyup.
+    """
+
+    key: str
+    action: str = KEY_PRESS
+    delay: Optional[float] = None
+
+
+class SearchProfile(NamedTuple):
+    """How to reach the search field of an app and run a search"""
+
+    open_search: Tuple[KeyStep, ...]  # From the app's start screen to the text field
+    submit: Tuple[KeyStep, ...] = ()  # After the text, empty if it searches as you type
+    load_time: float = 2.0  # Seconds from the app being active to its start screen
+    navigation_spacing: float = 0.2  # Menus need more time than text entry
+
+
+# Search profiles per app (Roku app name). "Roku" is the global search, opened
+# with the remote's Search key. Menu layouts change with app updates, so
+# these paths may need adjusting.
+SEARCH_PROFILES: Dict[str, SearchProfile] = {
+    "Roku": SearchProfile(open_search=(KeyStep("Search", delay=1.5),), load_time=0),
+    "Hulu": SearchProfile(
+        open_search=(
+            KeyStep("Select", delay=3.5),
+            KeyStep("Left"),
+            KeyStep("Up"),
+            KeyStep("Select", delay=1.0),
+        ),
+        load_time=3.0,
+    ),
+    "YouTube": SearchProfile(
+        open_search=(
+            KeyStep("Left"),
+            KeyStep("Up"),
+            KeyStep("Up"),
+            KeyStep("Select", delay=1.0),
+        ),
+        submit=(KeyStep("Down"), KeyStep("Select")),
+    ),
+    "Netflix": SearchProfile(
+        open_search=(KeyStep("Left"), KeyStep("Up"), KeyStep("Select", delay=1.0)),
+        load_time=2.5,
+    ),
+}
+
+
+def build_provider_routes(catalog: AppCatalog) -> Dict[str, Dict[str, Any]]:
+    """
+    Join the TMDb providers with the apps installed on a TV
+
+    Each provider's Roku app name is tried first, then its aliases (apps
+    that were renamed). Providers without an installed app are left out.
+
+    Returns:
+        dict: Provider name -> installed app, in preference order
+    """
+    routes = {}
+    for name, info in TMDB_PROVIDER_MAPPING.items():
+        for app_name in [info["roku_app_name"], *info.get("aliases", [])]:
+            # Exact names only, "YouTube TV" must not route to YouTube
+            app = catalog.find(app_name, exact=True)
+            if app is not None:
+                routes[name] = app
+                break
+    return dict(sorted(routes.items(), key=lambda route: provider_rank(*route)))
+
+
+def provider_rank(provider: str, app: Dict[str, Any]) -> int:
+    """Position of a provider or its app in PROVIDER_PREFERENCE, unlisted last"""
+    preference = settings.PROVIDER_PREFERENCE
+    ranks = [
+        preference.index(name) for name in (provider, app["name"]) if name in preference
+    ]
+    return min(ranks, default=len(preference))
+
+
+def literal_keys(text: str) -> List[KeyStep]:
+    """Literal keypresses that type text into the focused text field"""
+    return [KeyStep(f"Lit_{quote(char, safe='')}") for char in text]
+
 
 class RokuController:
     """Controller for Roku TV devices"""
@@ -32,50 +166,193 @@ class RokuController:
         name: str = "",
         tmdb_api_key: Optional[str] = None,
         room: str = "Living Room",
+        hardware_id: Optional[str] = None,
     ):
         self.ip_address = ip_address
         self.name = name
         self.type = "tv"
         self.room = room
+        self.hardware_id = hardware_id  # Stable id from discovery, e.g. roku:<serial>
         self.base_url = f"http://{ip_address}:8060"
         self.tmdb_api_key = tmdb_api_key or os.getenv("TMDB_API_KEY")
         self.tmdb_api_url = "https://api.themoviedb.org/3"
         self.tmdb_provider_region = "US"  # Change to your region code if necessary
 
+        # Static device-info fields (model, serial, software version), fetched
+        # at registration and refreshed every ROKU_PROFILE_TTL
+        self.profile: Optional[ecp.DeviceInfo] = None
+        self._profile_fetched_at = 0.0
+
+        # Name of the app in the foreground (None on the home screen), read with
+        # the status at most every ROKU_ACTIVE_APP_INTERVAL or after a command
+        self.active_app: Optional[str] = None
+        self._active_app_at: Optional[float] = None
+
+        # Key sequences to this TV are sent one at a time
+        self._key_lock = asyncio.Lock()
+
+        # Server-side press-and-hold repeat, one per TV
+        self._repeat_task: Optional[asyncio.Task] = None
+        self._repeat_key: Optional[str] = None
+        self._repeat_presses = 0
+
+        # Installed apps, fetched from the TV only when stale
+        self.app_catalog = AppCatalog(ttl=settings.ROKU_APPS_TTL)
+
+        # Tuner channel lineup, fetched on first use and every ROKU_CHANNELS_TTL
+        self.channels: List[ecp.Channel] = []
+        self._channels_fetched_at: Optional[float] = None
+
+        # Provider -> installed app, rebuilt when the app catalog changes
+        self._provider_routes: Dict[str, Dict[str, Any]] = {}
+        self._routes_version = -1
+
+        # Long-lived HTTP sessions, created lazily inside the running event loop
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._tmdb_session: Optional[aiohttp.ClientSession] = None
+
+        # Called after a command may have changed the TV state, set by the registry
+        self.on_state_change: Optional[Callable[..., None]] = None
+
+        # Called when the TV can't be reached, returns its new IP address if it
+        # moved. Set by the registry.
+        self.on_unreachable: Optional[Callable[[], Awaitable[Optional[str]]]] = None
+
+    def _state_changed(self, state: Optional[Dict[str, Any]] = None):
+        """Report that a command may have changed the TV state"""
+        self._active_app_at = None
+        if self.on_state_change is not None:
+            self.on_state_change(state)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Get the keep-alive session used for ECP requests to the TV"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=settings.ROKU_MAX_CONNECTIONS,
+                keepalive_timeout=settings.ROKU_KEEPALIVE_TIMEOUT,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(
+                    total=settings.ROKU_REQUEST_TIMEOUT,
+                    sock_connect=settings.ROKU_CONNECT_TIMEOUT,
+                ),
+            )
+        return self._session
+
+    def set_ip_address(self, ip_address: str):
+        """Point the controller at the TV's new IP address"""
+        self.ip_address = ip_address
+        self.base_url = f"http://{ip_address}:8060"
+
+    @asynccontextmanager
+    async def _ecp(
+        self, method: str, path: str, **kwargs
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        """Make an ECP request, retrying once at the new address if the TV moved"""
+        session = self._get_session()
+        try:
+            response = await session.request(method, f"{self.base_url}{path}", **kwargs)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if self.on_unreachable is None:
+                raise
+            ip_address = await self.on_unreachable()
+            if not ip_address:
+                raise
+            response = await session.request(method, f"{self.base_url}{path}", **kwargs)
+
+        try:
+            yield response
+        finally:
+            response.release()
+
+    def _get_tmdb_session(self) -> aiohttp.ClientSession:
+        """Get the bounded session used for TMDb API requests"""
+        if self._tmdb_session is None or self._tmdb_session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=settings.TMDB_MAX_CONNECTIONS,
+                ttl_dns_cache=300,
+            )
+            self._tmdb_session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=settings.TMDB_REQUEST_TIMEOUT),
+            )
+        return self._tmdb_session
+
+    async def open(self):
+        """Open the HTTP sessions so the first command doesn't pay for setup"""
+        self._get_session()
+        if self.tmdb_api_key:
+            self._get_tmdb_session()
+        await self.get_profile()
+
+    async def close(self):
+        """Close the HTTP sessions and their pooled connections"""
+        await self.stop_repeat()
+        for session in (self._session, self._tmdb_session):
+            if session is not None and not session.closed:
+                await session.close()
+        self._session = None
+        self._tmdb_session = None
+
+    @property
+    def profile_fresh(self) -> bool:
+        """Whether the cached device profile is recent enough to use"""
+        return (
+            self.profile is not None
+            and time.monotonic() - self._profile_fetched_at < settings.ROKU_PROFILE_TTL
+        )
+
+    def _set_profile(self, info: ecp.DeviceInfo):
+        self.profile = info
+        self._profile_fetched_at = time.monotonic()
+
+        # Learn the serial number so the TV can be found if its IP changes
+        if not self.hardware_id and info.serial_number:
+            self.hardware_id = f"roku:{info.serial_number}"
+
+    async def get_profile(self, refresh: bool = False) -> Optional[ecp.DeviceInfo]:
+        """Get the static device-info fields, fetching them only when stale"""
+        if self.profile_fresh and not refresh:
+            return self.profile
+
+        try:
+            async with self._ecp("GET", "/query/device-info") as response:
+                if response.status == 200:
+                    info = await ecp.read_response(response, ecp.DeviceInfoParser())
+                    self._set_profile(info)
+                else:
+                    logger.warning(f"HTTP error getting device info: {response.status}")
+        except Exception as e:
+            logger.warning(f"Could not get device info from {self.name}: {e}")
+        return self.profile
+
+    async def _get_power_mode(self) -> str:
+        """Read the power mode from device-info
+
+        The whole document is received either way, ECP has no smaller query
+        for the power state. Status polls only search its bytes for the
+        power mode; the full XML parse is left to the profile refresh.
+        """
+        if not self.profile_fresh:
+            # A full read doubles as the profile refresh
+            profile = await self.get_profile(refresh=True)
+            if profile is None or not self.profile_fresh:
+                raise RuntimeError("Could not read device info")
+            return profile.power_mode
+
+        async with self._ecp("GET", "/query/device-info") as response:
+            if response.status != 200:
+                raise RuntimeError(f"HTTP error: {response.status}")
+            power_mode = await ecp.read_power_mode(response)
+            if power_mode is None:
+                raise RuntimeError("No power mode in device info")
+            return power_mode
+
     async def get_status(self) -> Dict[str, Any]:
         """Get the current status of the TV"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.base_url}/query/device-info"
-                ) as response:
-                    if response.status == 200:
-                        # Parse the XML response
-                        xml_text = await response.text()
-
-                        # Very basic XML parsing to extract power state
-                        power_state = (
-                            "on"
-                            if "<power-mode>PowerOn</power-mode>" in xml_text
-                            else "off"
-                        )
-
-                        return {
-                            "power": power_state == "on",
-                            "name": self.name,
-                            "type": self.type,
-                            "ip_address": self.ip_address,
-                            "room": self.room,
-                        }
-                    else:
-                        return {
-                            "error": f"HTTP error: {response.status}",
-                            "status": "error",
-                            "name": self.name,
-                            "type": self.type,
-                            "ip_address": self.ip_address,
-                            "room": self.room,
-                        }
+            power = await self._get_power_mode() == "PowerOn"
         except Exception as e:
             return {
                 "error": str(e),
@@ -86,62 +363,228 @@ class RokuController:
                 "room": self.room,
             }
 
+        # The app changes far less often than the status is polled, and only
+        # matters while the TV is on
+        if power and self._active_app_stale:
+            await self.get_current_app()
+
+        return {
+            "power": power,
+            "active_app": self.active_app if power else None,
+            "name": self.name,
+            "type": self.type,
+            "ip_address": self.ip_address,
+            "room": self.room,
+        }
+
+    async def _send_key(self, key: str, action: str = KEY_PRESS) -> Optional[str]:
+        """Send one key action, returns an error message if it failed"""
+        try:
+            async with self._ecp("POST", f"/{action}/{key}") as response:
+                if response.status != 200:
+                    return f"HTTP error: {response.status}"
+                return None
+        except Exception as e:
+            return str(e) or type(e).__name__
+
     async def send_keypress(self, key: str) -> Dict[str, Any]:
         """Send a keypress to the TV"""
+        async with self._key_lock:
+            error = await self._send_key(key)
+        if error is not None:
+            logger.error(f"Error sending keypress {key}: {error}")
+            return {"status": "error", "error": error}
+
+        self._state_changed()
+        return {"status": "success", "key": key}
+
+    async def send_keys(
+        self,
+        keys: Sequence[Union[str, KeyStep]],
+        spacing: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Send a sequence of keys over the keep-alive connection
+
+        Steps start at least `spacing` seconds apart (ROKU_KEY_SPACING by
+        default), counted from when the previous step was sent, so the time a
+        request takes isn't added on top. The sequence stops at the first
+        failure; keys still held down are released.
+        """
+        if spacing is None:
+            spacing = settings.ROKU_KEY_SPACING
+        steps = [KeyStep(step) if isinstance(step, str) else step for step in keys]
+
+        sent = 0
+        error = None
+        held = set()
+        started = time.monotonic()
+        async with self._key_lock:
+            try:
+                next_at = started
+                for step in steps:
+                    wait = next_at - time.monotonic()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+
+                    step_at = time.monotonic()
+                    error = await self._send_key(step.key, step.action)
+                    if error is not None:
+                        break
+
+                    sent += 1
+                    if step.action == KEY_DOWN:
+                        held.add(step.key)
+                    elif step.action == KEY_UP:
+                        held.discard(step.key)
+                    next_at = step_at + (spacing if step.delay is None else step.delay)
+            finally:
+                # Never leave a key held down, even if the caller went away
+                for key in held:
+                    await asyncio.shield(self._send_key(key, KEY_UP))
+
+        if sent:
+            self._state_changed()
+
+        result = {
+            "status": "success" if error is None else "error",
+            "keys": [step.key for step in steps[:sent]],
+            "sent": sent,
+            "total": len(steps),
+            "elapsed": round(time.monotonic() - started, 3),
+        }
+        if error is not None:
+            logger.error(f"Error sending key {steps[sent].key}: {error}")
+            result["error"] = error
+            result["failed_key"] = steps[sent].key
+        return result
+
+    async def hold_key(self, key: str, duration: float) -> Dict[str, Any]:
+        """Hold a key down for `duration` seconds"""
+        return await self.send_keys(
+            [KeyStep(key, KEY_DOWN, delay=duration), KeyStep(key, KEY_UP)]
+        )
+
+    async def start_repeat(
+        self,
+        key: str,
+        interval: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Start repeating a key until stop_repeat is called
+
+        Replaces any repeat already running. The repeat ends on its own after
+        `timeout` seconds in case the release never arrives.
+        """
+        await self.stop_repeat()
+
+        interval = max(interval or settings.ROKU_REPEAT_INTERVAL, 0.05)
+        timeout = timeout or settings.ROKU_REPEAT_TIMEOUT
+        self._repeat_key = key
+        self._repeat_presses = 0
+        self._repeat_task = asyncio.create_task(
+            self._run_repeat(key, interval, timeout)
+        )
+        return {
+            "status": "success",
+            "key": key,
+            "mode": "hold" if key in HOLD_KEYS else "repeat",
+            "interval": interval,
+            "timeout": timeout,
+        }
+
+    async def stop_repeat(self) -> Dict[str, Any]:
+        """Stop the running repeat (and release a held key) right away"""
+        task, key = self._repeat_task, self._repeat_key
+        self._repeat_task = None
+        self._repeat_key = None
+        if task is None:
+            return {"status": "success", "key": None, "presses": 0}
+
+        task.cancel()
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(f"{self.base_url}/keypress/{key}") as response:
-                    if response.status == 200:
-                        return {"status": "success", "key": key}
-                    else:
-                        return {
-                            "status": "error",
-                            "error": f"HTTP error: {response.status}",
-                        }
-        except Exception as e:
-            logger.error(f"Error sending keypress {key}: {e}")
-            return {"status": "error", "error": str(e)}
+            await task
+        except asyncio.CancelledError:
+            pass
+        return {"status": "success", "key": key, "presses": self._repeat_presses}
+
+    async def _run_repeat(self, key: str, interval: float, timeout: float):
+        """Hold or repeat a key until cancelled or `timeout` runs out"""
+        deadline = time.monotonic() + timeout
+        held = False
+        try:
+            if key in HOLD_KEYS:
+                async with self._key_lock:
+                    error = await self._send_key(key, KEY_DOWN)
+                if error is not None:
+                    logger.error(f"Error holding key {key}: {error}")
+                    return
+                held = True
+                self._repeat_presses = 1
+                await asyncio.sleep(max(deadline - time.monotonic(), 0))
+                return
+
+            # One press at a time, so a slow TV can't build up a backlog
+            while time.monotonic() < deadline:
+                pressed_at = time.monotonic()
+                async with self._key_lock:
+                    error = await self._send_key(key)
+                if error is not None:
+                    logger.error(f"Error repeating key {key}: {error}")
+                    return
+                self._repeat_presses += 1
+                await asyncio.sleep(max(pressed_at + interval - time.monotonic(), 0))
+        finally:
+            if held:
+                await asyncio.shield(self._send_key(key, KEY_UP))
+            if time.monotonic() >= deadline:
+                logger.warning(f"Repeat of {key} on {self.name} hit its timeout")
+            if self._repeat_presses:
+                self._state_changed()
 
     async def launch_app(self, app_id: str) -> Dict[str, Any]:
         """Launch an app on the TV"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(f"{self.base_url}/launch/{app_id}") as response:
-                    if response.status == 200:
-                        return {"status": "success", "app_id": app_id}
-                    else:
-                        return {
-                            "status": "error",
-                            "error": f"HTTP error: {response.status}",
-                        }
+            async with self._ecp("POST", f"/launch/{app_id}") as response:
+                if response.status == 200:
+                    self._state_changed()
+                    return {"status": "success", "app_id": app_id}
+                else:
+                    if response.status == 404:
+                        # The app was probably uninstalled
+                        self.app_catalog.invalidate()
+                    return {
+                        "status": "error",
+                        "error": f"HTTP error: {response.status}",
+                    }
         except Exception as e:
             logger.error(f"Error launching app {app_id}: {e}")
             return {"status": "error", "error": str(e)}
 
-    async def get_apps(self) -> List[Dict[str, Any]]:
-        """Get a list of installed apps"""
+    async def get_apps(self, refresh: bool = False) -> List[Dict[str, Any]]:
+        """Get a list of installed apps, from the cache unless it is stale"""
+        if self.app_catalog.fresh and not refresh:
+            return self.app_catalog.apps
+
+        headers = {}
+        if self.app_catalog.etag:
+            headers["If-None-Match"] = self.app_catalog.etag
+
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.base_url}/query/apps") as response:
-                    if response.status == 200:
-                        xml_text = await response.text()
-
-                        # Basic XML parsing to extract apps
-                        app_pattern = r'<app id="([^"]+)"[^>]*>([^<]+)</app>'
-                        apps = []
-
-                        for match in re.finditer(app_pattern, xml_text):
-                            app_id = match.group(1)
-                            app_name = match.group(2)
-                            apps.append({"id": app_id, "name": app_name})
-
-                        return apps
-                    else:
-                        logger.error(f"HTTP error getting apps: {response.status}")
-                        return []
+            async with self._ecp("GET", "/query/apps", headers=headers) as response:
+                if response.status == 304:
+                    self.app_catalog.touch()
+                    return self.app_catalog.apps
+                elif response.status == 200:
+                    parsed = await ecp.read_response(response, ecp.AppsParser())
+                    apps = [app.as_dict() for app in parsed]
+                    self.app_catalog.update(apps, response.headers.get("ETag"))
+                    return apps
+                else:
+                    logger.error(f"HTTP error getting apps: {response.status}")
+                    return self.app_catalog.apps
         except Exception as e:
             logger.error(f"Error getting apps: {e}")
-            return []
+            return self.app_catalog.apps
 
     async def turn_on(self) -> Dict[str, Any]:
         """Turn on the TV"""
@@ -171,109 +614,142 @@ class RokuController:
         else:
             return {"status": "error", "error": f"Invalid direction: {direction}"}
 
+    async def find_app(self, app_name: str) -> Optional[Dict[str, Any]]:
+        """Look up an installed app by name, refreshing the list once on a miss"""
+        fetched = not self.app_catalog.fresh
+        await self.get_apps()
+        app = self.app_catalog.find(app_name)
+        if app is None and not fetched and self.app_catalog.age > APPS_MISS_REFRESH:
+            # The app may have been installed since the list was fetched
+            await self.get_apps(refresh=True)
+            app = self.app_catalog.find(app_name)
+        return app
+
     async def launch_app_by_name(self, app_name: str) -> Dict[str, Any]:
         """Launch an app by its name"""
-        apps = await self.get_apps()
-
-        # Find the app with a matching name
-        for app in apps:
-            if app["name"].lower() == app_name.lower():
-                return await self.launch_app(app["id"])
-
-        return {"status": "error", "error": f"App not found: {app_name}"}
+        app = await self.find_app(app_name)
+        if app is None:
+            return {"status": "error", "error": f"App not found: {app_name}"}
+
+        result = await self.launch_app(app["id"])
+        if result["status"] == "error" and not self.app_catalog.fresh:
+            # The launch found the app gone, look it up in a fresh list
+            app = await self.find_app(app_name)
+            if app is not None:
+                result = await self.launch_app(app["id"])
+        return result
+
+    async def get_provider_routes(self) -> Dict[str, Dict[str, Any]]:
+        """Installed app for each streaming provider, in preference order"""
+        await self.get_apps()
+        if self._routes_version != self.app_catalog.version:
+            self._provider_routes = build_provider_routes(self.app_catalog)
+            self._routes_version = self.app_catalog.version
+        return self._provider_routes
 
     def get_config(self) -> Dict[str, Any]:
         """Get configuration data for this device"""
-        return {"ip_address": self.ip_address, "name": self.name, "room": self.room}
+        config = {"ip_address": self.ip_address, "name": self.name, "room": self.room}
+        if self.hardware_id:
+            config["hardware_id"] = self.hardware_id
+        return config
 
     # New methods below for enhanced TV control functionality
 
-    async def search_movie_providers(self, movie_name: str) -> List[str]:
+    async def _fetch_providers(self, kind: str, title: str) -> List[str]:
         """
-        Searches for the movie on various streaming providers using TMDb API.
+        Look up the streaming providers of a title with the TMDb API
 
         Args:
-            movie_name (str): The name of the movie.
+            kind (str): TMDb media type, "movie" or "tv"
+            title (str): The name of the movie or TV show
 
         Returns:
-            list: A list of provider names where the movie is available.
+            list: Provider names, empty if TMDb doesn't know the title
+
+        Raises:
+            aiohttp.ClientError: If TMDb couldn't be reached or failed
         """
-        if not self.tmdb_api_key:
-            logger.error("TMDB API key not found")
+        headers = {"User-Agent": "SmartHomeControl/1.0"}
+        session = self._get_tmdb_session()
+
+        # Step 1: Search for the TMDb id
+        search_url = f"{self.tmdb_api_url}/search/{kind}"
+        search_params = {
+            "api_key": self.tmdb_api_key,
+            "query": title,
+            "language": "en-US",
+            "page": 1,
+        }
+        async with session.get(
+            search_url, params=search_params, headers=headers, raise_for_status=True
+        ) as search_response:
+            search_data = await search_response.json()
+        if not search_data.get("results"):
+            logger.info(f"No results found for '{title}'.")
+            return []
+        tmdb_id = search_data["results"][0]["id"]
+
+        # Step 2: Get the providers for the title
+        provider_url = f"{self.tmdb_api_url}/{kind}/{tmdb_id}/watch/providers"
+        provider_params = {"api_key": self.tmdb_api_key}
+        async with session.get(
+            provider_url, params=provider_params, headers=headers, raise_for_status=True
+        ) as provider_response:
+            provider_data = await provider_response.json()
+
+        providers_info = provider_data.get("results", {}).get(self.tmdb_provider_region)
+        if providers_info is None:
+            logger.info(f"No providers found in region '{self.tmdb_provider_region}'.")
             return []
 
-        headers = {"User-Agent": "SmartHomeControl/1.0"}
-        try:
-            # Step 1: Search for the movie ID
-            search_url = f"{self.tmdb_api_url}/search/movie"
-            search_params = {
-                "api_key": self.tmdb_api_key,
-                "query": movie_name,
-                "language": "en-US",
-                "page": 1,
-            }
+        # Subscription providers first, in TMDb's order
+        providers: Dict[str, None] = {}
+        for provider_type in ["flatrate", "ads", "free", "rent", "buy"]:
+            for provider in providers_info.get(provider_type, []):
+                # Matched by id, TMDb renames providers now and then
+                provider_name = PROVIDERS_BY_ID.get(provider["provider_id"])
+                if provider_name is not None:
+                    providers.setdefault(provider_name)
+        return list(providers)
+
+    async def _find_providers(self, kind: str, title: str) -> List[str]:
+        """Providers of a title from the TMDb cache, asking TMDb when stale
+
+        An expired entry is still used if TMDb can't be reached.
+        """
+        region = self.tmdb_provider_region
+        cached = await tmdb_cache.get(kind, title, region)
+        if cached is not None and cached.fresh:
+            return cached.providers
 
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    search_url, params=search_params, headers=headers
-                ) as search_response:
-                    if search_response.status == 200:
-                        search_data = await search_response.json()
-                        if "results" in search_data and len(search_data["results"]) > 0:
-                            movie_id = search_data["results"][0]["id"]
-                        else:
-                            logger.info(f"No results found for '{movie_name}'.")
-                            return []
-                    else:
-                        logger.error(f"TMDb search API error: {search_response.status}")
-                        return []
-
-                # Step 2: Get the providers for the movie
-                provider_url = f"{self.tmdb_api_url}/movie/{movie_id}/watch/providers"
-                provider_params = {"api_key": self.tmdb_api_key}
-
-                async with session.get(
-                    provider_url, params=provider_params, headers=headers
-                ) as provider_response:
-                    if provider_response.status == 200:
-                        provider_data = await provider_response.json()
-                        if self.tmdb_provider_region in provider_data.get(
-                            "results", {}
-                        ):
-                            providers_info = provider_data["results"][
-                                self.tmdb_provider_region
-                            ]
-                            providers = set()
-
-                            for provider_type in [
-                                "flatrate",
-                                "ads",
-                                "free",
-                                "rent",
-                                "buy",
-                            ]:
-                                if provider_type in providers_info:
-                                    for provider in providers_info[provider_type]:
-                                        provider_name = provider["provider_name"]
-                                        if provider_name in TMDB_PROVIDER_MAPPING:
-                                            providers.add(provider_name)
-
-                            return list(providers)
-                        else:
-                            logger.info(
-                                f"No providers found in region '{self.tmdb_provider_region}'."
-                            )
-                            return []
-                    else:
-                        logger.error(
-                            f"TMDb provider API error: {provider_response.status}"
-                        )
-                        return []
+        if not self.tmdb_api_key:
+            logger.error("TMDB API key not found")
+            return cached.providers if cached is not None else []
 
+        try:
+            return await tmdb_cache.fetch(
+                kind, title, region, lambda: self._fetch_providers(kind, title)
+            )
         except Exception as e:
             logger.error(f"Error querying TMDb API: {e}")
+            if cached is not None:
+                logger.info(f"Using cached providers for '{title}'")
+                return cached.providers
             return []
 
+    async def search_movie_providers(self, movie_name: str) -> List[str]:
+        """
+        Searches for the movie on various streaming providers using TMDb API.
+
+        Args:
+            movie_name (str): The name of the movie.
+
+        Returns:
+            list: A list of provider names where the movie is available.
+        """
+        return await self._find_providers("movie", movie_name)
+
     async def search_tv_show_providers(self, tv_show_name: str) -> List[str]:
         """
         Searches for the TV show on various streaming providers using TMDb API.
@@ -284,81 +760,7 @@ class RokuController:
         Returns:
             list: A list of provider names where the show is available.
         """
-        if not self.tmdb_api_key:
-            logger.error("TMDB API key not found")
-            return []
-
-        headers = {"User-Agent": "SmartHomeControl/1.0"}
-        try:
-            # Step 1: Search for the TV show ID
-            search_url = f"{self.tmdb_api_url}/search/tv"
-            search_params = {
-                "api_key": self.tmdb_api_key,
-                "query": tv_show_name,
-                "language": "en-US",
-                "page": 1,
-            }
-
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    search_url, params=search_params, headers=headers
-                ) as search_response:
-                    if search_response.status == 200:
-                        search_data = await search_response.json()
-                        if "results" in search_data and len(search_data["results"]) > 0:
-                            tv_show_id = search_data["results"][0]["id"]
-                        else:
-                            logger.info(f"No results found for '{tv_show_name}'.")
-                            return []
-                    else:
-                        logger.error(f"TMDb search API error: {search_response.status}")
-                        return []
-
-                # Step 2: Get the providers for the TV show
-                provider_url = f"{self.tmdb_api_url}/tv/{tv_show_id}/watch/providers"
-                provider_params = {"api_key": self.tmdb_api_key}
-
-                async with session.get(
-                    provider_url, params=provider_params, headers=headers
-                ) as provider_response:
-                    if provider_response.status == 200:
-                        provider_data = await provider_response.json()
-                        if self.tmdb_provider_region in provider_data.get(
-                            "results", {}
-                        ):
-                            providers_info = provider_data["results"][
-                                self.tmdb_provider_region
-                            ]
-                            providers = set()
-
-                            for provider_type in [
-                                "flatrate",
-                                "ads",
-                                "free",
-                                "rent",
-                                "buy",
-                            ]:
-                                if provider_type in providers_info:
-                                    for provider in providers_info[provider_type]:
-                                        provider_name = provider["provider_name"]
-                                        if provider_name in TMDB_PROVIDER_MAPPING:
-                                            providers.add(provider_name)
-
-                            return list(providers)
-                        else:
-                            logger.info(
-                                f"No providers found in region '{self.tmdb_provider_region}'."
-                            )
-                            return []
-                    else:
-                        logger.error(
-                            f"TMDb provider API error: {provider_response.status}"
-                        )
-                        return []
-
-        except Exception as e:
-            logger.error(f"Error querying TMDb API: {e}")
-            return []
+        return await self._find_providers("tv", tv_show_name)
 
     async def play_content(
         self, content_type: str, content_name: str
@@ -373,10 +775,6 @@ class RokuController:
         Returns:
             dict: Result of the operation
         """
-        # First go home
-        await self.send_keypress("Home")
-        await asyncio.sleep(1)  # Give the TV time to respond
-
         # Search for providers
         providers = []
         if content_type.lower() == "movie":
@@ -390,30 +788,202 @@ class RokuController:
                 "message": f"Could not find '{content_name}' on available streaming services.",
             }
 
-        # Try to launch the first available provider
-        for provider in providers:
-            provider_info = TMDB_PROVIDER_MAPPING.get(provider)
-            if provider_info:
-                app_name = provider_info["roku_app_name"]
-                # Launch the app
-                launch_result = await self.launch_app_by_name(app_name)
+        # Providers with an installed app, the user's favourites first
+        routes = await self.get_provider_routes()
+        candidates = sorted(
+            (provider for provider in providers if provider in routes),
+            key=lambda provider: provider_rank(provider, routes[provider]),
+        )
+
+        for provider in candidates:
+            app = routes[provider]
+
+            # Go straight to the content if the provider can be deep-linked
+            link_result = await self.deep_link(app["id"], content_type, content_name)
+            if link_result["status"] == "success":
+                return {
+                    "status": "success",
+                    "provider": provider,
+                    "app": app["name"],
+                    "content": content_name,
+                    "method": link_result["method"],
+                    "message": f"Opened '{content_name}' in {app['name']}",
+                }
+
+            # Fall back to launching the app and driving its UI
+            launch_result = await self.launch_app(app["id"])
+
+            if launch_result.get("status") == "success":
+                # For apps with a search profile, search for the content
+                if app["name"] in SEARCH_PROFILES:
+                    await self.search_in_app(app["name"], content_name, launch=False)
+
+                return {
+                    "status": "success",
+                    "provider": provider,
+                    "app": app["name"],
+                    "content": content_name,
+                    "method": "ui",
+                    "message": f"Launched {app['name']} for '{content_name}'",
+                }
 
-                if launch_result.get("status") == "success":
-                    # For supported apps like Hulu, try to navigate to search
-                    if app_name.lower() == "hulu":
-                        await self.navigate_hulu_search(content_name)
+        return {
+            "status": "error",
+            "message": f"Failed to launch a streaming service for '{content_name}'.",
+        }
 
+    async def launch_content(
+        self, app_id: str, content_id: str, media_type: str = "movie"
+    ) -> Dict[str, Any]:
+        """Launch an app straight into a title with an ECP deep link"""
+        query = urlencode({"contentId": content_id, "mediaType": media_type})
+        try:
+            async with self._ecp("POST", f"/launch/{app_id}?{query}") as response:
+                if response.status == 200:
+                    self._state_changed()
                     return {
                         "status": "success",
-                        "provider": provider,
-                        "app": app_name,
-                        "content": content_name,
-                        "message": f"Launched {app_name} for '{content_name}'",
+                        "app_id": app_id,
+                        "content_id": content_id,
+                    }
+                else:
+                    return {
+                        "status": "error",
+                        "error": f"HTTP error: {response.status}",
+                    }
+        except Exception as e:
+            logger.error(f"Error deep-linking into {app_id}: {e}")
+            return {"status": "error", "error": str(e)}
+
+    async def browse_content(
+        self, app_id: str, content_type: str, title: str
+    ) -> Dict[str, Any]:
+        """Have the TV's own search find a title in an app and start it"""
+        query = urlencode(
+            {
+                "keyword": title,
+                "type": SEARCH_TYPES.get(content_type.lower(), "movie"),
+                "provider-id": app_id,
+                "launch": "true",
+            }
+        )
+        try:
+            async with self._ecp("POST", f"/search/browse?{query}") as response:
+                if response.status == 200:
+                    self._state_changed()
+                    return {"status": "success", "app_id": app_id}
+                else:
+                    return {
+                        "status": "error",
+                        "error": f"HTTP error: {response.status}",
                     }
+        except Exception as e:
+            logger.error(f"Error searching for {title} in {app_id}: {e}")
+            return {"status": "error", "error": str(e)}
+
+    async def deep_link(
+        self, app_id: str, content_type: str, title: str
+    ) -> Dict[str, Any]:
+        """
+        Open a title in an app without navigating the app's UI
+
+        Uses a known content id (see ContentLinks) when there is one,
+        otherwise ECP search/browse with launch=true. Both answer 200 whether
+        or not the title was found, so a link only counts once the app is in
+        the foreground.
+
+        Returns:
+            dict: Result of the operation, with the method that was used
+        """
+        link = await content_links.lookup(app_id, title)
+        if link is not None:
+            result = await self._confirm_link(
+                app_id,
+                await self.launch_content(app_id, link.content_id, link.media_type),
+            )
+            result["method"] = "content_id"
+            if result["status"] == "success":
+                return result
+
+        result = await self._confirm_link(
+            app_id, await self.browse_content(app_id, content_type, title)
+        )
+        result["method"] = "search_browse"
+        return result
+
+    async def _confirm_link(
+        self, app_id: str, result: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Turn a deep link's result into an error if its app never starts"""
+        if result["status"] != "success":
+            return result
+        waited = await self.wait_for(app_id=app_id, timeout=settings.ROKU_LINK_TIMEOUT)
+        return result if waited["status"] == "success" else waited
+
+    async def enter_text(self, text: str) -> Dict[str, Any]:
+        """Type text into the focused text field with literal keypresses"""
+        return await self.send_keys(
+            literal_keys(text), spacing=settings.ROKU_TEXT_SPACING
+        )
+
+    async def search_in_app(
+        self, app_name: str, query: str, launch: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Open the search field of an app and type the query into it
+
+        Args:
+            app_name (str): App with a profile in SEARCH_PROFILES ("Roku" for the
+                global search)
+            query (str): The term to search for
+            launch (bool): Launch the app first, False if it is already starting
+
+        Returns:
+            dict: Result of the operation
+        """
+        profile = SEARCH_PROFILES.get(app_name)
+        if profile is None:
+            return {"status": "error", "error": f"No search profile for {app_name}"}
+
+        if app_name == "Roku":
+            result = await self.wait_for(home=True)
+        elif launch:
+            result = await self.launch_app_by_name(app_name)
+            if result["status"] == "success":
+                result = await self.wait_for(app_id=result["app_id"])
+        else:
+            app = await self.find_app(app_name)
+            if app is None:
+                return {"status": "error", "error": f"App not found: {app_name}"}
+            result = await self.wait_for(app_id=app["id"])
+        if result["status"] == "error":
+            return result
+
+        # The app is running, give it time to show its start screen
+        await asyncio.sleep(profile.load_time)
+
+        result = await self.send_keys(
+            list(profile.open_search), spacing=profile.navigation_spacing
+        )
+        if result["status"] == "error":
+            return result
+
+        result = await self.enter_text(query)
+        if result["status"] == "error":
+            return result
+
+        if profile.submit:
+            result = await self.send_keys(
+                list(profile.submit), spacing=profile.navigation_spacing
+            )
+            if result["status"] == "error":
+                return result
 
         return {
-            "status": "error",
-            "message": f"Failed to launch a streaming service for '{content_name}'.",
+            "status": "success",
+            "app": app_name,
+            "query": query,
+            "message": f"Searched for '{query}' on {app_name}",
         }
 
     async def navigate_hulu_search(self, search_term: str) -> Dict[str, Any]:
@@ -423,59 +993,140 @@ class RokuController:
         Args:
             search_term (str): The term to search for
         """
-        # Wait for Hulu to load
-        await asyncio.sleep(7)
-
-        # Navigate to search
-        await self.send_keypress("Select")
-        await asyncio.sleep(3.5)
-        await self.send_keypress("Left")
-        await asyncio.sleep(0.2)
-        await self.send_keypress("Up")
-        await asyncio.sleep(0.2)
-        await self.send_keypress("Select")
-        await asyncio.sleep(0.2)
-
-        # Very simplified keyboard navigation for the example
-        # In reality you'd want to implement the full keyboard grid logic from the pasted code
-        search_term = search_term.lower()
-        for char in search_term[:5]:  # Just first 5 chars as example
-            if char.isalpha():
-                # This is a very simplified version - the real implementation would
-                # calculate the path to each character on the keyboard grid
-                await self.send_keypress("Right")
-                await asyncio.sleep(0.2)
-                await self.send_keypress("Select")
-                await asyncio.sleep(0.2)
-
-        # Navigate to search button and select
-        for _ in range(3):  # Move to the right to reach search button
-            await self.send_keypress("Right")
-            await asyncio.sleep(0.2)
-
-        await self.send_keypress("Select")  # Submit search
-        await asyncio.sleep(1)
-
-        return {"status": "success", "message": f"Searched for '{search_term}' on Hulu"}
+        return await self.search_in_app("Hulu", search_term, launch=False)
+
+    async def has_tuner(self) -> bool:
+        """Whether this is a Roku TV with an antenna input to tune"""
+        profile = await self.get_profile()
+        if profile is None or not profile.is_tv:
+            return False
+        await self.get_apps()
+        return self.app_catalog.get(TUNER_APP_ID) is not None
+
+    async def get_channels(self, refresh: bool = False) -> List[ecp.Channel]:
+        """Get the tuner's channel lineup, from the cache unless it is stale"""
+        if (
+            not refresh
+            and self._channels_fetched_at is not None
+            and time.monotonic() - self._channels_fetched_at
+            < settings.ROKU_CHANNELS_TTL
+        ):
+            return self.channels
+
+        try:
+            channels = await self._query("/query/tv-channels", ecp.ChannelsParser())
+        except aiohttp.ClientResponseError as e:
+            # No tuner or no channel scan yet, don't ask again until the TTL
+            logger.info(f"No channel lineup on {self.name}: HTTP {e.status}")
+            channels = []
+        except Exception as e:
+            logger.error(f"Error getting TV channels: {e}")
+            return self.channels
+
+        self.channels = [channel for channel in channels if not channel.hidden]
+        self._channels_fetched_at = time.monotonic()
+        return self.channels
+
+    async def find_channel(self, channel: str) -> Optional[ecp.Channel]:
+        """
+        Look up a channel in the lineup by number or name
+
+        "7.1" and "7-1" are the same channel, "7" is the first channel 7.x
+        and names match case- and punctuation-insensitively, or by prefix
+        if only one channel starts with the name.
+        """
+        channels = await self.get_channels()
+        number = channel.strip().replace("-", ".")
+        for candidate in channels:
+            if candidate.number == number:
+                return candidate
+        if number.isdigit():
+            for candidate in channels:
+                if candidate.number.split(".")[0] == number:
+                    return candidate
+
+        key = normalize_app_name(channel)
+        if not key:
+            return None
+        names = {
+            normalize_app_name(candidate.name): candidate for candidate in channels
+        }
+        if key in names:
+            return names[key]
+        partial = [
+            candidate for name, candidate in names.items() if name.startswith(key)
+        ]
+        return partial[0] if len(partial) == 1 else None
 
     async def change_channel(self, channel_number: str) -> Dict[str, Any]:
         """
-        Change to a specific channel number
+        Change to a specific channel
+
+        Roku TVs with a tuner are tuned directly with one ECP launch. Other
+        devices get the digits typed, on their antenna input if they have one
+        and otherwise into the app in the foreground.
 
         Args:
-            channel_number (str): The channel number to change to
+            channel_number (str): The channel number ("7.1") or name ("WKRN")
 
         Returns:
             dict: Result of the operation
         """
-        results = []
-        for digit in channel_number:
-            if digit.isdigit():
-                result = await self.send_keypress(f"Lit_{digit}")
-                results.append(result)
-                await asyncio.sleep(0.2)
-
-        return {"status": "success", "channel": channel_number, "results": results}
+        if await self.has_tuner():
+            return await self._tune(channel_number)
+
+        # Digits only tune while the antenna input is in the foreground. Sticks
+        # and boxes have none, they get the digits typed into the current app.
+        await self.get_apps()
+        if self.app_catalog.get(TUNER_APP_ID) is not None:
+            current = await self.get_current_app()
+            if current.get("app_id") != TUNER_APP_ID:
+                result = await self.launch_app(TUNER_APP_ID)
+                if result["status"] == "success":
+                    result = await self.wait_for(app_id=TUNER_APP_ID)
+                if result["status"] == "error":
+                    result["channel"] = channel_number
+                    return result
+
+        keys = [f"Lit_{digit}" for digit in channel_number if digit.isdigit()]
+        result = await self.send_keys(keys)
+        result["channel"] = channel_number
+        return result
+
+    async def _tune(self, channel: str) -> Dict[str, Any]:
+        """Launch the tuner input straight onto a channel of the lineup"""
+        found = await self.find_channel(channel)
+        if found is None:
+            number = channel.strip().replace("-", ".")
+            if self.channels or not number.replace(".", "").isdigit():
+                return {
+                    "status": "error",
+                    "error": f"Unknown channel: {channel}",
+                    "channel": channel,
+                }
+            # No lineup to check against, let the TV try the number
+            found = ecp.Channel(number=number)
+
+        query = urlencode({"ch": found.number})
+        try:
+            async with self._ecp("POST", f"/launch/{TUNER_APP_ID}?{query}") as response:
+                if response.status == 200:
+                    self._state_changed()
+                    return {
+                        "status": "success",
+                        "channel": found.number,
+                        "name": found.name,
+                        "method": "launch",
+                    }
+                else:
+                    return {
+                        "status": "error",
+                        "error": f"HTTP error: {response.status}",
+                        "channel": channel,
+                    }
+        except Exception as e:
+            logger.error(f"Error tuning to channel {channel}: {e}")
+            return {"status": "error", "error": str(e), "channel": channel}
 
     async def search_and_play(self, search_term: str) -> Dict[str, Any]:
         """
@@ -487,15 +1138,30 @@ class RokuController:
         Returns:
             dict: Result of the operation
         """
-        # First try as a movie
-        movie_providers = await self.search_movie_providers(search_term)
-        if movie_providers:
-            return await self.play_content("movie", search_term)
-
-        # Then try as a TV show
-        tv_providers = await self.search_tv_show_providers(search_term)
-        if tv_providers:
-            return await self.play_content("tv_show", search_term)
+        # Look the title up as a movie and as a TV show at the same time, the
+        # first one with providers wins. A movie wins a tie, as it used to.
+        lookups = {
+            asyncio.create_task(self.search_movie_providers(search_term)): "movie",
+            asyncio.create_task(self.search_tv_show_providers(search_term)): "tv_show",
+        }
+        pending = set(lookups)
+        content_type = None
+        try:
+            while pending and content_type is None:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in sorted(done, key=lambda t: lookups[t] != "movie"):
+                    if task.result():
+                        content_type = lookups[task]
+                        break
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if content_type is not None:
+            # The providers are cached now, play_content won't ask TMDb again
+            return await self.play_content(content_type, search_term)
 
         return {
             "status": "error",
@@ -534,18 +1200,17 @@ class RokuController:
             dict: Result of the operation
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(f"{self.base_url}/findremote") as response:
-                    if response.status == 200:
-                        return {
-                            "status": "success",
-                            "message": "Remote finder activated",
-                        }
-                    else:
-                        return {
-                            "status": "error",
-                            "error": f"HTTP error: {response.status}",
-                        }
+            async with self._ecp("POST", "/findremote") as response:
+                if response.status == 200:
+                    return {
+                        "status": "success",
+                        "message": "Remote finder activated",
+                    }
+                else:
+                    return {
+                        "status": "error",
+                        "error": f"HTTP error: {response.status}",
+                    }
         except Exception as e:
             logger.error(f"Error activating remote finder: {e}")
             return {"status": "error", "error": str(e)}
@@ -561,20 +1226,26 @@ class RokuController:
         Returns:
             dict: Result of the operation
         """
-        results = []
         key = "VolumeUp" if action.lower() == "up" else "VolumeDown"
 
-        for _ in range(amount):
-            result = await self.send_keypress(key)
-            results.append(result)
-            await asyncio.sleep(0.1)  # Small delay between keypresses
-
-        return {
-            "status": "success",
-            "action": f"volume_{action.lower()}",
-            "amount": amount,
-            "results": results,
-        }
+        result = await self.send_keys([key] * amount)
+        result["action"] = f"volume_{action.lower()}"
+        result["amount"] = amount
+        return result
+
+    async def _query(self, path: str, parser: ecp.EcpParser):
+        """GET an ECP query and parse the response, raises on HTTP errors"""
+        async with self._ecp("GET", path) as response:
+            response.raise_for_status()
+            return await ecp.read_response(response, parser)
+
+    @property
+    def _active_app_stale(self) -> bool:
+        return (
+            self._active_app_at is None
+            or time.monotonic() - self._active_app_at
+            >= settings.ROKU_ACTIVE_APP_INTERVAL
+        )
 
     async def get_current_app(self) -> Dict[str, Any]:
         """
@@ -584,33 +1255,87 @@ class RokuController:
             dict: Information about the current app
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.base_url}/query/active-app") as response:
-                    if response.status == 200:
-                        xml_text = await response.text()
-
-                        # Basic XML parsing to extract app info
-                        app_id_match = re.search(r'<app id="([^"]+)"', xml_text)
-                        app_name_match = re.search(
-                            r'<app id="[^"]+">([^<]+)</app>', xml_text
-                        )
-
-                        if app_id_match and app_name_match:
-                            return {
-                                "status": "success",
-                                "app_id": app_id_match.group(1),
-                                "app_name": app_name_match.group(1),
-                            }
-                        else:
-                            return {
-                                "status": "error",
-                                "error": "Could not parse app info",
-                            }
-                    else:
-                        return {
-                            "status": "error",
-                            "error": f"HTTP error: {response.status}",
-                        }
+            active = await self._query("/query/active-app", ecp.ActiveAppParser())
+        except aiohttp.ClientResponseError as e:
+            return {"status": "error", "error": f"HTTP error: {e.status}"}
         except Exception as e:
             logger.error(f"Error getting current app: {e}")
             return {"status": "error", "error": str(e)}
+
+        self.active_app = active.app.name if active.app is not None else None
+        self._active_app_at = time.monotonic()
+        if active.app is None:
+            return {"status": "error", "error": "Could not parse app info"}
+
+        app_id = active.app.id
+        if self.app_catalog.fresh and not self.app_catalog.get(app_id):
+            # Running an app we don't know about, it was installed
+            self.app_catalog.invalidate()
+        return {"status": "success", "app_id": app_id, "app_name": active.app.name}
+
+    async def _reached(
+        self, app_id: Optional[str], home: bool, player_state: Optional[str]
+    ) -> bool:
+        """Check the TV once for the state wait_for is waiting for"""
+        if app_id is not None or home:
+            active = await self._query("/query/active-app", ecp.ActiveAppParser())
+            current = active.app.id if active.app is not None else None
+            if home and current is not None:
+                return False
+            if app_id is not None and current != app_id:
+                return False
+
+        if player_state is not None:
+            player = await self._query("/query/media-player", ecp.MediaPlayerParser())
+            if player.state != player_state:
+                return False
+
+        return True
+
+    async def wait_for(
+        self,
+        app_id: Optional[str] = None,
+        home: bool = False,
+        player_state: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Wait until the TV is in a state, polling it with a growing interval
+
+        Args:
+            app_id (str): App that has to be in the foreground
+            home (bool): Wait for the home screen instead
+            player_state (str): Media player state, e.g. "play"
+            timeout (float): Seconds to wait at most, ROKU_WAIT_TIMEOUT if None
+
+        Returns:
+            dict: Result of the operation, with the seconds waited
+        """
+        if timeout is None:
+            timeout = settings.ROKU_WAIT_TIMEOUT
+        started = time.monotonic()
+        deadline = started + timeout
+        interval = settings.ROKU_WAIT_POLL_MIN
+
+        while True:
+            try:
+                if await self._reached(app_id, home, player_state):
+                    return {
+                        "status": "success",
+                        "waited": round(time.monotonic() - started, 3),
+                    }
+            except Exception as e:
+                # The TV can be slow to answer while it starts an app
+                logger.debug(f"Error polling {self.name} state: {e}")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                target = "home screen" if home else app_id or "TV"
+                if player_state is not None:
+                    target = f"{target} ({player_state})"
+                return {
+                    "status": "error",
+                    "error": f"Timed out after {timeout}s waiting for {target}",
+                }
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * WAIT_BACKOFF, settings.ROKU_WAIT_POLL_MAX)
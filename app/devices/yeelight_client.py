@@ -0,0 +1,290 @@
+# app/devices/yeelight_client.py
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+YEELIGHT_PORT = 55443
+
+
+class YeelightError(Exception):
+    """Error reported by a bulb, or a failure of the connection to it"""
+
+
+class YeelightClient:
+    """Asyncio client for the Yeelight LAN control protocol
+
+    Keeps one persistent TCP connection to the bulb. Every request carries an
+    id and responses are matched back to it, so several commands can be in
+    flight at once. Notifications the bulb sends on the same connection are
+    handed to the registered notification callbacks.
+    """
+
+    def __init__(
+        self,
+        ip_address: str,
+        port: int = YEELIGHT_PORT,
+        timeout: float = 5.0,
+        connect_timeout: Optional[float] = None,
+    ):
+        self.ip_address = ip_address
+        self.port = port
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout or timeout
+        self.notification_callbacks: List[Callable[[Dict[str, Any]], None]] = []
+
+        # Called when the bulb can't be reached, returns its new IP address if
+        # it moved
+        self.resolve_address: Optional[Callable[[], Awaitable[Optional[str]]]] = None
+
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._read_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 1
+        self._connect_lock = asyncio.Lock()
+        self._disconnected = asyncio.Event()
+        self._disconnected.set()
+
+    @property
+    def connected(self) -> bool:
+        """Whether the connection to the bulb is open"""
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self):
+        """Open the connection to the bulb if it isn't open already"""
+        async with self._connect_lock:
+            if self.connected:
+                return
+
+            try:
+                await self._open_connection()
+            except YeelightError:
+                if self.resolve_address is None:
+                    raise
+                # Retry once if the bulb turned up at another address
+                old_address = self.ip_address
+                ip_address = await self.resolve_address()
+                if not ip_address or ip_address == old_address:
+                    raise
+                self.ip_address = ip_address
+                await self._open_connection()
+
+            self._disconnected.clear()
+            self._read_task = asyncio.create_task(self._read_loop(self._reader))
+            logger.debug(f"Connected to Yeelight at {self.ip_address}")
+
+    async def _open_connection(self):
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.ip_address, self.port),
+                timeout=self.connect_timeout,
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            raise YeelightError(
+                f"Could not connect to {self.ip_address}:{self.port}: {e}"
+            ) from e
+
+    async def close(self):
+        """Close the connection and fail any requests still waiting"""
+        if self._read_task is not None:
+            self._read_task.cancel()
+            try:
+                await self._read_task
+            except asyncio.CancelledError:
+                pass
+            self._read_task = None
+
+        self._drop_connection(YeelightError("Connection closed"))
+
+    async def wait_disconnected(self):
+        """Wait until the current connection is closed or lost"""
+        await self._disconnected.wait()
+
+    def _drop_connection(self, error: Exception):
+        """Forget the current connection and fail pending requests with error"""
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = None
+        self._writer = None
+        self._disconnected.set()
+
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+
+    async def _read_loop(self, reader: asyncio.StreamReader):
+        """Dispatch responses and notifications coming from the bulb"""
+        error: Exception = YeelightError("Connection closed by bulb")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Invalid message from {self.ip_address}: {line}")
+                    continue
+
+                if "id" in message:
+                    future = self._pending.pop(message["id"], None)
+                    if future is not None and not future.done():
+                        future.set_result(message)
+                elif "method" in message:
+                    for callback in self.notification_callbacks:
+                        try:
+                            callback(message)
+                        except Exception as e:
+                            logger.error(
+                                f"Error in Yeelight notification callback: {e}"
+                            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = YeelightError(f"Connection to {self.ip_address} failed: {e}")
+
+        if self._reader is reader:
+            self._drop_connection(error)
+
+    async def send_command(self, method: str, params: List[Any]) -> List[Any]:
+        """Send a command and wait for its result
+
+        The request is written before the first suspension point once the
+        connection is open, so commands issued back to back are pipelined in
+        the order they were made.
+        """
+        if not self.connected:
+            await self.connect()
+
+        request_id = self._next_id
+        self._next_id += 1
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+
+        payload = {"id": request_id, "method": method, "params": params}
+        self._writer.write(json.dumps(payload).encode() + b"\r\n")
+
+        try:
+            await self._writer.drain()
+            response = await asyncio.wait_for(future, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise YeelightError(f"Timed out waiting for {method} response")
+        except OSError as e:
+            self._drop_connection(YeelightError(str(e)))
+            raise YeelightError(f"Error sending {method}: {e}") from e
+        finally:
+            self._pending.pop(request_id, None)
+
+        if "error" in response:
+            error = response["error"]
+            if isinstance(error, dict):
+                error = error.get("message", error)
+            raise YeelightError(f"{method} failed: {error}")
+
+        return response.get("result", [])
+
+    async def get_properties(self, properties: List[str]) -> Dict[str, str]:
+        """Read a set of properties from the bulb"""
+        values = await self.send_command("get_prop", properties)
+        return dict(zip(properties, values))
+
+    def local_address(self) -> Optional[str]:
+        """Our address on the network the bulb is on, once connected"""
+        if self._writer is None:
+            return None
+        return self._writer.get_extra_info("sockname")[0]
+
+
+class MusicConnection:
+    """Connection a bulb opens back to us in music mode
+
+    After set_music the bulb connects to a TCP server we host and accepts
+    commands on that connection without acknowledging them and without
+    applying its command quota.
+    """
+
+    def __init__(self, timeout: float = 5.0):
+        self.timeout = timeout
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._connected = asyncio.Event()
+        self._closed = asyncio.Event()
+        self._closed.set()
+        self._next_id = 1
+
+    @property
+    def active(self) -> bool:
+        """Whether the bulb is connected in music mode"""
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def open(self, client: YeelightClient):
+        """Ask the bulb to connect back to us and wait until it does"""
+        await client.connect()
+        host = client.local_address()
+
+        self._connected.clear()
+        server = await asyncio.start_server(self._accept, host, 0)
+        try:
+            port = server.sockets[0].getsockname()[1]
+            await client.send_command("set_music", [1, host, port])
+            await asyncio.wait_for(self._connected.wait(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise YeelightError("Bulb did not connect back for music mode")
+        finally:
+            # Only the one connection is expected, stop accepting more
+            server.close()
+
+    async def _accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        if self.active:
+            writer.close()
+            return
+
+        self._writer = writer
+        self._closed.clear()
+        self._connected.set()
+        try:
+            # Nothing is expected from the bulb, read only to notice a hang-up
+            while await reader.read(1024):
+                pass
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            if self._writer is writer:
+                self._writer = None
+                self._closed.set()
+            writer.close()
+
+    async def wait_closed(self):
+        """Wait until music mode ends, by us or by the bulb hanging up"""
+        await self._closed.wait()
+
+    def send(self, method: str, params: List[Any]):
+        """Queue a command on the music connection, no response is sent"""
+        if not self.active:
+            raise YeelightError("Music mode is not active")
+
+        payload = {"id": self._next_id, "method": method, "params": params}
+        self._next_id += 1
+        self._writer.write(json.dumps(payload).encode() + b"\r\n")
+
+    async def drain(self):
+        """Wait until queued commands have been handed to the network"""
+        if self.active:
+            await self._writer.drain()
+
+    async def close(self, client: YeelightClient):
+        """Leave music mode and close the connection"""
+        writer, self._writer = self._writer, None
+        self._closed.set()
+        if writer is not None:
+            writer.close()
+        if client.connected:
+            try:
+                await client.send_command("set_music", [0])
+            except YeelightError as e:
+                logger.debug(f"Error leaving music mode: {e}")
@@ -6,6 +6,8 @@ import os
 import json
 from app.api import devices, lights, tv, ui
 from app.devices.registry import DeviceRegistry
+from app.devices.executor import device_executor
+from app.devices.tmdb_cache import tmdb_cache
 from app.config import settings
 
 app = FastAPI(
@@ -32,12 +34,29 @@ async def startup_event():
     # Load devices from file
     await registry.load_devices()
 
+    # Keep device state cached in memory
+    registry.start_listening()
+    registry.start_polling()
+
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    # Stop background polling and notification listeners
+    await registry.stop_polling()
+    await registry.stop_listening()
+
     # Save devices to file
     await registry.save_devices()
 
+    # Close pooled device connections
+    await registry.close_devices()
+
+    # Write pending TMDb lookups
+    await tmdb_cache.close()
+
+    # Stop the blocking I/O thread pool
+    device_executor.shutdown()
+
 
 # Include routers
 app.include_router(devices.router, prefix="/devices", tags=["devices"])
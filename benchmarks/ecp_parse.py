@@ -0,0 +1,95 @@
+# benchmarks/ecp_parse.py
+"""Micro-benchmark of Roku ECP response parsing
+
+Compares the substring/regex parsing RokuController used to do with the
+incremental parser in app.devices.ecp, on responses recorded in
+benchmarks/fixtures. Run it from the repository root:
+
+    python -m benchmarks.ecp_parse
+"""
+
+from typing import Callable, Dict
+from pathlib import Path
+import argparse
+import re
+import timeit
+
+from app.devices import ecp
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def legacy_device_info(data: bytes):
+    xml_text = data.decode()
+    power = "<power-mode>PowerOn</power-mode>" in xml_text
+    serial = re.search(r"<serial-number>([^<]+)</serial-number>", xml_text)
+    return power, serial.group(1) if serial else None
+
+
+def legacy_apps(data: bytes):
+    xml_text = data.decode()
+    app_pattern = r'<app id="([^"]+)"[^>]*>([^<]+)</app>'
+    return [
+        {"id": match.group(1), "name": match.group(2)}
+        for match in re.finditer(app_pattern, xml_text)
+    ]
+
+
+def legacy_active_app(data: bytes):
+    xml_text = data.decode()
+    app_id_match = re.search(r'<app id="([^"]+)"', xml_text)
+    app_name_match = re.search(r'<app id="[^"]+">([^<]+)</app>', xml_text)
+    if app_id_match and app_name_match:
+        return app_id_match.group(1), app_name_match.group(1)
+    return None
+
+
+# fixture -> (legacy parser or None, ecp parser)
+CASES: Dict[str, tuple] = {
+    "device-info.xml": (legacy_device_info, ecp.parse_device_info),
+    "apps.xml": (legacy_apps, ecp.parse_apps),
+    "active-app.xml": (legacy_active_app, ecp.parse_active_app),
+    "active-app-home.xml": (legacy_active_app, ecp.parse_active_app),
+    "media-player.xml": (None, ecp.parse_media_player),
+    "tv-channels.xml": (None, ecp.parse_channels),
+}
+
+
+def _per_call(func: Callable, data: bytes, number: int) -> float:
+    """Best of 5 runs, in microseconds per call"""
+    runs = timeit.repeat(lambda: func(data), number=number, repeat=5)
+    return min(runs) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ECP parsing")
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'fixture':<22}{'bytes':>7}{'legacy us':>12}{'ecp us':>10}  result")
+    for name, (legacy, parse) in CASES.items():
+        data = (FIXTURES / name).read_bytes()
+        legacy_us = _per_call(legacy, data, args.number) if legacy else None
+        ecp_us = _per_call(parse, data, args.number)
+        legacy_text = f"{legacy_us:.1f}" if legacy_us is not None else "-"
+        result = repr(parse(data))
+        if len(result) > 60:
+            result = result[:57] + "..."
+        print(f"{name:<22}{len(data):>7}{legacy_text:>12}{ecp_us:>10.1f}  {result}")
+
+    # Early exit: parsing stops once the power mode was read
+    data = (FIXTURES / "device-info.xml").read_bytes()
+    early_us = _per_call(
+        lambda d: ecp.parse(ecp.DeviceInfoParser(stop_after="power-mode"), d),
+        data,
+        args.number,
+    )
+    print(f"{'device-info (early)':<22}{len(data):>7}{'-':>12}{early_us:>10.1f}")
+
+    # What a status poll does: a byte search for the power mode alone
+    search_us = _per_call(ecp.find_power_mode, data, args.number)
+    print(f"{'device-info (search)':<22}{len(data):>7}{'-':>12}{search_us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
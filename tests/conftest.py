@@ -0,0 +1,65 @@
+# tests/conftest.py
+import asyncio
+import threading
+
+import pytest
+
+from app.config import settings
+from app.devices.registry import DeviceRegistry
+
+# Seconds a test's event loop may run before the test counts as hung
+TEST_TIMEOUT = 30.0
+
+
+async def wait_until(condition, timeout: float = 2.0):
+    """Poll `condition` until it is true, failing after `timeout` seconds"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        if loop.time() > deadline:
+            raise AssertionError("Condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    """A fresh device registry that saves to a temporary devices file"""
+    monkeypatch.setattr(settings, "DEVICES_FILE", str(tmp_path / "devices.json"))
+    monkeypatch.setattr(settings, "DISCOVERY_ENABLED", False)
+    monkeypatch.setattr(DeviceRegistry, "_instance", None)
+    return DeviceRegistry()
+
+
+@pytest.fixture
+def run(registry):
+    """Run a coroutine function, then close the registry's devices on its loop
+
+    The loop runs in its own thread, so a test whose loop never yields
+    fails after TEST_TIMEOUT instead of hanging the whole run.
+    """
+
+    def run(scenario):
+        outcome = {}
+
+        async def main():
+            try:
+                return await scenario()
+            finally:
+                await registry.close_devices()
+
+        def target():
+            try:
+                outcome["result"] = asyncio.run(main())
+            except BaseException as e:
+                outcome["error"] = e
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        thread.join(TEST_TIMEOUT)
+        if thread.is_alive():
+            pytest.fail(f"Event loop blocked for more than {TEST_TIMEOUT}s")
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["result"]
+
+    return run
@@ -0,0 +1,290 @@
+# tests/fake_roku.py
+"""Local stand-in for a Roku TV, for testing without hardware.
+
+Run it with `python -m tests.fake_roku --port 8060` and set
+ROKU_IP_ADDRESS=127.0.0.1.
+"""
+
+from typing import Dict, List, Optional
+from xml.sax.saxutils import escape
+import argparse
+import asyncio
+import logging
+
+from aiohttp import web
+
+from tests.fake_yeelight import SearchResponder
+
+logger = logging.getLogger(__name__)
+
+# number -> name of the tuner's channels
+DEFAULT_CHANNELS = {
+    "2.1": "WCBS-HD",
+    "4.1": "WNBC-HD",
+    "7.1": "WABC-HD",
+    "7.2": "LAFF",
+    "13.1": "WNET-HD",
+}
+
+DEFAULT_APPS = {
+    "tvinput.dtv": "Live TV",
+    "tvinput.hdmi1": "HDMI 1",
+    "12": "Netflix",
+    "2285": "Hulu",
+    "13": "Prime Video",
+    "837": "YouTube",
+    "291097": "Disney Plus",
+    "61322": "Max",
+}
+
+
+class FakeRoku:
+    """Minimal Roku ECP server backed by an in-memory state"""
+
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 8060, serial: str = "X00000000001"
+    ):
+        self.host = host
+        self.port = port
+        self.serial = serial
+        self.is_tv = True  # False for a stick or box, which has no tuner
+        self.power_mode = "PowerOn"
+        self.apps: Dict[str, str] = dict(DEFAULT_APPS)
+        self.active_app: Optional[str] = None  # None is the home screen
+        self.launch_delay = 0.0  # Seconds before a launched app becomes active
+        self.channels: Dict[str, str] = dict(DEFAULT_CHANNELS)
+        self.channel: Optional[str] = None  # Tuned by launching tvinput.dtv?ch=
+        self.requests: List[str] = []
+
+        self._runner: Optional[web.AppRunner] = None
+        self._discovery: Optional[asyncio.DatagramTransport] = None
+
+    async def start(self):
+        """Start serving ECP requests"""
+        app = web.Application()
+        app.router.add_get("/query/device-info", self._device_info)
+        app.router.add_get("/query/apps", self._apps)
+        app.router.add_get("/query/active-app", self._active_app)
+        app.router.add_get("/query/media-player", self._media_player)
+        app.router.add_get("/query/tv-channels", self._tv_channels)
+        app.router.add_post("/keypress/{key}", self._keypress)
+        app.router.add_post("/keydown/{key}", self._keypress)
+        app.router.add_post("/keyup/{key}", self._keyup)
+        app.router.add_post("/launch/{app_id}", self._launch)
+        app.router.add_post("/findremote", self._ok)
+        app.router.add_post("/search/browse", self._search_browse)
+
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Pick up the real port when started on port 0
+        self.port = self._runner.addresses[0][1]
+
+    async def start_discovery(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Answer roku:ecp searches on a UDP port, returns the port used"""
+        loop = asyncio.get_running_loop()
+        self._discovery, _ = await loop.create_datagram_endpoint(
+            lambda: SearchResponder(self.discovery_response), local_addr=(host, port)
+        )
+        return self._discovery.get_extra_info("sockname")[1]
+
+    def discovery_response(self) -> bytes:
+        """The response a Roku sends to a roku:ecp search"""
+        return (
+            "HTTP/1.1 200 OK\r\n"
+            "Cache-Control: max-age=3600\r\n"
+            "ST: roku:ecp\r\n"
+            f"Location: http://{self.host}:{self.port}/\r\n"
+            f"USN: uuid:roku:ecp:{self.serial}\r\n"
+            "\r\n"
+        ).encode()
+
+    async def stop(self):
+        """Stop the server"""
+        if self._discovery is not None:
+            self._discovery.close()
+            self._discovery = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _xml(self, body: str) -> web.Response:
+        return web.Response(
+            text='<?xml version="1.0" encoding="UTF-8" ?>\n' + body,
+            content_type="text/xml",
+        )
+
+    async def _ok(self, request: web.Request) -> web.Response:
+        self.requests.append(request.path_qs)
+        return web.Response()
+
+    async def _device_info(self, request: web.Request) -> web.Response:
+        self.requests.append(request.path_qs)
+        return self._xml(
+            "<device-info>\n"
+            f"\t<udn>29380000-0800-1025-80a4-{self.serial.lower()}</udn>\n"
+            f"\t<serial-number>{self.serial}</serial-number>\n"
+            f"\t<device-id>S{self.serial[1:]}</device-id>\n"
+            "\t<vendor-name>TCL</vendor-name>\n"
+            "\t<model-name>5 Series</model-name>\n"
+            "\t<model-number>7000X</model-number>\n"
+            "\t<model-region>US</model-region>\n"
+            f"\t<is-tv>{'true' if self.is_tv else 'false'}</is-tv>\n"
+            f"\t<is-stick>{'false' if self.is_tv else 'true'}</is-stick>\n"
+            "\t<supports-ethernet>true</supports-ethernet>\n"
+            "\t<wifi-mac>d8:31:34:00:00:01</wifi-mac>\n"
+            "\t<network-type>wifi</network-type>\n"
+            "\t<network-name>home</network-name>\n"
+            "\t<friendly-device-name>Living Room TV</friendly-device-name>\n"
+            "\t<friendly-model-name>TCL Roku TV</friendly-model-name>\n"
+            "\t<default-device-name>TCL Roku TV</default-device-name>\n"
+            "\t<user-device-name>Living Room TV</user-device-name>\n"
+            "\t<software-version>11.5.0</software-version>\n"
+            "\t<software-build>4312</software-build>\n"
+            "\t<secure-device>true</secure-device>\n"
+            "\t<language>en</language>\n"
+            "\t<country>US</country>\n"
+            "\t<locale>en_US</locale>\n"
+            "\t<time-zone>US/Eastern</time-zone>\n"
+            f"\t<power-mode>{self.power_mode}</power-mode>\n"
+            "\t<supports-suspend>true</supports-suspend>\n"
+            "\t<supports-find-remote>true</supports-find-remote>\n"
+            "\t<supports-audio-guide>true</supports-audio-guide>\n"
+            "\t<supports-rva>true</supports-rva>\n"
+            "\t<developer-enabled>false</developer-enabled>\n"
+            "\t<search-enabled>true</search-enabled>\n"
+            "\t<search-channels-enabled>true</search-channels-enabled>\n"
+            "\t<voice-search-enabled>true</voice-search-enabled>\n"
+            "\t<supports-private-listening>true</supports-private-listening>\n"
+            "\t<headphones-connected>false</headphones-connected>\n"
+            "\t<supports-ecs-textedit>true</supports-ecs-textedit>\n"
+            "\t<supports-ecs-microphone>true</supports-ecs-microphone>\n"
+            "\t<supports-wake-on-wlan>false</supports-wake-on-wlan>\n"
+            "\t<has-play-on-roku>true</has-play-on-roku>\n"
+            "\t<has-mobile-screensaver>false</has-mobile-screensaver>\n"
+            "\t<support-url>roku.com/support</support-url>\n"
+            "\t<uptime>86400</uptime>\n"
+            "</device-info>\n"
+        )
+
+    async def _apps(self, request: web.Request) -> web.Response:
+        self.requests.append(request.path_qs)
+        lines = []
+        for app_id, name in self.apps.items():
+            app_type = "tvin" if app_id.startswith("tvinput.") else "appl"
+            lines.append(
+                f'\t<app id="{app_id}" type="{app_type}" version="1.0.0">'
+                f"{escape(name)}</app>\n"
+            )
+        return self._xml("<apps>\n" + "".join(lines) + "</apps>\n")
+
+    async def _active_app(self, request: web.Request) -> web.Response:
+        self.requests.append(request.path_qs)
+        if self.active_app is None:
+            app = "\t<app>Roku</app>\n"
+        else:
+            app = (
+                f'\t<app id="{self.active_app}" type="appl" version="1.0.0">'
+                f"{escape(self.apps[self.active_app])}</app>\n"
+            )
+        return self._xml("<active-app>\n" + app + "</active-app>\n")
+
+    async def _media_player(self, request: web.Request) -> web.Response:
+        self.requests.append(request.path_qs)
+        if self.active_app is None:
+            return self._xml('<player error="false" state="close" />\n')
+        return self._xml(
+            '<player error="false" state="play">\n'
+            f'\t<plugin bandwidth="10000000 bps" id="{self.active_app}" '
+            f'name="{escape(self.apps[self.active_app])}"/>\n'
+            '\t<format audio="aac" captions="none" container="hls" '
+            'drm="none" video="mpeg4_10b"/>\n'
+            "\t<position>1000 ms</position>\n"
+            "\t<duration>3600000 ms</duration>\n"
+            "\t<is_live>false</is_live>\n"
+            "</player>\n"
+        )
+
+    async def _tv_channels(self, request: web.Request) -> web.Response:
+        self.requests.append(request.path_qs)
+        lines = [
+            "\t<channel>\n"
+            f"\t\t<number>{number}</number>\n"
+            f"\t\t<name>{escape(name)}</name>\n"
+            "\t\t<type>air-digital</type>\n"
+            "\t\t<user-hidden>false</user-hidden>\n"
+            "\t</channel>\n"
+            for number, name in self.channels.items()
+        ]
+        return self._xml("<tv-channels>\n" + "".join(lines) + "</tv-channels>\n")
+
+    async def _keypress(self, request: web.Request) -> web.Response:
+        self.requests.append(request.path_qs)
+        key = request.match_info["key"]
+        if key == "PowerOn":
+            self.power_mode = "PowerOn"
+        elif key == "PowerOff":
+            self.power_mode = "DisplayOff"
+        elif key == "Power":
+            self.power_mode = (
+                "DisplayOff" if self.power_mode == "PowerOn" else "PowerOn"
+            )
+        elif key == "Home":
+            self.active_app = None
+        return web.Response()
+
+    async def _keyup(self, request: web.Request) -> web.Response:
+        self.requests.append(request.path_qs)
+        return web.Response()
+
+    async def _search_browse(self, request: web.Request) -> web.Response:
+        self.requests.append(request.path_qs)
+        provider = request.query.get("provider-id")
+        if request.query.get("launch") == "true" and provider in self.apps:
+            self._activate(provider)
+        return web.Response()
+
+    async def _launch(self, request: web.Request) -> web.Response:
+        self.requests.append(request.path_qs)
+        app_id = request.match_info["app_id"]
+        if app_id not in self.apps:
+            return web.Response(status=404)
+        if "ch" in request.query:
+            if request.query["ch"] not in self.channels:
+                return web.Response(status=400)
+            self.channel = request.query["ch"]
+        self._activate(app_id)
+        return web.Response()
+
+    def _activate(self, app_id: str):
+        """Bring an app to the foreground, after launch_delay like a real TV"""
+        if self.launch_delay:
+            loop = asyncio.get_running_loop()
+            loop.call_later(self.launch_delay, setattr, self, "active_app", app_id)
+        else:
+            self.active_app = app_id
+
+
+async def _serve(host: str, port: int, launch_delay: float = 0.0):
+    roku = FakeRoku(host=host, port=port)
+    roku.launch_delay = launch_delay
+    await roku.start()
+    logger.info(f"Fake Roku listening on {host}:{roku.port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await roku.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake Roku TV")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8060)
+    parser.add_argument(
+        "--launch-delay", type=float, default=0.0, help="Seconds to start an app"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_serve(args.host, args.port, args.launch_delay))
@@ -0,0 +1,282 @@
+# tests/fake_yeelight.py
+"""Local stand-in for a Yeelight bulb, for testing without hardware.
+
+Run it with `python -m tests.fake_yeelight --port 55443` and point a
+light at 127.0.0.1 (e.g. LOCAL_YEELIGHT_IP_ADDRESS=127.0.0.1).
+"""
+
+from typing import Dict, Any, Callable, List, Optional, Set
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from app.devices.yeelight_client import YEELIGHT_PORT
+
+logger = logging.getLogger(__name__)
+
+
+class SearchResponder(asyncio.DatagramProtocol):
+    """Answers multicast M-SEARCH requests, a local stand-in for SSDP"""
+
+    def __init__(self, response: Callable[[], bytes]):
+        self.response = response
+        self.transport: Optional[asyncio.DatagramTransport] = None
+
+    def connection_made(self, transport: asyncio.DatagramTransport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        if data.startswith(b"M-SEARCH"):
+            self.transport.sendto(self.response(), addr)
+
+
+class FakeYeelightBulb:
+    """Minimal Yeelight LAN protocol server backed by an in-memory state"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = YEELIGHT_PORT,
+        bulb_id: str = "0x0000000000fa4e01",
+        model: str = "color",
+        quota: Optional[int] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.bulb_id = bulb_id
+        self.model = model
+        self.quota = quota  # Commands per minute per connection, like real bulbs
+        self.properties: Dict[str, str] = {
+            "power": "off",
+            "bright": "100",
+            "ct": "4000",
+            "rgb": "16777215",
+            "color_mode": "2",
+            "name": "",
+            "music_on": "0",
+        }
+        self.commands: List[Dict[str, Any]] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: List[asyncio.StreamWriter] = []
+        self._handlers: Set[asyncio.Task] = set()
+        self._discovery: Optional[asyncio.DatagramTransport] = None
+
+    async def start(self):
+        """Start accepting connections"""
+        self._server = await asyncio.start_server(
+            self._handle_client, self.host, self.port
+        )
+        # Pick up the real port when started on port 0
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def start_discovery(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Answer Yeelight searches on a UDP port, returns the port used"""
+        loop = asyncio.get_running_loop()
+        self._discovery, _ = await loop.create_datagram_endpoint(
+            lambda: SearchResponder(self.discovery_response), local_addr=(host, port)
+        )
+        return self._discovery.get_extra_info("sockname")[1]
+
+    def discovery_response(self) -> bytes:
+        """The response a bulb sends to a wifi_bulb search"""
+        lines = [
+            "HTTP/1.1 200 OK",
+            "Cache-Control: max-age=3600",
+            f"Location: yeelight://{self.host}:{self.port}",
+            "Server: POSIX UPnP/1.0 YGLC/1",
+            f"id: {self.bulb_id}",
+            f"model: {self.model}",
+            "support: get_prop set_power toggle set_bright set_scene set_ct_abx "
+            "set_rgb set_music set_name",
+        ]
+        lines += [f"{key}: {value}" for key, value in self.properties.items()]
+        return ("\r\n".join(lines) + "\r\n").encode()
+
+    async def stop(self):
+        """Close the server and every client connection"""
+        if self._discovery is not None:
+            self._discovery.close()
+            self._discovery = None
+        for writer in self._clients:
+            writer.close()
+        self._clients.clear()
+        for task in self._handlers:
+            task.cancel()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def drop_connections(self):
+        """Close every control connection, like a bulb dropping off the network"""
+        for writer in self._clients:
+            writer.close()
+        self._clients.clear()
+
+    async def _handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        self._clients.append(writer)
+        self._handlers.add(asyncio.current_task())
+        sent_at: List[float] = []
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    continue
+
+                self.commands.append(request)
+                if self._over_quota(sent_at):
+                    error = {"code": -1, "message": "client quota exceeded"}
+                    self._send(writer, {"id": request.get("id"), "error": error})
+                    continue
+
+                response, changes = self.handle_request(request)
+                self._send(writer, response)
+                if changes:
+                    self.notify(changes)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._handlers.discard(asyncio.current_task())
+            if writer in self._clients:
+                self._clients.remove(writer)
+            writer.close()
+
+    def _over_quota(self, sent_at: List[float]) -> bool:
+        if self.quota is None:
+            return False
+        now = time.monotonic()
+        sent_at[:] = [t for t in sent_at if t > now - 60]
+        if len(sent_at) >= self.quota:
+            return True
+        sent_at.append(now)
+        return False
+
+    async def _music_client(self, host: str, port: int):
+        """Connect back to a music mode server and apply what it sends"""
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            self.properties["music_on"] = "0"
+            return
+
+        self._handlers.add(asyncio.current_task())
+        try:
+            while self.properties["music_on"] == "1":
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    continue
+                self.commands.append(request)
+                # Music mode commands are neither acknowledged nor notified
+                self.handle_request(request)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._handlers.discard(asyncio.current_task())
+            self.properties["music_on"] = "0"
+            writer.close()
+
+    def _send(self, writer: asyncio.StreamWriter, message: Dict[str, Any]):
+        if not writer.is_closing():
+            writer.write(json.dumps(message).encode() + b"\r\n")
+
+    def notify(self, changes: Dict[str, str]):
+        """Send a props notification to every connected client"""
+        for writer in list(self._clients):
+            self._send(writer, {"method": "props", "params": changes})
+
+    def handle_request(self, request: Dict[str, Any]):
+        """Apply a request and return the response plus any property changes"""
+        method = request.get("method")
+        params = request.get("params", [])
+        request_id = request.get("id")
+
+        handler = getattr(self, f"_cmd_{method}", None)
+        if handler is None:
+            error = {"code": -1, "message": "method not supported"}
+            return {"id": request_id, "error": error}, {}
+
+        try:
+            result, changes = handler(params)
+        except (IndexError, TypeError, ValueError):
+            error = {"code": -1, "message": "invalid params"}
+            return {"id": request_id, "error": error}, {}
+
+        self.properties.update(changes)
+        return {"id": request_id, "result": result}, changes
+
+    def _cmd_get_prop(self, params):
+        return [self.properties.get(name, "") for name in params], {}
+
+    def _cmd_set_power(self, params):
+        changes = {"power": params[0]}
+        # Optional fourth parameter switches mode while turning on
+        if params[0] == "on" and len(params) > 3 and params[3] in (1, 2):
+            changes["color_mode"] = "2" if params[3] == 1 else "1"
+        return ["ok"], changes
+
+    def _cmd_toggle(self, params):
+        power = "off" if self.properties["power"] == "on" else "on"
+        return ["ok"], {"power": power}
+
+    def _cmd_set_bright(self, params):
+        return ["ok"], {"bright": str(int(params[0]))}
+
+    def _cmd_set_ct_abx(self, params):
+        return ["ok"], {"ct": str(int(params[0])), "color_mode": "2"}
+
+    def _cmd_set_rgb(self, params):
+        return ["ok"], {"rgb": str(int(params[0])), "color_mode": "1"}
+
+    def _cmd_set_scene(self, params):
+        changes = {"power": "on"}
+        if params[0] == "color":
+            changes.update({"rgb": str(int(params[1])), "color_mode": "1"})
+            changes["bright"] = str(int(params[2]))
+        elif params[0] == "ct":
+            changes.update({"ct": str(int(params[1])), "color_mode": "2"})
+            changes["bright"] = str(int(params[2]))
+        else:
+            raise ValueError(f"Unsupported scene: {params[0]}")
+        return ["ok"], changes
+
+    def _cmd_set_music(self, params):
+        if params[0] == 1:
+            asyncio.create_task(self._music_client(params[1], int(params[2])))
+            return ["ok"], {"music_on": "1"}
+        return ["ok"], {"music_on": "0"}
+
+    def _cmd_set_name(self, params):
+        return ["ok"], {"name": str(params[0])}
+
+
+async def _serve(host: str, port: int):
+    bulb = FakeYeelightBulb(host=host, port=port)
+    await bulb.start()
+    logger.info(f"Fake Yeelight bulb listening on {host}:{bulb.port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await bulb.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake Yeelight bulb")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=YEELIGHT_PORT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_serve(args.host, args.port))
@@ -0,0 +1,146 @@
+# tests/test_discovery.py
+"""Matching devices found on the network to the registry's known devices
+
+Addresses in 127.0.0.0/8 stand in for the LAN: nothing listens on most of
+them, so controllers fail fast when they try to reach their device.
+"""
+
+import json
+
+from app.config import settings
+from app.devices.discovery import discover_roku
+from tests.fake_roku import FakeRoku
+
+SERIAL = "X00000000001"
+HARDWARE_ID = f"roku:{SERIAL}"
+
+
+def found_tv(ip_address, hardware_id=HARDWARE_ID):
+    return {
+        "type": "tv",
+        "hardware_id": hardware_id,
+        "ip_address": ip_address,
+        "name": "Roku TV",
+    }
+
+
+def found_light(ip_address, hardware_id):
+    return {
+        "type": "light",
+        "hardware_id": hardware_id,
+        "ip_address": ip_address,
+        "name": "Yeelight",
+    }
+
+
+def add_tv(registry, ip_address, hardware_id=None, device_id="tv_1"):
+    config = {"ip_address": ip_address, "name": "Main TV", "room": "Living Room"}
+    if hardware_id:
+        config["hardware_id"] = hardware_id
+    return registry.create_device_controller(device_id, "tv", config)
+
+
+def saved_devices():
+    with open(settings.DEVICES_FILE) as f:
+        return json.load(f)
+
+
+def test_known_device_matched_by_hardware_id(registry, run):
+    async def scenario():
+        await add_tv(registry, "127.0.0.3", HARDWARE_ID)
+        await registry.merge_discovered([found_tv("127.0.0.3")])
+
+    run(scenario)
+
+    assert list(registry.devices) == ["tv_1"]
+    assert registry.get_device("tv_1").ip_address == "127.0.0.3"
+
+
+def test_device_found_at_new_ip_is_moved(registry, run):
+    async def scenario():
+        await add_tv(registry, "127.0.0.3", HARDWARE_ID)
+        await registry.merge_discovered([found_tv("127.0.0.4")])
+
+    run(scenario)
+
+    tv = registry.get_device("tv_1")
+    assert list(registry.devices) == ["tv_1"]
+    assert tv.ip_address == "127.0.0.4"
+    assert tv.base_url == "http://127.0.0.4:8060"
+    assert saved_devices()["tv_1"]["config"]["ip_address"] == "127.0.0.4"
+
+
+def test_device_configured_by_ip_learns_its_hardware_id(registry, run):
+    async def scenario():
+        await add_tv(registry, "127.0.0.3")
+        await registry.merge_discovered([found_tv("127.0.0.3")])
+
+    run(scenario)
+
+    assert list(registry.devices) == ["tv_1"]
+    assert registry.get_device_by_hardware_id(HARDWARE_ID) is registry.devices["tv_1"]
+    assert saved_devices()["tv_1"]["config"]["hardware_id"] == HARDWARE_ID
+
+
+def test_device_configured_by_ip_is_moved(registry, run):
+    async def scenario():
+        await add_tv(registry, "127.0.0.3")
+        await registry.merge_discovered([found_tv("127.0.0.4")])
+
+    run(scenario)
+
+    tv = registry.get_device("tv_1")
+    assert list(registry.devices) == ["tv_1"]
+    assert tv.ip_address == "127.0.0.4"
+    assert tv.hardware_id == HARDWARE_ID
+
+
+def test_moved_device_is_not_guessed_between_several(registry, run):
+    async def scenario():
+        for n, ip_address in enumerate(["127.0.0.5", "127.0.0.6"], start=1):
+            await registry.create_device_controller(
+                f"light_{n}", "light", {"ip_address": ip_address, "room": "Office"}
+            )
+        await registry.merge_discovered([found_light("127.0.0.7", "yeelight:0x1")])
+
+    run(scenario)
+
+    assert sorted(registry.devices) == ["light_1", "light_2", "light_3"]
+    assert registry.get_device("light_1").ip_address == "127.0.0.5"
+    assert registry.get_device("light_2").ip_address == "127.0.0.6"
+    assert registry.get_device("light_3").hardware_id == "yeelight:0x1"
+
+
+def test_unknown_device_is_added(registry, run):
+    async def scenario():
+        await add_tv(registry, "127.0.0.3", HARDWARE_ID)
+        await registry.merge_discovered([found_tv("127.0.0.4", "roku:X00000000002")])
+
+    run(scenario)
+
+    assert sorted(registry.devices) == ["tv_1", "tv_2"]
+    assert registry.get_device("tv_2").ip_address == "127.0.0.4"
+    assert saved_devices()["tv_2"]["config"]["hardware_id"] == "roku:X00000000002"
+
+
+def test_discovered_roku_is_followed_to_its_new_address(registry, run):
+    async def scenario():
+        roku = FakeRoku(host="127.0.0.2", port=8060, serial=SERIAL)
+        await roku.start()
+        try:
+            port = await roku.start_discovery(host="127.0.0.2")
+            await add_tv(registry, "127.0.0.3", HARDWARE_ID)
+
+            found = await discover_roku(0.5, target=("127.0.0.2", port))
+            assert found == [found_tv("127.0.0.2")]
+
+            await registry.merge_discovered(found)
+            return await registry.get_device("tv_1").get_status()
+        finally:
+            await roku.stop()
+
+    status = run(scenario)
+
+    assert list(registry.devices) == ["tv_1"]
+    assert registry.get_device("tv_1").ip_address == "127.0.0.2"
+    assert status["power"] is True
@@ -0,0 +1,114 @@
+# tests/test_ecp.py
+"""ECP response parsing, on the responses recorded in benchmarks/fixtures"""
+
+from pathlib import Path
+
+from app.devices import ecp
+
+FIXTURES = Path(__file__).parent.parent / "benchmarks" / "fixtures"
+
+
+def fixture(name: str) -> bytes:
+    return (FIXTURES / name).read_bytes()
+
+
+def parse_in_chunks(parser: ecp.EcpParser, data: bytes, size: int = 64):
+    """Feed a response the way it arrives from the network"""
+    for start in range(0, len(data), size):
+        if parser.feed(data[start : start + size]):
+            return parser.result()
+    parser.close()
+    return parser.result()
+
+
+def test_device_info_fields():
+    info = ecp.parse_device_info(fixture("device-info.xml"))
+
+    assert info.serial_number == "X00000000001"
+    assert info.device_id == "S00000000001"
+    assert info.model_name == "5 Series"
+    assert info.power_mode == "PowerOn" and info.power_on
+    assert info.is_tv is True
+    assert info.supports_find_remote is True
+
+
+def test_device_info_stops_after_the_wanted_field():
+    data = fixture("device-info.xml")
+    parser = ecp.DeviceInfoParser(stop_after="serial-number")
+
+    info = parse_in_chunks(parser, data)
+
+    assert parser.done
+    assert info.serial_number == "X00000000001"
+    # Fields after the stop are never read
+    assert info.power_mode == ""
+    assert info.is_tv is False
+
+
+def test_device_info_read_in_chunks_matches_a_full_parse():
+    data = fixture("device-info.xml")
+
+    assert parse_in_chunks(ecp.DeviceInfoParser(), data) == ecp.parse_device_info(data)
+
+
+def test_power_mode_byte_search():
+    data = fixture("device-info.xml")
+
+    assert ecp.find_power_mode(data) == "PowerOn"
+    assert ecp.find_power_mode(data[: data.index(b"</power-mode>")]) is None
+    assert ecp.find_power_mode(b"<device-info></device-info>") is None
+
+
+def test_active_app():
+    active = ecp.parse_active_app(fixture("active-app.xml"))
+
+    assert active.app == ecp.App(id="12", name="Netflix", type="appl", version="1.0.0")
+    assert active.screensaver is None
+
+
+def test_home_screen_has_no_active_app():
+    # <app>Roku</app> without an id is the home screen
+    assert ecp.parse_active_app(fixture("active-app-home.xml")) == ecp.ActiveApp()
+
+
+def test_apps_attributes():
+    apps = ecp.parse_apps(fixture("apps.xml"))
+    by_id = {app.id: app for app in apps}
+
+    assert len(apps) == 32
+    assert by_id["tvinput.dtv"] == ecp.App("tvinput.dtv", "Live TV", "tvin", "1.0.0")
+    assert by_id["12"].type == "appl"
+    # Entities are decoded in names
+    assert by_id["13535"].name == "Plex - Free Movies & TV"
+    assert by_id["12"].as_dict() == {"id": "12", "name": "Netflix"}
+
+
+def test_apps_without_id_or_attributes():
+    apps = ecp.parse_apps(b"<apps><app>Broken</app><app id='5'> Bare </app></apps>")
+
+    assert apps == [ecp.App(id="5", name="Bare", type="appl", version="")]
+
+
+def test_media_player():
+    player = ecp.parse_media_player(fixture("media-player.xml"))
+
+    assert player.state == "play" and not player.error
+    assert (player.app_id, player.app_name) == ("12", "Netflix")
+    assert (player.position_ms, player.duration_ms) == (1000, 3600000)
+    assert player.is_live is False
+
+
+def test_channels_keep_the_hidden_flag():
+    channels = ecp.parse_channels(fixture("tv-channels.xml"))
+
+    assert [channel.number for channel in channels] == [
+        "2.1",
+        "4.1",
+        "7.1",
+        "7.2",
+        "13.1",
+    ]
+    hidden = [channel.number for channel in channels if channel.hidden]
+    # A channel without <user-hidden> counts as shown
+    assert hidden == ["4.1"]
+    assert channels[0] == ecp.Channel("2.1", "WCBS-HD", "air-digital", False)
@@ -0,0 +1,220 @@
+# tests/test_lights.py
+"""Yeelight state changes, checked on their own and against the fake bulb"""
+
+import asyncio
+
+from app.devices.command_queue import CommandQueue
+from app.devices.lights import (
+    FrameStream,
+    YeelightController,
+    compile_state_change,
+    merge_state_change,
+)
+from app.devices.rate_limit import PRIORITY_BACKGROUND, PRIORITY_USER, TokenBucket
+from app.devices.yeelight_client import YeelightClient, YeelightError
+from tests.conftest import wait_until
+from tests.fake_yeelight import FakeYeelightBulb
+
+SMOOTH = ["smooth", 300]
+ON = {"power": "on", "bright": "80", "ct": "4000", "rgb": "0", "color_mode": "2"}
+OFF = dict(ON, power="off")
+
+
+def test_single_change_uses_its_own_command():
+    commands, changes = compile_state_change({"brightness": 50}, ON)
+
+    assert commands == [("set_bright", [50] + SMOOTH)]
+    assert changes == {"bright": "50"}
+
+
+def test_several_changes_on_a_lit_bulb_become_one_scene():
+    commands, changes = compile_state_change({"brightness": 50, "color_temp": 3000}, ON)
+
+    assert commands == [("set_scene", ["ct", 3000, 50])]
+    assert changes["power"] == "on"
+
+
+def test_turning_on_with_a_change_becomes_one_scene():
+    commands, _ = compile_state_change({"power": True, "rgb": (255, 0, 0)}, OFF)
+
+    # The brightness is kept
+    assert commands == [("set_scene", ["color", 0xFF0000, 80])]
+
+
+def test_bulb_that_is_off_stays_off():
+    for state in ({"brightness": 50}, {"brightness": 50, "color_temp": 3000}):
+        commands, changes = compile_state_change(state, OFF)
+
+        assert "set_scene" not in [method for method, _ in commands]
+        assert "power" not in changes
+
+    commands, _ = compile_state_change({"brightness": 50, "color_temp": 3000}, OFF)
+    assert commands == [
+        ("set_bright", [50] + SMOOTH),
+        ("set_ct_abx", [3000] + SMOOTH),
+    ]
+
+
+def test_turning_off_ignores_other_changes():
+    commands, changes = compile_state_change({"power": False, "brightness": 50}, ON)
+
+    assert commands == [("set_power", ["off"] + SMOOTH)]
+    assert changes == {"power": "off"}
+
+
+def test_merge_keeps_the_newest_value_of_each_kind():
+    merged = merge_state_change(
+        {"brightness": 10, "color_temp": 3000}, {"rgb": (1, 2, 3)}
+    )
+    assert merged == {"brightness": 10, "rgb": (1, 2, 3)}
+
+    merged = merge_state_change(merged, {"brightness": 20, "color_temp": 2700})
+    assert merged == {"brightness": 20, "color_temp": 2700}
+
+
+def test_merge_turning_off_drops_pending_targets():
+    assert merge_state_change({"brightness": 10}, {"power": False}) == {"power": False}
+    assert merge_state_change({"power": False}, {"power": True, "brightness": 5}) == {
+        "power": True,
+        "brightness": 5,
+    }
+
+
+async def with_bulb(action, **bulb_options):
+    """Run action(light, bulb) against a fake bulb on a free port"""
+    bulb = FakeYeelightBulb(port=0, **bulb_options)
+    await bulb.start()
+    light = YeelightController("127.0.0.1", name="Desk")
+    light.client.port = bulb.port
+    try:
+        return await action(light, bulb)
+    finally:
+        await light.close()
+        await bulb.stop()
+
+
+def test_client_matches_pipelined_responses_by_id(run):
+    async def action(light, bulb):
+        client = YeelightClient("127.0.0.1", port=bulb.port, timeout=2.0)
+        try:
+            results = await asyncio.gather(
+                client.get_properties(["power", "bright"]),
+                client.send_command("set_bright", [30, "sudden", 0]),
+                client.send_command("no_such_method", []),
+                client.get_properties(["bright"]),
+                return_exceptions=True,
+            )
+        finally:
+            await client.close()
+        return results, [command["id"] for command in bulb.commands]
+
+    (before, ok, error, after), ids = run(lambda: with_bulb(action))
+
+    assert before == {"power": "off", "bright": "100"}
+    assert ok == ["ok"]
+    assert isinstance(error, YeelightError)
+    assert after == {"bright": "30"}
+    # Written back to back in call order, each with its own id
+    assert ids == [1, 2, 3, 4]
+
+
+def test_concurrent_changes_are_sent_as_one_command(run):
+    async def action(light, bulb):
+        bulb.properties["power"] = "on"
+        results = await asyncio.gather(
+            light.set_state(brightness=10),
+            light.set_state(brightness=20),
+            light.set_state(color_temp=3000),
+        )
+        return results, [command["method"] for command in bulb.commands]
+
+    results, methods = run(lambda: with_bulb(action))
+
+    # The properties are read once, then all three land in one scene
+    assert methods == ["get_prop", "set_scene"]
+    assert all(result == results[0] for result in results)
+    assert results[0]["brightness"] == 20
+    assert results[0]["color_temp"] == 3000
+
+
+def test_queue_merges_commands_submitted_while_sending(run):
+    sent = []
+
+    async def scenario():
+        sending = asyncio.Event()
+
+        async def execute(command):
+            sent.append(command)
+            await sending.wait()
+            return {"status": "success", **command}
+
+        queue = CommandQueue(execute, merge=merge_state_change)
+        first = asyncio.create_task(queue.submit({"brightness": 10}))
+        await asyncio.sleep(0.01)
+        later = [
+            asyncio.create_task(queue.submit(command))
+            for command in ({"brightness": 20}, {"rgb": (1, 2, 3)}, {"brightness": 30})
+        ]
+        await asyncio.sleep(0.01)
+        sending.set()
+        return await first, await asyncio.gather(*later), queue.sent
+
+    first, later, batches = run(scenario)
+
+    assert sent == [{"brightness": 10}, {"brightness": 30, "rgb": (1, 2, 3)}]
+    assert first["brightness"] == 10
+    assert all(result == later[0] for result in later)
+    assert batches == 2
+
+
+def test_background_work_leaves_the_reserve_to_users():
+    bucket = TokenBucket(4, period=60.0, reserve=2)
+
+    assert bucket.try_acquire(PRIORITY_BACKGROUND)
+    assert bucket.try_acquire(PRIORITY_BACKGROUND)
+    assert not bucket.try_acquire(PRIORITY_BACKGROUND)
+    assert bucket.try_acquire(PRIORITY_USER)
+    assert bucket.try_acquire(PRIORITY_USER)
+    assert not bucket.try_acquire(PRIORITY_USER)
+    assert bucket.usage()["used_last_period"] == 4
+
+
+def test_status_is_served_from_cache_within_the_reserve(run):
+    async def action(light, bulb):
+        first = await light.get_status()
+        reads = len(bulb.commands)
+
+        # Down to the reserve: status reads stop asking the bulb
+        light.budget.tokens = light.budget.reserve
+        second = await light.get_status()
+        return first, second, reads, len(bulb.commands)
+
+    first, second, reads_before, reads_after = run(lambda: with_bulb(action))
+
+    assert reads_before == reads_after == 1
+    assert second == first
+
+
+def test_frame_stream_sends_only_the_newest_frame(run):
+    async def action(light, bulb):
+        assert await light.start_music_mode()
+        stream = FrameStream(light, max_fps=10)
+        for brightness in (10, 20, 30, 40):
+            stream.push({"power": True, "brightness": brightness})
+        stream.push({"rgb": (255, 0, 0)})
+
+        sender = asyncio.create_task(stream.run())
+        try:
+            await wait_until(lambda: bulb.properties["bright"] == "40")
+        finally:
+            sender.cancel()
+            await asyncio.gather(sender, return_exceptions=True)
+        music = [c["method"] for c in bulb.commands if c["method"] != "get_prop"]
+        return stream.sent, stream.dropped, music, dict(bulb.properties)
+
+    sent, dropped, methods, properties = run(lambda: with_bulb(action))
+
+    assert (sent, dropped) == (1, 4)
+    assert methods == ["set_music", "set_scene"]
+    assert properties["power"] == "on"
+    assert properties["rgb"] == str(0xFF0000)
@@ -0,0 +1,35 @@
+# tests/test_listener.py
+"""The notification listener keeping bulbs connected"""
+
+from app.devices.lights import YeelightController
+from tests.conftest import wait_until
+from tests.fake_yeelight import FakeYeelightBulb
+
+
+def test_listener_reconnects_while_in_music_mode(registry, run):
+    async def scenario():
+        bulb = FakeYeelightBulb(port=0)
+        await bulb.start()
+        light = YeelightController("127.0.0.1", name="Desk")
+        light.client.port = bulb.port
+        registry.devices["light_1"] = light
+        registry.listener.start()
+        try:
+            await wait_until(lambda: light.push_updates)
+            assert await light.start_music_mode()
+
+            # Status reads come from the cache now, the listener must still
+            # reconnect instead of spinning on the lost connection
+            dropped = list(bulb._clients)
+            bulb.drop_connections()
+            await wait_until(lambda: bulb._clients and bulb._clients != dropped)
+            await wait_until(lambda: light.client.connected)
+            return light.music.active, len(bulb._clients)
+        finally:
+            await registry.listener.stop()
+            await bulb.stop()
+
+    music_active, clients = run(scenario)
+
+    assert music_active
+    assert clients == 1
@@ -0,0 +1,48 @@
+# tests/test_remote_control.py
+"""The TV remote-control WebSocket"""
+
+import asyncio
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import tv as tv_api
+from app.devices.tv import RokuController
+
+
+def test_remote_control_answers_bad_messages(registry, monkeypatch):
+    monkeypatch.setattr(tv_api, "registry", registry)
+    tv = RokuController("127.0.0.10", name="TV")
+    registry.devices["tv_1"] = tv
+    app = FastAPI()
+    app.include_router(tv_api.router, prefix="/tv")
+
+    messages = [
+        "{not json",
+        json.dumps({"id": 1}),
+        json.dumps({"id": 2, "c": []}),
+        json.dumps({"id": 3, "c": {"a": 1}}),
+        json.dumps({"id": 4, "c": "warp"}),
+        json.dumps({"id": 5, "c": "repeat_stop", "bogus": 1}),
+        json.dumps({"id": 6, "c": "repeat_stop"}),
+    ]
+    try:
+        with TestClient(app) as client:
+            with client.websocket_connect("/tv/tv_1/ws") as websocket:
+                replies = []
+                for message in messages:
+                    websocket.send_text(message)
+                    replies.append(websocket.receive_json())
+    finally:
+        asyncio.run(tv.close())
+
+    errors = [reply["result"].get("error", "") for reply in replies]
+    assert errors[:4] == ["Bad message"] * 4
+    assert errors[4] == "Unknown command: warp"
+    assert errors[5].startswith("Bad arguments")
+    # The socket is still open and answering
+    assert replies[6] == {
+        "id": 6,
+        "result": {"status": "success", "key": None, "presses": 0},
+    }
@@ -0,0 +1,260 @@
+# tests/test_tmdb_cache.py
+"""The TMDb provider cache: freshness, eviction, its file and shared lookups"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.devices import tmdb_cache as tmdb_cache_module
+from app.devices import tv as tv_module
+from app.devices.executor import write_file
+from app.devices.tmdb_cache import TmdbCache
+from app.devices.tv import RokuController
+
+HOUR = 3600.0
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "tmdb_cache.json")
+
+
+def new_cache(path, max_entries=100):
+    return TmdbCache(path, ttl=24 * HOUR, negative_ttl=HOUR, max_entries=max_entries)
+
+
+def age(cache, kind, title, seconds):
+    """Make an entry look `seconds` old"""
+    cache.entries[cache.key(kind, title, "US")]["fetched_at"] -= seconds
+
+
+def test_entries_expire_after_their_ttl(path, run):
+    async def scenario():
+        cache = new_cache(path)
+        await cache.put("movie", "Alien", "US", ["Hulu"])
+        await cache.put("movie", "Obscure", "US", [])
+        fresh = [await cache.get("movie", "Alien", "US")]
+
+        # Titles without providers are looked up again sooner
+        age(cache, "movie", "Alien", 2 * HOUR)
+        age(cache, "movie", "Obscure", 2 * HOUR)
+        after_hours = [
+            await cache.get("movie", "Alien", "US"),
+            await cache.get("movie", "Obscure", "US"),
+        ]
+
+        age(cache, "movie", "Alien", 24 * HOUR)
+        expired = await cache.get("movie", "Alien", "US")
+        await cache.close()
+        return fresh, after_hours, expired
+
+    fresh, (alien, obscure), expired = run(scenario)
+
+    assert fresh[0].fresh and fresh[0].providers == ["Hulu"]
+    assert alien.fresh
+    assert not obscure.fresh and obscure.providers == []
+    # Expired entries are kept, to be served when TMDb can't be reached
+    assert not expired.fresh and expired.providers == ["Hulu"]
+
+
+def test_least_recently_used_title_is_dropped(path, run):
+    async def scenario():
+        cache = new_cache(path, max_entries=2)
+        await cache.put("movie", "Alien", "US", ["Hulu"])
+        await cache.put("movie", "Heat", "US", ["Max"])
+        await cache.get("movie", "Alien", "US")
+        await cache.put("movie", "Ran", "US", ["Max"])
+        titles = [
+            title
+            for title in ("Alien", "Heat", "Ran")
+            if await cache.get("movie", title, "US") is not None
+        ]
+        await cache.close()
+        return titles
+
+    assert run(scenario) == ["Alien", "Ran"]
+
+
+def test_titles_match_by_case_and_spacing_in_any_script(path, run):
+    # Regression: non-Latin titles all collapsed onto one key
+    async def scenario():
+        cache = new_cache(path)
+        await cache.put("movie", "千と千尋の神隠し", "US", ["Max"])
+        await cache.put("movie", "君の名は。", "US", ["Netflix"])
+        await cache.put("movie", "The Matrix", "US", ["Max"])
+        found = [
+            await cache.get("movie", "千と千尋の神隠し", "US"),
+            await cache.get("movie", "君の名は。", "US"),
+            await cache.get("movie", "  the   MATRIX ", "US"),
+        ]
+        await cache.close()
+        return [entry.providers for entry in found], len(cache.entries)
+
+    providers, entries = run(scenario)
+
+    assert providers == [["Max"], ["Netflix"], ["Max"]]
+    assert entries == 3
+
+
+def test_cache_file_round_trip(path, run):
+    async def scenario():
+        cache = new_cache(path)
+        await cache.put("movie", "Alien", "US", ["Hulu"])
+        await cache.put("tv", "Severance", "US", ["Apple TV+"])
+        await cache.close()
+
+        reloaded = new_cache(path)
+        return [
+            (await reloaded.get("movie", "Alien", "US")).providers,
+            (await reloaded.get("tv", "Severance", "US")).providers,
+        ]
+
+    assert run(scenario) == [["Hulu"], ["Apple TV+"]]
+
+
+def test_concurrent_callers_wait_for_one_load(path, run):
+    # Regression: callers arriving during the load saw an empty cache, and
+    # their changes were overwritten by the older entries from the file
+    now = time.time()
+    stored = {
+        "movie:US:alien": {"providers": ["Hulu"], "fetched_at": now},
+        "movie:US:heat": {"providers": ["Netflix"], "fetched_at": now},
+    }
+    write_file(path, json.dumps(stored))
+
+    async def scenario():
+        cache = new_cache(path)
+        first, second, _ = await asyncio.gather(
+            cache.get("movie", "Alien", "US"),
+            cache.get("movie", "Alien", "US"),
+            cache.put("movie", "Heat", "US", ["Max"]),
+        )
+        heat = await cache.get("movie", "Heat", "US")
+        await cache.close()
+        return first, second, heat
+
+    first, second, heat = run(scenario)
+
+    assert first is not None and first.providers == ["Hulu"]
+    assert second is not None and second.providers == ["Hulu"]
+    assert heat.providers == ["Max"]
+
+
+def test_failed_write_keeps_changes_for_the_next(path, run, monkeypatch):
+    # Regression: a failed write marked the cache as saved
+    writes = []
+
+    def flaky_write_file(*args):
+        writes.append(args)
+        if len(writes) == 1:
+            raise OSError("disk full")
+        write_file(*args)
+
+    monkeypatch.setattr(tmdb_cache_module, "write_file", flaky_write_file)
+
+    async def scenario():
+        cache = new_cache(path)
+        await cache.put("movie", "Alien", "US", ["Hulu"])
+        await cache.save()
+        pending = cache._saved_changes != cache._changes
+        await cache.close()
+        return pending
+
+    assert run(scenario)
+    assert len(writes) == 2
+    with open(path) as f:
+        assert list(json.load(f)) == ["movie:US:alien"]
+
+
+def test_concurrent_lookups_of_a_title_share_one_request(path, run):
+    calls = []
+
+    async def lookup():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return ["Hulu"]
+
+    async def scenario():
+        cache = new_cache(path)
+        results = await asyncio.gather(
+            *(cache.fetch("movie", "Alien", "US", lookup) for _ in range(3))
+        )
+        cached = await cache.get("movie", "Alien", "US")
+        await cache.close()
+        return results, cached
+
+    results, cached = run(scenario)
+
+    assert calls == [1]
+    assert results == [["Hulu"]] * 3
+    assert cached.providers == ["Hulu"]
+
+
+def test_lookup_is_cancelled_with_its_last_caller(path, run):
+    events = []
+
+    async def lookup():
+        events.append("started")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            events.append("cancelled")
+            raise
+        return ["Hulu"]
+
+    async def fast_lookup():
+        return ["Max"]
+
+    async def scenario():
+        cache = new_cache(path)
+        first = asyncio.create_task(cache.fetch("movie", "Alien", "US", lookup))
+        second = asyncio.create_task(cache.fetch("movie", "Alien", "US", lookup))
+        await asyncio.sleep(0.01)
+
+        # One caller giving up leaves the lookup to the other
+        first.cancel()
+        await asyncio.sleep(0.01)
+        still_running = list(events)
+
+        second.cancel()
+        await asyncio.gather(first, second, return_exceptions=True)
+        await asyncio.sleep(0.01)
+
+        # A new caller starts a new lookup
+        result = await cache.fetch("movie", "Alien", "US", fast_lookup)
+        await cache.close()
+        return still_running, result
+
+    still_running, result = run(scenario)
+
+    assert still_running == ["started"]
+    assert events == ["started", "cancelled"]
+    assert result == ["Max"]
+
+
+def test_expired_entry_is_served_when_tmdb_fails(path, run, monkeypatch):
+    cache = new_cache(path)
+    monkeypatch.setattr(tv_module, "tmdb_cache", cache)
+
+    async def unreachable(kind, title):
+        raise OSError("TMDb unreachable")
+
+    async def scenario():
+        tv = RokuController("127.0.0.1", name="TV")
+        tv.tmdb_api_key = "key"
+        tv.tmdb_provider_region = "US"
+        tv._fetch_providers = unreachable
+        await cache.put("movie", "Alien", "US", ["Hulu"])
+        age(cache, "movie", "Alien", 48 * HOUR)
+        try:
+            return [
+                await tv.search_movie_providers("Alien"),
+                await tv.search_movie_providers("Heat"),
+            ]
+        finally:
+            await tv.close()
+            await cache.close()
+
+    assert run(scenario) == [["Hulu"], []]
@@ -0,0 +1,71 @@
+# tests/test_tv.py
+"""Roku controller behaviour against the fake Roku"""
+
+from app.devices.tv import TUNER_APP_ID, RokuController
+from tests.fake_roku import FakeRoku
+
+# RokuController always talks to port 8060, so the fake gets its own address
+HOST = "127.0.0.10"
+
+
+async def with_roku(roku: FakeRoku, action):
+    await roku.start()
+    tv = RokuController(HOST, name="TV")
+    try:
+        return await action(tv)
+    finally:
+        await tv.close()
+        await roku.stop()
+
+
+def test_change_channel_tunes_roku_tv_directly(run):
+    roku = FakeRoku(host=HOST)
+
+    result = run(lambda: with_roku(roku, lambda tv: tv.change_channel("7.1")))
+
+    assert result["status"] == "success"
+    assert result["method"] == "launch"
+    assert roku.channel == "7.1"
+
+
+def test_change_channel_types_digits_without_tuner(run):
+    roku = FakeRoku(host=HOST)
+    roku.is_tv = False
+    del roku.apps[TUNER_APP_ID]
+
+    result = run(lambda: with_roku(roku, lambda tv: tv.change_channel("12")))
+
+    assert result["status"] == "success"
+    assert result["channel"] == "12"
+    assert not [path for path in roku.requests if path.startswith("/launch")]
+    assert [path for path in roku.requests if path.startswith("/keypress")] == [
+        "/keypress/Lit_1",
+        "/keypress/Lit_2",
+    ]
+
+
+def test_change_channel_types_digits_on_tuner_input(run):
+    roku = FakeRoku(host=HOST)
+    roku.is_tv = False  # Not tuned directly, but the input exists
+
+    result = run(lambda: with_roku(roku, lambda tv: tv.change_channel("4")))
+
+    assert result["status"] == "success"
+    assert f"/launch/{TUNER_APP_ID}" in roku.requests
+    assert roku.requests[-1] == "/keypress/Lit_4"
+
+
+def test_status_polls_follow_the_power_mode(run):
+    roku = FakeRoku(host=HOST)
+
+    async def poll(tv):
+        first = await tv.get_status()  # Also reads the profile
+        roku.power_mode = "DisplayOff"
+        second = await tv.get_status()  # Only searches for the power mode
+        return first, second
+
+    first, second = run(lambda: with_roku(roku, poll))
+
+    assert first["power"] is True
+    assert second["power"] is False
+    assert second["active_app"] is None